@@ -0,0 +1,411 @@
+"""
+Moteur d'alertes sur le flux des résultats d'analyse
+- source   : points de score de risk_scores (trend_store.record_points, runs LLM et analyses par loi),
+             lus en continu depuis un point de reprise (collection alert_cursors)
+- règles   : déclaratives (RULES), indexées en mémoire par type et par source ; chaque événement
+             n'évalue que les règles qui le concernent, le contexte de la loi (nom, juridictions,
+             prochaine échéance) est mis en cache
+- alertes  : clé de déduplication = _id de la collection alerts (outbox), limitation par règle
+             (max_per_hour), puis livraison aux sinks (fichier, webhook) avec reprise : au moins une fois
+
+Le point de reprise n'avance qu'après l'enregistrement des alertes : un redémarrage relit les derniers
+événements, la clé de déduplication rend la relecture sans effet.
+
+    python alert_engine.py run | once | redeliver | unread
+"""
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+import requests
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from deadlines import due_dates
+from procurement_data import HUTCHINSON_SITES_INFO
+from site_index import EU, country_code, jurisdiction_codes, regulation_jurisdictions, site_codes
+from trend_store import RISK_LEVEL_THRESHOLDS, bucket_start, ensure_trend_collections
+
+ALERTS_COLLECTION = "alerts"
+CURSORS_COLLECTION = "alert_cursors"
+
+POLL_INTERVAL_S = float(os.getenv("ALERT_POLL_INTERVAL_S", "2"))
+# Relecture des dernières secondes à chaque lecture (horloges des processus écrivains)
+OVERLAP_S = 60
+BATCH_SIZE = 500
+# Cache du contexte des lois (nom, juridictions, échéance)
+CONTEXT_CACHE_SIZE = 4096
+CONTEXT_TTL_S = 300
+# Reprise des livraisons échouées : délai doublé à chaque échec, plafonné
+RETRY_BASE_S = 5
+RETRY_MAX_S = 3600
+
+ALERT_LOG_FILE = os.getenv("ALERT_LOG_FILE", "alerts.jsonl")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+
+# Codes ISO des sites Hutchinson (et l'UE pour les sites européens)
+HUTCHINSON_COUNTRIES = sorted(set().union(*map(site_codes, HUTCHINSON_SITES_INFO.values())) | {EU})
+
+LEVEL_RANK = {"FAIBLE": 0, **{level: len(RISK_LEVEL_THRESHOLDS) - i for i, (_, level) in enumerate(RISK_LEVEL_THRESHOLDS)}}
+
+# Règles déclaratives
+#   when  : "score_change" (variation >= min_change depuis le dernier score connu),
+#           "deadline" (échéance de la loi dans les within_days jours),
+#           "new_law" (premier score d'une loi, niveau >= min_level, juridiction parmi countries)
+#   source: restreint à "llm" ou "analyzer" (toutes si absent)
+RULES = [
+    {"id": "score_jump", "when": "score_change", "metric": "risk_score", "min_change": 10,
+     "max_per_hour": 100, "sinks": ["file", "webhook"]},
+    {"id": "deadline_30d", "when": "deadline", "within_days": 30, "max_per_hour": 50, "sinks": ["file"]},
+    {"id": "new_critical_hutchinson_country", "when": "new_law", "min_level": "CRITIQUE",
+     "countries": HUTCHINSON_COUNTRIES, "max_per_hour": 50, "sinks": ["file", "webhook"]},
+]
+
+_indexed_databases = set()
+
+
+def alert_priority(score):
+    """Priorité d'une alerte selon le score de risque (0-100)"""
+    if score is None:
+        return "MOYENNE"
+    if score >= 70:
+        return "CRITIQUE"
+    if score >= 50:
+        return "HAUTE"
+    if score >= 30:
+        return "MOYENNE"
+    return "BASSE"
+
+
+def ensure_alert_indexes(db):
+    """Index des alertes non lues, des livraisons en attente et de la lecture du flux"""
+    if db.name in _indexed_databases:
+        return
+    try:
+        alerts = db[ALERTS_COLLECTION]
+        alerts.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
+        alerts.create_index([("pending_sinks", ASCENDING), ("next_attempt_at", ASCENDING)])
+        alerts.create_index([("regulation_id", ASCENDING), ("created_at", DESCENDING)])
+        ensure_trend_collections(db)
+        db["risk_scores"].create_index([("ts", ASCENDING)])
+        _indexed_databases.add(db.name)
+    except Exception as e:
+        print(f"⚠️ Création des index d'alertes impossible: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Règles
+# ---------------------------------------------------------------------------
+
+class RuleIndex:
+    """Règles indexées par (type, source) ; pays des règles new_law pré-normalisés en codes ISO"""
+
+    def __init__(self, rules):
+        self.rules = {rule["id"]: rule for rule in rules}
+        self._by_kind = {}
+        for rule in rules:
+            if rule.get("countries"):
+                rule["_countries"] = {code for code in map(country_code, rule["countries"]) if code}
+            sources = [rule["source"]] if rule.get("source") else [None]
+            for source in sources:
+                self._by_kind.setdefault((rule["when"], source), []).append(rule)
+
+    def matching(self, kind, source):
+        return self._by_kind.get((kind, None), []) + self._by_kind.get((kind, source), [])
+
+
+def _score_change(rule, event, context):
+    previous = event["previous"].get(rule.get("metric", "risk_score"))
+    current = event["values"].get(rule.get("metric", "risk_score"))
+    if previous is None or current is None or abs(current - previous) < rule.get("min_change", 10):
+        return None
+    return {"key": f"{event['ts']:%Y-%m-%d}",
+            "message": f"Changement significatif de score pour {context['name']}: {previous} → {current}",
+            "old_score": previous, "new_score": current, "change": current - previous}
+
+
+def _deadline(rule, event, context):
+    due_date = context.get("due_date")
+    if due_date is None or not event["ts"] <= due_date <= event["ts"] + timedelta(days=rule["within_days"]):
+        return None
+    return {"key": f"{due_date:%Y-%m-%d}", "due_date": due_date,
+            "message": f"Échéance le {due_date:%d/%m/%Y} pour {context['name']}"}
+
+
+def _new_law(rule, event, context):
+    if event["previous"]:
+        return None
+    if LEVEL_RANK.get(event.get("risk_level"), 0) < LEVEL_RANK[rule.get("min_level", "CRITIQUE")]:
+        return None
+    countries = rule["_countries"] & set(context["jurisdictions"])
+    if not countries:
+        return None
+    return {"key": "new", "countries": sorted(countries),
+            "message": f"Nouvelle réglementation {event.get('risk_level')} ({', '.join(sorted(countries))}): "
+                       f"{context['name']}"}
+
+
+EVALUATORS = {"score_change": _score_change, "deadline": _deadline, "new_law": _new_law}
+
+
+# ---------------------------------------------------------------------------
+# Sinks
+# ---------------------------------------------------------------------------
+
+class FileSink:
+    """Une alerte JSON par ligne"""
+    name = "file"
+
+    def __init__(self, path=ALERT_LOG_FILE):
+        self.path = path
+
+    def send(self, alert):
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(alert, default=str, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """POST JSON vers ALERT_WEBHOOK_URL (affichage seul si non configuré)"""
+    name = "webhook"
+
+    def __init__(self, url=ALERT_WEBHOOK_URL, timeout=5):
+        self.url = url
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def send(self, alert):
+        if not self.url:
+            print(f"  📨 [webhook non configuré] {alert['message']}")
+            return
+        response = self.http.post(self.url, data=json.dumps(alert, default=str, ensure_ascii=False),
+                                  headers={"Content-Type": "application/json"}, timeout=self.timeout)
+        response.raise_for_status()
+
+
+# ---------------------------------------------------------------------------
+# Moteur
+# ---------------------------------------------------------------------------
+
+class AlertEngine:
+    """Évalue les règles sur chaque nouveau point de score et livre les alertes"""
+
+    def __init__(self, db, rules=RULES, sinks=None, consumer="default"):
+        self.db = db
+        self.alerts = db[ALERTS_COLLECTION]
+        self.cursors = db[CURSORS_COLLECTION]
+        self.rules = RuleIndex([dict(rule) for rule in rules])
+        self.sinks = {sink.name: sink for sink in (sinks if sinks is not None else [FileSink(), WebhookSink()])}
+        self.consumer = consumer
+        ensure_alert_indexes(db)
+
+        self._last = {}                    # (loi, profil, source) -> (ts, valeurs)
+        self._context = OrderedDict()      # loi -> (expiration, contexte)
+        self._sent = {}                    # règle -> dates des alertes de la dernière heure
+        self._seen = deque()               # (ts, _id) des événements de la fenêtre de relecture
+        self._seen_ids = set()
+
+    # --- Lecture du flux ---------------------------------------------------
+
+    def _checkpoint(self):
+        doc = self.cursors.find_one({"_id": self.consumer})
+        return doc["ts"] if doc else datetime.now()
+
+    def _save_checkpoint(self, ts):
+        self.cursors.update_one({"_id": self.consumer}, {"$max": {"ts": ts}}, upsert=True)
+
+    def poll(self):
+        """
+        Traite les nouveaux points depuis le point de reprise
+
+        Returns:
+            int: nombre d'alertes créées
+        """
+        checkpoint = self._checkpoint()
+        created = 0
+        latest = checkpoint
+        cursor = self.db["risk_scores"].find(
+            {"ts": {"$gte": checkpoint - timedelta(seconds=OVERLAP_S)}}
+        ).sort("ts", ASCENDING).batch_size(BATCH_SIZE)
+        for point in cursor:
+            if point["_id"] in self._seen_ids:
+                continue
+            created += self.process(point)
+            self._remember(point)
+            latest = max(latest, point["ts"])
+        self._save_checkpoint(latest)
+        return created
+
+    def _remember(self, point):
+        self._seen.append((point["ts"], point["_id"]))
+        self._seen_ids.add(point["_id"])
+        horizon = point["ts"] - timedelta(seconds=2 * OVERLAP_S)
+        while self._seen and self._seen[0][0] < horizon:
+            self._seen_ids.discard(self._seen.popleft()[1])
+
+    # --- Évaluation --------------------------------------------------------
+
+    def _previous_values(self, key, ts):
+        """Dernières valeurs connues avant ts : mémoire, sinon agrégat du dernier jour précédent"""
+        known = self._last.get(key)
+        if known is not None:
+            return known[1] if known[0] < ts else None
+        law, profile, source = key
+        bucket = self.db["risk_score_buckets"].find_one(
+            {"granularity": "day", "source": source, "law": law, "profile": profile,
+             "bucket": {"$lt": bucket_start(ts, "day")}},
+            sort=[("bucket", DESCENDING)]
+        )
+        if bucket is None:
+            return {}
+        return {metric: stats["last"] for metric, stats in bucket.items()
+                if isinstance(stats, dict) and stats.get("last") is not None}
+
+    def _law_context(self, law):
+        now = time.monotonic()
+        cached = self._context.get(law)
+        if cached is not None and cached[0] > now:
+            self._context.move_to_end(law)
+            return cached[1]
+        regulation = self.db["regulations"].find_one(
+            {"id_loi": law}, {"_id": 0, "nom_loi": 1, "pays_concernes": 1, "jurisdiction": 1}
+        ) or {}
+        context = {"name": regulation.get("nom_loi") or law,
+                   "jurisdictions": sorted(jurisdiction_codes(regulation_jurisdictions(regulation))),
+                   "due_date": due_dates(self.db, [law]).get(law)}
+        self._context[law] = (now + CONTEXT_TTL_S, context)
+        if len(self._context) > CONTEXT_CACHE_SIZE:
+            self._context.popitem(last=False)
+        return context
+
+    def process(self, point):
+        """Évalue les règles sur un point de score (coût constant : règles indexées, contexte en cache)"""
+        meta = point.get("meta", {})
+        key = (meta.get("law"), meta.get("profile"), meta.get("source"))
+        values = {metric: point[metric] for metric in ("impact_financial", "impact_reputation",
+                                                        "impact_operational", "risk_score") if metric in point}
+        previous = self._previous_values(key, point["ts"])
+        if previous is None:
+            # Point plus ancien que le dernier traité (relecture) : ni variation ni nouveauté
+            return 0
+        event = {"law": key[0], "profile": key[1], "source": key[2], "ts": point["ts"], "values": values,
+                 "previous": previous, "risk_level": point.get("risk_level")}
+        self._last[key] = (point["ts"], values)
+
+        context = None
+        created = 0
+        for kind, evaluator in EVALUATORS.items():
+            for rule in self.rules.matching(kind, event["source"]):
+                context = context or self._law_context(event["law"])
+                match = evaluator(rule, event, context)
+                if match:
+                    created += self._raise(rule, event, match)
+        return created
+
+    def _rate_limited(self, rule, now):
+        window = self._sent.setdefault(rule["id"], deque())
+        while window and window[0] < now - timedelta(hours=1):
+            window.popleft()
+        if rule.get("max_per_hour") and len(window) >= rule["max_per_hour"]:
+            return True
+        window.append(now)
+        return False
+
+    def _raise(self, rule, event, match):
+        """Enregistre l'alerte (idempotent) puis la livre ; False si déjà connue"""
+        now = datetime.now()
+        alert_id = f"{rule['id']}|{event['source']}|{event['profile']}|{event['law']}|{match.pop('key')}"
+        if self.alerts.find_one({"_id": alert_id}, {"_id": 1}) is not None:
+            return 0
+        limited = self._rate_limited(rule, now)
+        alert = {
+            "_id": alert_id, "type": rule["id"], "rule": rule["when"], "regulation_id": event["law"],
+            "profile": event["profile"], "source": event["source"], "event_ts": event["ts"],
+            "current_score": event["values"].get("risk_score"), "impact_level": event.get("risk_level"),
+            "priority": alert_priority(event["values"].get("risk_score")), "created_at": now,
+            "status": "SUPPRESSED" if limited else "UNREAD",
+            "pending_sinks": [] if limited else [name for name in rule.get("sinks", []) if name in self.sinks],
+            "attempts": 0, "next_attempt_at": now, **match,
+        }
+        try:
+            self.alerts.insert_one(alert)
+        except DuplicateKeyError:
+            return 0
+        if limited:
+            print(f"  🔕 Alerte limitée ({rule['id']}): {alert['message']}")
+            return 1
+        print(f"  🚨 ALERTE [{alert['priority']}] {alert['message']}")
+        self._deliver(alert)
+        return 1
+
+    # --- Livraison ---------------------------------------------------------
+
+    def _deliver(self, alert):
+        for name in list(alert["pending_sinks"]):
+            try:
+                self.sinks[name].send({k: v for k, v in alert.items()
+                                       if k not in ("pending_sinks", "attempts", "next_attempt_at")})
+                self.alerts.update_one({"_id": alert["_id"]}, {"$pull": {"pending_sinks": name}})
+            except Exception as e:
+                delay = min(RETRY_BASE_S * 2 ** alert.get("attempts", 0), RETRY_MAX_S)
+                self.alerts.update_one({"_id": alert["_id"]}, {
+                    "$inc": {"attempts": 1},
+                    "$set": {"next_attempt_at": datetime.now() + timedelta(seconds=delay), "last_error": str(e)}
+                })
+                print(f"  ⚠️ Livraison {name} échouée ({alert['_id']}), nouvel essai dans {delay}s: {e}")
+
+    def redeliver(self, limit=100):
+        """Relivre les alertes dont une livraison a échoué ou a été interrompue"""
+        pending = list(self.alerts.find(
+            {"pending_sinks": {"$exists": True, "$ne": []}, "next_attempt_at": {"$lte": datetime.now()}}
+        ).limit(limit))
+        for alert in pending:
+            alert["pending_sinks"] = [name for name in alert["pending_sinks"] if name in self.sinks]
+            self._deliver(alert)
+        return len(pending)
+
+    def run(self, poll_interval=POLL_INTERVAL_S):
+        """Boucle continue : nouvelles alertes puis reprises de livraison"""
+        print(f"🚀 Moteur d'alertes démarré ({len(self.rules.rules)} règles, lecture toutes les {poll_interval}s)")
+        self.redeliver()
+        while True:
+            try:
+                self.poll()
+                self.redeliver()
+                time.sleep(poll_interval)
+            except KeyboardInterrupt:
+                print("\n🛑 Arrêt du moteur d'alertes")
+                break
+            except Exception as e:
+                print(f"❌ Erreur du moteur d'alertes: {e}")
+                time.sleep(max(poll_interval, 5))
+
+
+def get_unread_alerts(db, limit=50):
+    """Alertes non lues, les plus récentes d'abord (index status, created_at)"""
+    ensure_alert_indexes(db)
+    return list(db[ALERTS_COLLECTION].find({"status": "UNREAD"}, {"pending_sinks": 0, "next_attempt_at": 0})
+                .sort("created_at", DESCENDING).limit(limit))
+
+
+def mark_alert_as_read(db, alert_id):
+    """Marque une alerte comme lue"""
+    db[ALERTS_COLLECTION].update_one({"_id": alert_id, "status": "UNREAD"},
+                                     {"$set": {"status": "READ", "read_at": datetime.now()}})
+
+
+if __name__ == "__main__":
+    from db import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if command == "unread":
+        for alert in get_unread_alerts(db):
+            print(f"  • [{alert['priority']}] {alert['message']}")
+    elif command == "redeliver":
+        print(f"📨 {AlertEngine(db).redeliver()} alertes relivrées")
+    elif command == "once":
+        print(f"🚨 {AlertEngine(db).poll()} alertes créées")
+    else:
+        AlertEngine(db).run()
@@ -0,0 +1,404 @@
+"""
+Stockage des analyses LLM : en-têtes de runs + un document par indicateur
+- risk_analysis           : en-tête d'un run (requête, modèle, statistiques, delta incrémental)
+- risk_indicators         : un document par indicateur et par run
+- risk_law_latest         : dernier état connu de chaque loi par entreprise (sans expiration)
+- risk_indicator_rollups  : agrégats mensuels par loi, conservés après expiration du détail
+- risk_profile_snapshots  : profils entreprise dédupliqués par empreinte
+
+Rétention : en-têtes et indicateurs expirent (index TTL sur expires_at) après ANALYSIS_RETENTION_DAYS
+jours. Les agrégats mensuels sont recalculés (au plus une fois par jour et par processus) tant que
+le mois est entièrement conservé, puis restent figés.
+
+Les documents par loi de hutchinson_analyzer partagent la collection risk_analysis : les runs LLM
+se reconnaissent à leur champ analysis_timestamp (RUN_FILTER).
+
+    python analysis_store.py migrate | rollup | latest [entreprise] | history <id_loi>
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from deadlines import due_dates
+from ingestion import parse_date
+from trend_store import llm_points, record_points
+
+ANALYSIS_RETENTION_DAYS = int(os.getenv("ANALYSIS_RETENTION_DAYS", "365"))
+# Intervalle minimal entre deux calculs d'agrégats déclenchés par les sauvegardes
+ROLLUP_INTERVAL_S = 24 * 3600
+
+# Runs LLM (les analyses par loi de hutchinson_analyzer n'ont pas d'analysis_timestamp)
+RUN_FILTER = {"analysis_timestamp": {"$type": "date"}}
+
+# En-tête sans les listes de suivi (analysis_results reste lisible pour les runs non migrés)
+HEADER_SUMMARY_PROJECTION = {"regulations_reviewed": 0, "delta": 0, "company_profile_snapshot": 0}
+
+# Champs techniques d'un document indicateur, retirés à la lecture
+INDICATOR_INTERNAL_FIELDS = ("_id", "analysis_id", "company_name", "analysis_timestamp", "position", "expires_at")
+
+# Historique d'une loi : champs tous présents dans l'index (id_loi, analysis_timestamp, ...) -> index seul
+LAW_HISTORY_FIELDS = ("analysis_timestamp", "impact_financial", "impact_reputation", "impact_operational",
+                      "company_name", "analysis_id")
+
+IMPACT_FIELDS = ("impact_financial", "impact_reputation", "impact_operational")
+
+_indexed_databases = set()
+_last_rollup = {}
+
+
+def _collections(db):
+    return db["risk_analysis"], db["risk_indicators"], db["risk_law_latest"]
+
+
+def ensure_analysis_indexes(db):
+    """Index des lectures courantes et TTL de rétention (une fois par processus et par base)"""
+    if db.name in _indexed_databases:
+        return
+    headers, indicators, latest = _collections(db)
+    try:
+        headers.create_index([("company_name", ASCENDING), ("analysis_timestamp", DESCENDING), ("_id", DESCENDING)])
+        headers.create_index([("analysis_timestamp", DESCENDING)])
+        headers.create_index([("assessment_key", ASCENDING), ("analysis_timestamp", DESCENDING)])
+        headers.create_index("expires_at", expireAfterSeconds=0)
+
+        indicators.create_index([("analysis_id", ASCENDING), ("position", ASCENDING)])
+        indicators.create_index([("id_loi", ASCENDING), ("analysis_timestamp", DESCENDING),
+                                 *[(field, ASCENDING) for field in LAW_HISTORY_FIELDS[1:]]])
+        indicators.create_index([("law_url", ASCENDING), ("analysis_timestamp", DESCENDING)])
+        indicators.create_index("expires_at", expireAfterSeconds=0)
+
+        latest.create_index([("company_name", ASCENDING), ("impact_financial", DESCENDING)])
+        db["risk_indicator_rollups"].create_index([("company_name", ASCENDING), ("law_key", ASCENDING),
+                                                   ("month", DESCENDING)])
+        _indexed_databases.add(db.name)
+    except Exception as e:
+        print(f"⚠️ Création des index d'analyses impossible: {e}")
+
+
+def profile_snapshot(company_profile):
+    """Extrait du profil conservé avec les analyses et son empreinte"""
+    snapshot = {
+        "secteur": company_profile.get('secteur'),
+        "presence_geographique": company_profile.get('presence_geographique', []),
+        "matieres_premieres": company_profile.get('matieres_premieres', [])
+    }
+    digest = hashlib.sha1(json.dumps(snapshot, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return snapshot, digest
+
+
+def law_key(indicator):
+    """Identifiant d'une loi dans les indicateurs : id_loi, sinon URL, sinon nom"""
+    return indicator.get("id_loi") or indicator.get("law_url") or indicator.get("law_name")
+
+
+def analysis_summary(indicators):
+    """Statistiques d'un run (moyennes d'impact, lois à fort impact, échéances)"""
+    if not indicators:
+        return None
+    return {
+        "total_laws_identified": len(indicators),
+        "avg_financial_impact": sum(law.get('impact_financial', 0) for law in indicators) / len(indicators),
+        "avg_reputation_impact": sum(law.get('impact_reputation', 0) for law in indicators) / len(indicators),
+        "avg_operational_impact": sum(law.get('impact_operational', 0) for law in indicators) / len(indicators),
+        "high_impact_laws": len([law for law in indicators if law.get('impact_financial', 0) >= 8]),
+        "laws_with_deadlines": len([law for law in indicators if law.get('deadline') and law.get('deadline') != 'Non définie'])
+    }
+
+
+def indicator_deadlines(db, indicators):
+    """
+    Échéance typée de chaque indicateur : date normalisée de la loi (collection obligations),
+    sinon texte "DD/MM/YYYY" rendu par le LLM
+    """
+    known = due_dates(db, {indicator["id_loi"] for indicator in indicators if indicator.get("id_loi")})
+    return [known.get(indicator.get("id_loi")) or parse_date(indicator.get("deadline")) for indicator in indicators]
+
+
+def save_analysis(db, ui_data, company_profile, query, llm_model, assessment_key=None, reviewed=None,
+                  previous_id=None, delta=None):
+    """
+    Enregistre un run : en-tête, indicateurs, dernier état par loi
+
+    Returns:
+        ObjectId: _id de l'en-tête
+    """
+    ensure_analysis_indexes(db)
+    headers, indicators_collection, latest = _collections(db)
+    now = datetime.now()
+    expires_at = now + timedelta(days=ANALYSIS_RETENTION_DAYS)
+    indicators = ui_data.get("indicators", [])
+    company_name = company_profile.get('nom', 'Hutchinson')
+
+    snapshot, profile_hash = profile_snapshot(company_profile)
+    db["risk_profile_snapshots"].update_one(
+        {"_id": profile_hash}, {"$setOnInsert": {**snapshot, "created_at": now}}, upsert=True
+    )
+
+    # Indicateurs écrits avant l'en-tête : un run visible est toujours complet
+    analysis_id = ObjectId()
+    if indicators:
+        deadlines = indicator_deadlines(db, indicators)
+        indicators_collection.insert_many([
+            {**indicator, "deadline_at": deadline_at, "analysis_id": analysis_id, "company_name": company_name,
+             "analysis_timestamp": now, "position": position, "expires_at": expires_at}
+            for position, (indicator, deadline_at) in enumerate(zip(indicators, deadlines))
+        ], ordered=False)
+
+    header = {
+        "_id": analysis_id,
+        "company_name": company_name,
+        "analysis_timestamp": now,
+        "query_used": query,
+        "llm_model": llm_model,
+        "total_regulations_analyzed": len(indicators),
+        "profile_hash": profile_hash,
+        "status": "completed",
+        "created_at": now,
+        "expires_at": expires_at,
+        "assessment_key": assessment_key,
+        "analysis_type": "incremental" if previous_id is not None else "full"
+    }
+    summary = analysis_summary(indicators)
+    if summary:
+        header["analysis_summary"] = summary
+    if ui_data.get("error"):
+        header["error"] = ui_data["error"]
+    if reviewed is not None:
+        header["regulations_reviewed"] = reviewed
+    if previous_id is not None:
+        header["previous_analysis_id"] = previous_id
+        header["delta"] = delta
+
+    headers.insert_one(header)
+    if indicators:
+        _update_latest(latest, indicators, company_name, analysis_id, now)
+        try:
+            record_points(db, llm_points(indicators, company_name, profile_hash, analysis_id, now))
+        except Exception as e:
+            print(f"⚠️ Points de tendance non enregistrés: {e}")
+
+    maybe_rollup(db)
+    return analysis_id
+
+
+def _update_latest(latest, indicators, company_name, analysis_id, timestamp):
+    """Dernier état par loi : upsert conditionnel (un run plus ancien n'écrase pas un plus récent)"""
+    operations = []
+    for indicator in indicators:
+        key = law_key(indicator)
+        if not key:
+            continue
+        operations.append(UpdateOne(
+            {"_id": f"{company_name}|{key}", "analysis_timestamp": {"$lte": timestamp}},
+            {"$set": {**indicator, "company_name": company_name, "law_key": key,
+                      "analysis_id": analysis_id, "analysis_timestamp": timestamp}},
+            upsert=True
+        ))
+    if not operations:
+        return
+    try:
+        latest.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Clé dupliquée = état déjà plus récent, ignoré
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+
+def load_indicators(db, header):
+    """Indicateurs d'un run, dans leur ordre d'origine (anciens documents : liste embarquée)"""
+    if "analysis_results" in header:
+        return header["analysis_results"]
+    projection = {field: 0 for field in INDICATOR_INTERNAL_FIELDS}
+    return list(db["risk_indicators"].find({"analysis_id": header["_id"]}, projection).sort("position", ASCENDING))
+
+
+def to_ui_data(db, header):
+    """Run au format UI (indicators + metadata), comme get_ui_ready_data"""
+    indicators = load_indicators(db, header)
+    timestamp = header.get("analysis_timestamp")
+    metadata = {
+        "company_name": header.get("company_name", "Hutchinson"),
+        "analysis_date": timestamp.strftime('%d/%m/%Y %H:%M') if timestamp else None,
+        "total_indicators": len(indicators),
+        "llm_used": True,
+        "model": header.get("llm_model", "llama2")
+    }
+    if header.get("previous_analysis_id") is not None:
+        delta = header.get("delta") or {}
+        metadata["incremental"] = {
+            "previous_analysis_id": str(header["previous_analysis_id"]),
+            "analyzed": len(delta.get("added", [])) + len(delta.get("modified", [])),
+            "reused": len(delta.get("unchanged", [])),
+            "removed": len(delta.get("removed", []))
+        }
+    return {"indicators": indicators, "metadata": metadata, "analysis_id": str(header["_id"])}
+
+
+def latest_analysis(db, company_name=None, assessment_key=None, projection=None):
+    """En-tête du dernier run (par entreprise ou par clé d'évaluation), parcours d'index borné"""
+    ensure_analysis_indexes(db)
+    query = dict(RUN_FILTER)
+    if company_name:
+        query["company_name"] = company_name
+    if assessment_key:
+        query["assessment_key"] = assessment_key
+        query["regulations_reviewed"] = {"$exists": True}
+    return db["risk_analysis"].find_one(query, projection, sort=[("analysis_timestamp", DESCENDING)])
+
+
+def recent_analyses(db, limit=10, company_name=None):
+    """Derniers runs (en-têtes résumés), du plus récent au plus ancien"""
+    ensure_analysis_indexes(db)
+    query = dict(RUN_FILTER)
+    if company_name:
+        query["company_name"] = company_name
+    return list(db["risk_analysis"].find(query, HEADER_SUMMARY_PROJECTION)
+                .sort("analysis_timestamp", DESCENDING).limit(limit))
+
+
+def law_history(db, regulation_id, company_name=None, limit=100):
+    """Impacts successifs d'une loi, lus dans l'index seul (requête couverte)"""
+    ensure_analysis_indexes(db)
+    query = {"id_loi": regulation_id}
+    if company_name:
+        query["company_name"] = company_name
+    projection = {"_id": 0, **{field: 1 for field in LAW_HISTORY_FIELDS}}
+    return list(db["risk_indicators"].find(query, projection)
+                .sort("analysis_timestamp", DESCENDING).limit(limit))
+
+
+def latest_by_law(db, company_name, skip=0, limit=50):
+    """Dernier état connu de chaque loi d'une entreprise, par impact financier décroissant"""
+    ensure_analysis_indexes(db)
+    return list(db["risk_law_latest"].find({"company_name": company_name})
+                .sort("impact_financial", DESCENDING).skip(skip).limit(limit))
+
+
+def _month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_indicators(db, now=None):
+    """
+    Agrégats mensuels par loi (nombre, moyennes et maxima d'impact) des mois terminés et encore
+    entièrement conservés : recalcul idempotent ($set), figé une fois le détail expiré
+
+    Returns:
+        int: agrégats écrits
+    """
+    now = now or datetime.now()
+    end = _month_start(now)
+    start = _month_start(now - timedelta(days=ANALYSIS_RETENTION_DAYS)) + timedelta(days=32)
+    start = _month_start(start)
+    if start >= end:
+        return 0
+
+    pipeline = [
+        {"$match": {"analysis_timestamp": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {
+                "company_name": "$company_name",
+                "law_key": {"$ifNull": ["$id_loi", {"$ifNull": ["$law_url", "$law_name"]}]},
+                "month": {"$dateToString": {"format": "%Y-%m", "date": "$analysis_timestamp"}},
+            },
+            "law_name": {"$last": "$law_name"},
+            "runs": {"$sum": 1},
+            "last_seen": {"$max": "$analysis_timestamp"},
+            **{f"avg_{field}": {"$avg": f"${field}"} for field in IMPACT_FIELDS},
+            **{f"max_{field}": {"$max": f"${field}"} for field in IMPACT_FIELDS},
+        }},
+    ]
+    operations = []
+    for group in db["risk_indicators"].aggregate(pipeline):
+        key = group.pop("_id")
+        operations.append(UpdateOne(
+            {"_id": f"{key['company_name']}|{key['law_key']}|{key['month']}"},
+            {"$set": {**key, **group, "computed_at": now}},
+            upsert=True
+        ))
+    if operations:
+        db["risk_indicator_rollups"].bulk_write(operations, ordered=False)
+    print(f"📊 {len(operations)} agrégats mensuels d'indicateurs calculés")
+    return len(operations)
+
+
+def maybe_rollup(db):
+    """Agrégats déclenchés par les sauvegardes, au plus une fois par ROLLUP_INTERVAL_S"""
+    if time.monotonic() - _last_rollup.get(db.name, -ROLLUP_INTERVAL_S) < ROLLUP_INTERVAL_S:
+        return
+    _last_rollup[db.name] = time.monotonic()
+    try:
+        rollup_indicators(db)
+    except Exception as e:
+        print(f"⚠️ Calcul des agrégats d'indicateurs échoué: {e}")
+
+
+def migrate_legacy(db, batch_size=100):
+    """
+    Convertit les runs enregistrés en un seul document (analysis_results, metadata,
+    company_profile_snapshot embarqués) vers en-tête + documents indicateurs
+
+    Returns:
+        int: runs convertis
+    """
+    ensure_analysis_indexes(db)
+    headers, indicators_collection, latest = _collections(db)
+    converted = 0
+    cursor = headers.find({**RUN_FILTER, "analysis_results": {"$exists": True}}).sort(
+        "analysis_timestamp", ASCENDING).batch_size(batch_size)
+    for doc in cursor:
+        timestamp = doc["analysis_timestamp"]
+        expires_at = timestamp + timedelta(days=ANALYSIS_RETENTION_DAYS)
+        indicators = doc.get("analysis_results") or []
+        company_name = doc.get("company_name", "Hutchinson")
+
+        # Rejouable : les indicateurs d'un run partiellement converti sont réécrits
+        indicators_collection.delete_many({"analysis_id": doc["_id"]})
+        if indicators:
+            indicators_collection.insert_many([
+                {**indicator, "analysis_id": doc["_id"], "company_name": company_name,
+                 "analysis_timestamp": timestamp, "position": position, "expires_at": expires_at}
+                for position, indicator in enumerate(indicators)
+            ], ordered=False)
+            _update_latest(latest, indicators, company_name, doc["_id"], timestamp)
+
+        update = {"$unset": {"analysis_results": "", "metadata": "", "company_profile_snapshot": ""},
+                  "$set": {"expires_at": expires_at}}
+        if doc.get("company_profile_snapshot"):
+            snapshot = doc["company_profile_snapshot"]
+            profile_hash = hashlib.sha1(json.dumps(snapshot, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+            db["risk_profile_snapshots"].update_one(
+                {"_id": profile_hash}, {"$setOnInsert": {**snapshot, "created_at": timestamp}}, upsert=True
+            )
+            update["$set"]["profile_hash"] = profile_hash
+        headers.update_one({"_id": doc["_id"]}, update)
+        converted += 1
+
+    print(f"✅ {converted} analyses converties au format en-tête + indicateurs")
+    return converted
+
+
+if __name__ == "__main__":
+    from db import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "latest"
+    if command == "migrate":
+        migrate_legacy(db)
+    elif command == "rollup":
+        rollup_indicators(db)
+    elif command == "history" and len(sys.argv) > 2:
+        for entry in law_history(db, sys.argv[2]):
+            print(f"📅 {entry['analysis_timestamp']:%d/%m/%Y %H:%M} | 💰 {entry.get('impact_financial')} "
+                  f"| 🏢 {entry.get('impact_reputation')} | ⚙️ {entry.get('impact_operational')}")
+    else:
+        company = sys.argv[2] if len(sys.argv) > 2 else "Hutchinson"
+        for state in latest_by_law(db, company):
+            print(f"📜 {state.get('law_name', state['law_key'])} | 💰 {state.get('impact_financial')} "
+                  f"| {state['analysis_timestamp']:%d/%m/%Y}")
@@ -0,0 +1,313 @@
+"""
+API HTTP (ASGI) d'accès programmatique à l'analyse de risques réglementaires
+Expose la recherche, l'évaluation LLM, les indicateurs et l'historique de RegulatoryRiskRAGWithLLM
+pour l'ERP et les outils achats.
+
+- une seule instance RAG chaude par processus (modèle d'embedding + session HTTP LLM)
+- coalescence : les requêtes identiques simultanées partagent un seul calcul
+- limiteur de concurrence devant le LLM (file bornée, 503 au-delà)
+- pagination par curseur de l'historique et des indicateurs
+- ETag / If-None-Match sur les analyses enregistrées (immuables)
+
+Lancement :
+    python api_server.py            (ou uvicorn api_server:app --port 8000)
+Un seul worker uvicorn : le modèle est chargé une fois et partagé par toutes les requêtes.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+
+from analysis_store import (INDICATOR_INTERNAL_FIELDS, RUN_FILTER, ensure_analysis_indexes, latest_by_law,
+                            law_history, load_indicators)
+from company_profile import CompanyProfile
+from snapshot import JSON_OPTIONS
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+
+# Threads pour les appels bloquants (MongoDB, encodage, LLM)
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", "8"))
+# Analyses LLM simultanées et analyses en attente acceptées au-delà
+LLM_CONCURRENCY = int(os.getenv("API_LLM_CONCURRENCY", "2"))
+LLM_MAX_QUEUE = int(os.getenv("API_LLM_MAX_QUEUE", "16"))
+LLM_RETRY_AFTER_S = 30
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_SEARCH_LIMIT = 50
+
+# Champs de l'historique (sans la liste complète des indicateurs)
+HISTORY_PROJECTION = {
+    "company_name": 1,
+    "analysis_timestamp": 1,
+    "query_used": 1,
+    "llm_model": 1,
+    "total_regulations_analyzed": 1,
+    "analysis_summary": 1,
+    "status": 1,
+}
+
+
+class AssessmentRequest(BaseModel):
+    query: Optional[str] = None
+    company_profile: Optional[dict] = None
+    # Ne ré-analyser que les lois nouvelles ou modifiées depuis la dernière analyse
+    incremental: bool = False
+
+
+class RequestCoalescer:
+    """Partage le résultat d'un calcul en cours entre les requêtes de même clé"""
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, key, coroutine_function, *args):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coroutine_function(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield : un client qui se déconnecte n'annule pas le calcul des autres
+        return await asyncio.shield(task)
+
+
+class LLMLimiter:
+    """Sémaphore devant le LLM avec une file d'attente bornée"""
+
+    def __init__(self, concurrency=LLM_CONCURRENCY, max_queue=LLM_MAX_QUEUE):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.running = 0
+
+    async def run(self, function, *args):
+        if self.waiting >= self.max_queue:
+            raise HTTPException(503, "Trop d'analyses en attente, réessayer plus tard",
+                                headers={"Retry-After": str(LLM_RETRY_AFTER_S)})
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await run_blocking(function, *args)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+
+_executor = ThreadPoolExecutor(max_workers=API_WORKER_THREADS, thread_name_prefix="api")
+
+
+async def run_blocking(function, *args):
+    """Exécute un appel bloquant dans le pool de threads de l'API"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, function, *args)
+
+
+def request_key(*parts):
+    """Clé de coalescence stable d'une requête"""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def json_response(data, status_code=200, headers=None):
+    """Réponse JSON sérialisée avec bson.json_util (ObjectId, dates)"""
+    return Response(json_util.dumps(data, json_options=JSON_OPTIONS, ensure_ascii=False),
+                    status_code=status_code, media_type="application/json", headers=headers)
+
+
+def parse_object_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise HTTPException(404, "Analyse introuvable")
+
+
+def analysis_etag(doc):
+    """ETag d'une analyse enregistrée : les documents risk_analysis ne sont jamais modifiés"""
+    created_at = doc.get("created_at") or doc.get("analysis_timestamp")
+    stamp = created_at.isoformat() if created_at else ""
+    return '"' + hashlib.sha1(f"{doc['_id']}:{stamp}".encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def not_modified(request, etag):
+    header = request.headers.get("if-none-match", "")
+    return etag in [tag.strip() for tag in header.split(",")] or header.strip() == "*"
+
+
+@asynccontextmanager
+async def lifespan(app):
+    def warm_up():
+        # Import différé des modules RAG ; le modèle d'embedding est chargé par le précalcul ci-dessous
+        from db import db
+        from rag_with_llm import RegulatoryRiskRAGWithLLM, get_hutchinson_profile
+        from embedding_models import ACTIVE_VERSION
+
+        rag = RegulatoryRiskRAGWithLLM()
+        # Vecteur de la requête par défaut du profil calculé avant le premier appel
+        profile = get_hutchinson_profile()
+        if profile:
+            profile.compiled.precompute(rag.model, ACTIVE_VERSION)
+        ensure_analysis_indexes(db)
+        db["risk_analysis"].create_index([("company_name", 1), ("_id", -1)])
+        return rag, db, get_hutchinson_profile
+
+    app.state.rag, app.state.db, app.state.default_profile = await run_blocking(warm_up)
+    app.state.analyses = app.state.db["risk_analysis"]
+    app.state.coalescer = RequestCoalescer()
+    app.state.llm = LLMLimiter()
+    print(f"✅ API prête (LLM: {LLM_CONCURRENCY} analyses simultanées, file max {LLM_MAX_QUEUE})")
+    yield
+    _executor.shutdown(wait=False)
+
+
+app = FastAPI(title="RiskRadar API", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "llm_running": app.state.llm.running, "llm_waiting": app.state.llm.waiting}
+
+
+@app.get("/regulations/search")
+async def search_regulations(q: str = Query(..., min_length=2), limit: int = Query(5, ge=1, le=MAX_SEARCH_LIMIT)):
+    """Recherche vectorielle des réglementations pertinentes"""
+    rag = app.state.rag
+    results = await app.state.coalescer.run(
+        request_key("search", q, limit), run_blocking, rag.retrieve_relevant_regulations, q, None, limit
+    )
+    # Résultat partagé entre requêtes coalescées : copie sans le texte intégral
+    regulations = [{key: value for key, value in regulation.items() if key != "texte"} for regulation in results]
+    return json_response({"query": q, "count": len(regulations), "regulations": regulations})
+
+
+@app.post("/assessments")
+async def create_assessment(body: AssessmentRequest):
+    """Lance une évaluation LLM (coalescée avec les évaluations identiques en cours)"""
+    profile = body.company_profile
+    if profile is None:
+        profile = await run_blocking(app.state.default_profile)
+        if not profile:
+            raise HTTPException(503, "Profil entreprise par défaut indisponible")
+    # Profil fourni dans l'un ou l'autre schéma : même version, même clé de coalescence
+    profile = CompanyProfile.coerce(profile)
+
+    ui_data = await app.state.coalescer.run(
+        request_key("assessment", body.query, profile.version, body.incremental),
+        app.state.llm.run, app.state.rag.get_ui_ready_data, profile, body.query, body.incremental
+    )
+    if ui_data.get("error") and not ui_data.get("indicators"):
+        return json_response(ui_data, status_code=502)
+
+    headers = {"Location": f"/assessments/{ui_data['analysis_id']}"} if ui_data.get("analysis_id") else None
+    return json_response(ui_data, status_code=201, headers=headers)
+
+
+@app.get("/assessments")
+async def list_assessments(company: Optional[str] = None, cursor: Optional[str] = None,
+                           page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Historique des analyses, du plus récent au plus ancien (pagination par curseur sur _id)"""
+    query = dict(RUN_FILTER)
+    if company:
+        query["company_name"] = company
+    if cursor:
+        query["_id"] = {"$lt": parse_object_id(cursor)}
+
+    def fetch():
+        return list(app.state.analyses.find(query, HISTORY_PROJECTION).sort("_id", -1).limit(page_size + 1))
+
+    docs = await run_blocking(fetch)
+    next_cursor = str(docs[page_size - 1]["_id"]) if len(docs) > page_size else None
+    return json_response({"items": docs[:page_size], "next_cursor": next_cursor})
+
+
+@app.get("/assessments/{analysis_id}")
+async def get_assessment(analysis_id: str, request: Request):
+    """Analyse enregistrée complète, avec ETag (304 si inchangée)"""
+    object_id = parse_object_id(analysis_id)
+    analyses = app.state.analyses
+
+    # Validation de l'ETag sur les seuls horodatages : pas de transfert des indicateurs
+    stamp = await run_blocking(analyses.find_one, {"_id": object_id}, {"created_at": 1, "analysis_timestamp": 1})
+    if stamp is None:
+        raise HTTPException(404, "Analyse introuvable")
+    etag = analysis_etag(stamp)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400, immutable"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    def fetch():
+        doc = analyses.find_one({"_id": object_id})
+        doc["analysis_results"] = load_indicators(app.state.db, doc)
+        return doc
+
+    return json_response(await run_blocking(fetch), headers=headers)
+
+
+@app.get("/assessments/{analysis_id}/indicators")
+async def get_indicators(analysis_id: str, request: Request, offset: int = Query(0, ge=0),
+                         page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Indicateurs d'une analyse, paginés sur l'index (analysis_id, position), avec ETag"""
+    object_id = parse_object_id(analysis_id)
+
+    def fetch_header():
+        # $slice : runs non migrés, indicateurs encore embarqués dans l'en-tête
+        return app.state.analyses.find_one(
+            {"_id": object_id},
+            {"created_at": 1, "analysis_timestamp": 1, "total_regulations_analyzed": 1,
+             "analysis_results": {"$slice": [offset, page_size]}}
+        )
+
+    def fetch_indicators():
+        return list(app.state.db["risk_indicators"].find(
+            {"analysis_id": object_id, "position": {"$gte": offset, "$lt": offset + page_size}},
+            {field: 0 for field in INDICATOR_INTERNAL_FIELDS}
+        ).sort("position", 1))
+
+    doc = await run_blocking(fetch_header)
+    if doc is None:
+        raise HTTPException(404, "Analyse introuvable")
+    etag = analysis_etag(doc)[:-1] + f'-{offset}-{page_size}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400, immutable"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    indicators = doc["analysis_results"] if "analysis_results" in doc else await run_blocking(fetch_indicators)
+    total = doc.get("total_regulations_analyzed", len(indicators))
+    next_offset = offset + len(indicators) if offset + len(indicators) < total else None
+    return json_response({"analysis_id": analysis_id, "total": total, "offset": offset,
+                          "indicators": indicators, "next_offset": next_offset}, headers=headers)
+
+
+@app.get("/laws/latest")
+async def get_latest_by_law(company: str = "Hutchinson", offset: int = Query(0, ge=0),
+                            page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Dernier état connu de chaque loi pour une entreprise, par impact financier décroissant"""
+    states = await run_blocking(latest_by_law, app.state.db, company, offset, page_size + 1)
+    next_offset = offset + page_size if len(states) > page_size else None
+    return json_response({"company": company, "offset": offset, "items": states[:page_size],
+                          "next_offset": next_offset})
+
+
+@app.get("/laws/{regulation_id}/history")
+async def get_law_history(regulation_id: str, company: Optional[str] = None,
+                          limit: int = Query(MAX_PAGE_SIZE, ge=1, le=1000)):
+    """Impacts successifs d'une loi au fil des analyses (lecture d'index seule)"""
+    history = await run_blocking(law_history, app.state.db, regulation_id, company, limit)
+    return json_response({"id_loi": regulation_id, "history": history})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=API_HOST, port=API_PORT, workers=1)
@@ -0,0 +1,219 @@
+"""
+Profil entreprise normalisé
+Deux schémas coexistent :
+- MongoDB (mongodb_setup.py) : company_info, geographical_presence, typical_materials, business_activities...
+- profil de repli / API      : nom, secteur, presence_geographique, matieres_premieres...
+CompanyProfile lit les deux et se présente comme le second (get / [] / items), seul lu par le RAG.
+
+Les artefacts dérivés (automates de mots-clés, texte de requête, codes ISO, vecteur de requête) sont
+compilés une fois par version du profil (empreinte de son contenu) et partagés entre les évaluations
+(LRU de COMPILED_CACHE_SIZE versions : l'API accepte des profils arbitraires).
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from query_expansion import concepts, expanded_embedding, fold, term_concepts, term_pattern
+from site_index import jurisdiction_codes
+
+# Champs du schéma lu par le RAG (ordre de to_dict)
+FIELDS = ("nom", "secteur", "presence_geographique", "matieres_premieres", "fournisseurs_regions",
+          "clients_regions", "secteurs_clients", "activites", "produits", "total_sites")
+
+# Groupes de termes comparés aux textes réglementaires
+KEYWORD_GROUPS = ("presence_geographique", "secteur", "matieres_premieres", "fournisseurs_regions",
+                  "clients_regions")
+
+DEFAULT_NAME = "Hutchinson"
+
+# Versions de profil compilées gardées en mémoire
+COMPILED_CACHE_SIZE = 32
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def _label(value):
+    """Valeur technique ("natural_rubber") en libellé ("natural rubber")"""
+    return str(value).replace("_", " ").strip()
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [item for item in value if item]
+
+
+class CompanyProfile:
+    """Profil entreprise typé (schéma RAG), construit depuis l'un ou l'autre schéma"""
+
+    __slots__ = FIELDS + ("source_id", "version")
+
+    def __init__(self, nom=DEFAULT_NAME, secteur="", presence_geographique=(), matieres_premieres=(),
+                 fournisseurs_regions=(), clients_regions=(), secteurs_clients=(), activites=(), produits=(),
+                 total_sites=None, source_id=None):
+        self.nom = nom or DEFAULT_NAME
+        self.secteur = secteur or ""
+        self.presence_geographique = list(presence_geographique)
+        self.matieres_premieres = list(matieres_premieres)
+        self.fournisseurs_regions = list(fournisseurs_regions)
+        self.clients_regions = list(clients_regions)
+        self.secteurs_clients = list(secteurs_clients)
+        self.activites = list(activites)
+        self.produits = list(produits)
+        self.total_sites = total_sites
+        self.source_id = source_id
+        self.version = hashlib.sha1(
+            json.dumps(self.to_dict(), sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    @classmethod
+    def from_document(cls, doc):
+        """Profil depuis un document MongoDB ou un dict du schéma RAG"""
+        if "company_info" in doc or "geographical_presence" in doc:
+            info = doc.get("company_info") or {}
+            sectors = [_label(sector).lower() for sector in _as_list(info.get("sectors"))]
+            activities = doc.get("business_activities") or {}
+            return cls(
+                nom=info.get("name"),
+                secteur=" ".join(sectors),
+                presence_geographique=_as_list(doc.get("geographical_presence")),
+                matieres_premieres=[_label(m) for m in _as_list(doc.get("typical_materials"))],
+                secteurs_clients=sectors,
+                activites=sorted({_label(a) for values in activities.values() for a in _as_list(values)}),
+                produits=[_label(p) for p in _as_list(doc.get("specific_products"))],
+                total_sites=doc.get("total_sites"),
+                source_id=doc.get("_id"),
+            )
+        return cls(
+            nom=doc.get("nom"),
+            secteur=doc.get("secteur"),
+            presence_geographique=_as_list(doc.get("presence_geographique")),
+            matieres_premieres=_as_list(doc.get("matieres_premieres")),
+            fournisseurs_regions=_as_list(doc.get("fournisseurs_regions")),
+            clients_regions=_as_list(doc.get("clients_regions")),
+            secteurs_clients=_as_list(doc.get("secteurs_clients")),
+            activites=_as_list(doc.get("activites")),
+            produits=_as_list(doc.get("produits")),
+            total_sites=doc.get("total_sites"),
+            source_id=doc.get("_id"),
+        )
+
+    @classmethod
+    def coerce(cls, profile):
+        """CompanyProfile depuis un profil quelconque (None -> profil vide)"""
+        if isinstance(profile, cls):
+            return profile
+        return cls.from_document(profile or {})
+
+    # --- Interface dict (code existant : profile.get('secteur'), profile['nom']) --------------
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in FIELDS else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in FIELDS
+
+    def keys(self):
+        return list(FIELDS)
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __repr__(self):
+        return f"CompanyProfile(nom={self.nom!r}, version={self.version[:12]})"
+
+    # --- Artefacts compilés ------------------------------------------------------------------
+
+    @property
+    def compiled(self):
+        """Artefacts dérivés, partagés par toutes les instances de même version"""
+        with _compiled_lock:
+            compiled = _compiled.get(self.version)
+            if compiled is not None:
+                _compiled.move_to_end(self.version)
+                return compiled
+        compiled = CompiledProfile(self)
+        with _compiled_lock:
+            compiled = _compiled.setdefault(self.version, compiled)
+            _compiled.move_to_end(self.version)
+            if len(_compiled) > COMPILED_CACHE_SIZE:
+                _compiled.popitem(last=False)
+        return compiled
+
+
+class CompiledProfile:
+    """Automates de mots-clés, texte de requête, codes ISO et vecteurs de requête d'une version de profil"""
+
+    __slots__ = ("query_text", "query_suffix", "country_codes", "keywords", "_embeddings")
+
+    def __init__(self, profile):
+        parts = [profile.secteur, *profile.matieres_premieres, *profile.presence_geographique]
+        self.query_text = " ".join(part for part in parts if part)
+        self.query_suffix = f" {profile.secteur} {' '.join(profile.presence_geographique)}"
+        self.country_codes = frozenset(jurisdiction_codes(profile.presence_geographique))
+        # Par groupe : terme -> (concepts du terme, motif du terme sans accents, en mots entiers)
+        self.keywords = {}
+        for group in KEYWORD_GROUPS:
+            terms = [profile.secteur] if group == "secteur" else getattr(profile, group)
+            self.keywords[group] = [
+                (term, frozenset(term_concepts([term])), term_pattern(term))
+                for term in terms if term and fold(term)
+            ]
+        self._embeddings = {}
+
+    def enrich(self, query_text):
+        """Requête enrichie du secteur et de la présence géographique"""
+        return f"{query_text}{self.query_suffix}"
+
+    def query_embedding(self, encoder, query, version=None):
+        """Vecteur fusionné d'une requête (mémorisé par version de modèle pour la requête du profil)"""
+        embedding = self._embeddings.get((version, query))
+        if embedding is None:
+            embedding = expanded_embedding(encoder, query, version)
+            if len(self._embeddings) < 16:
+                self._embeddings[(version, query)] = embedding
+        return embedding
+
+    def precompute(self, encoder, version=None):
+        """Vecteur de la requête par défaut du profil (démarrage de l'API)"""
+        return self.query_embedding(encoder, self.enrich(self.query_text), version)
+
+    def match(self, text):
+        """
+        Termes du profil mentionnés dans un texte (toutes langues), un seul passage d'analyse du texte
+
+        Returns:
+            dict: groupe -> termes reconnus
+        """
+        folded = fold(text)
+        text_concepts = concepts(folded)
+        return {
+            group: [term for term, term_concept_set, pattern in entries
+                    if term_concept_set & text_concepts or pattern.search(folded)]
+            for group, entries in self.keywords.items()
+        }
+
+
+def load_company_profile(db=None):
+    """Profil de la collection hutchinson (schéma MongoDB ou RAG), None si absent ou base indisponible"""
+    try:
+        if db is None:
+            from db import db
+        doc = db["hutchinson"].find_one()
+    except Exception as e:
+        print(f"Erreur récupération profil Hutchinson: {e}")
+        return None
+    return CompanyProfile.from_document(doc) if doc else None
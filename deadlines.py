@@ -0,0 +1,287 @@
+"""
+Échéances réglementaires normalisées
+- obligations : un document par (source, réglementation, type de date), date typée (due_date),
+                juridictions (codes ISO de site_index, "EU" développé) et sites Hutchinson concernés, tranche d'horizon pré-calculée
+  sources : "regulations" (date_effet / date_vigueur) et "purchasing" (deadline des réglementations
+  suivies par les achats)
+
+Les dates sont normalisées une fois à l'ingestion : "échéances dans les N prochains mois pour un site ou
+une juridiction" est une seule requête d'intervalle sur index (sites|jurisdictions, due_date).
+Les tranches d'horizon (horizon) sont recalculées au plus une fois par jour et par processus.
+
+    python deadlines.py backfill | upcoming [mois] [site] | horizons
+"""
+import sys
+from calendar import monthrange
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+from site_index import country_code, jurisdiction_codes, reference_index
+
+OBLIGATIONS_COLLECTION = "obligations"
+
+# Champs date par source
+DATE_FIELDS = {
+    "regulations": ("date_effet", "date_vigueur"),
+    "purchasing": ("deadline",),
+}
+
+# Tranches d'horizon : (libellé, borne haute en mois depuis aujourd'hui), "overdue" avant aujourd'hui
+HORIZONS = (("0-1m", 1), ("1-3m", 3), ("3-6m", 6), ("6-12m", 12), ("12m+", None))
+URGENT_MONTHS = 3
+
+_indexed_databases = set()
+_refreshed_on = {}
+
+
+def sites_for(jurisdictions):
+    """Sites Hutchinson situés dans l'une des juridictions (index ISO de site_index)"""
+    return sorted(reference_index().sites_for(jurisdictions))
+
+
+def add_months(date, months):
+    """date + N mois (jour ramené à la fin du mois si nécessaire)"""
+    month_index = date.month - 1 + months
+    year, month = date.year + month_index // 12, month_index % 12 + 1
+    return date.replace(year=year, month=month, day=min(date.day, monthrange(year, month)[1]))
+
+
+def months_until(due_date, now=None):
+    """Mois calendaires entre aujourd'hui et l'échéance (négatif si dépassée)"""
+    now = now or datetime.now()
+    return (due_date.year - now.year) * 12 + (due_date.month - now.month)
+
+
+def _day(now):
+    return (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _horizon_bounds(now):
+    """(libellé, début inclus, fin exclue) de chaque tranche"""
+    today = _day(now)
+    bounds = [("overdue", None, today)]
+    start = today
+    for label, months in HORIZONS:
+        end = add_months(today, months) if months is not None else None
+        bounds.append((label, start, end))
+        start = end
+    return bounds
+
+
+def horizon_for(due_date, now=None):
+    """Tranche d'horizon d'une échéance"""
+    for label, start, end in _horizon_bounds(now):
+        if (start is None or due_date >= start) and (end is None or due_date < end):
+            return label
+    return HORIZONS[-1][0]
+
+
+def ensure_obligation_indexes(db):
+    """Index des requêtes d'échéances (une fois par processus et par base)"""
+    if db.name in _indexed_databases:
+        return
+    obligations = db[OBLIGATIONS_COLLECTION]
+    try:
+        obligations.create_index([("sites", ASCENDING), ("due_date", ASCENDING)])
+        obligations.create_index([("jurisdictions", ASCENDING), ("due_date", ASCENDING)])
+        obligations.create_index([("source", ASCENDING), ("due_date", ASCENDING)])
+        obligations.create_index([("due_date", ASCENDING)])
+        obligations.create_index([("horizon", ASCENDING), ("due_date", ASCENDING)])
+        obligations.create_index([("regulation_id", ASCENDING)])
+        _indexed_databases.add(db.name)
+    except Exception as e:
+        print(f"⚠️ Création des index d'échéances impossible: {e}")
+
+
+def obligation_documents(regulation, source="regulations", now=None):
+    """
+    Documents obligations d'une réglementation (un par champ date renseigné et valide)
+
+    Args:
+        regulation (dict): document `regulations` (id_loi, nom_loi, pays_concernes, date_effet...)
+                           ou réglementation suivie par les achats (id, title, jurisdiction, deadline...)
+        source (str): "regulations" ou "purchasing"
+    """
+    # Import local : ingestion importe ce module
+    from ingestion import parse_date
+
+    if source == "purchasing":
+        regulation_id, title = regulation.get("id"), regulation.get("title")
+        raw_jurisdictions = [regulation.get("jurisdiction")]
+    else:
+        regulation_id, title = regulation.get("id_loi"), regulation.get("nom_loi")
+        raw_jurisdictions = regulation.get("pays_concernes") or []
+        if isinstance(raw_jurisdictions, str):
+            raw_jurisdictions = [raw_jurisdictions]
+        raw_jurisdictions = [*raw_jurisdictions, regulation.get("jurisdiction")]
+    if not regulation_id:
+        return []
+
+    jurisdictions = sorted(jurisdiction_codes(raw_jurisdictions))
+    sites = sites_for(jurisdictions)
+    now = now or datetime.now()
+    documents = []
+    for kind in DATE_FIELDS[source]:
+        due_date = parse_date(regulation.get(kind))
+        if due_date is None:
+            continue
+        documents.append({
+            "_id": f"{source}|{regulation_id}|{kind}",
+            "source": source,
+            "regulation_id": regulation_id,
+            "title": title,
+            "kind": kind,
+            "due_date": due_date,
+            "jurisdictions": jurisdictions,
+            "sites": sites,
+            "rtype": regulation.get("rtype") or regulation.get("type"),
+            "phase": regulation.get("phase") or regulation.get("statut"),
+            "horizon": horizon_for(due_date, now),
+            "horizon_computed_at": _day(now),
+        })
+    return documents
+
+
+def sync_obligations(db, regulations, source="regulations", now=None):
+    """
+    Met à jour les obligations de réglementations nouvelles ou modifiées (dates supprimées retirées)
+
+    Returns:
+        int: nombre d'obligations écrites
+    """
+    ensure_obligation_indexes(db)
+    obligations = db[OBLIGATIONS_COLLECTION]
+    operations, ids, kept = [], [], []
+    for regulation in regulations:
+        documents = obligation_documents(regulation, source, now)
+        regulation_id = regulation.get("id" if source == "purchasing" else "id_loi")
+        if regulation_id:
+            ids.append(regulation_id)
+        for document in documents:
+            kept.append(document["_id"])
+            operations.append(UpdateOne({"_id": document["_id"]}, {"$set": document}, upsert=True))
+    if operations:
+        obligations.bulk_write(operations, ordered=False)
+    if ids:
+        obligations.delete_many({"source": source, "regulation_id": {"$in": ids}, "_id": {"$nin": kept}})
+    return len(operations)
+
+
+def refresh_horizons(db, now=None, force=False):
+    """
+    Recalcule les tranches d'horizon (une mise à jour par tranche, sur l'index due_date)
+    Au plus une fois par jour et par processus sauf force=True
+    """
+    today = _day(now)
+    if not force and _refreshed_on.get(db.name) == today:
+        return 0
+    ensure_obligation_indexes(db)
+    obligations = db[OBLIGATIONS_COLLECTION]
+    updated = 0
+    for label, start, end in _horizon_bounds(today):
+        due = {}
+        if start is not None:
+            due["$gte"] = start
+        if end is not None:
+            due["$lt"] = end
+        result = obligations.update_many({"due_date": due, "horizon": {"$ne": label}},
+                                         {"$set": {"horizon": label, "horizon_computed_at": today}})
+        updated += result.modified_count
+    _refreshed_on[db.name] = today
+    return updated
+
+
+def upcoming_query(months, site=None, jurisdiction=None, source=None, now=None):
+    """Filtre "échéance dans les N prochains mois" (à partir d'aujourd'hui 00:00)"""
+    today = _day(now)
+    query = {"due_date": {"$gte": today, "$lt": add_months(today, months)}}
+    if site:
+        query["sites"] = site
+    if jurisdiction:
+        query["jurisdictions"] = country_code(jurisdiction)
+    if source:
+        query["source"] = source
+    return query
+
+
+def upcoming(db, months=URGENT_MONTHS, site=None, jurisdiction=None, source=None, now=None, limit=0):
+    """
+    Échéances des N prochains mois, les plus proches d'abord
+
+    Args:
+        site (str): nom d'un site Hutchinson (clé de HUTCHINSON_SITES_INFO)
+        jurisdiction (str): pays, code ISO ou "UE" (normalisé par site_index.country_code)
+        source (str): "regulations" ou "purchasing"
+    """
+    ensure_obligation_indexes(db)
+    cursor = db[OBLIGATIONS_COLLECTION].find(
+        upcoming_query(months, site, jurisdiction, source, now), {"horizon_computed_at": 0}
+    ).sort("due_date", ASCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+
+def count_upcoming(db, months=URGENT_MONTHS, site=None, jurisdiction=None, source=None, now=None):
+    """Nombre d'échéances des N prochains mois (compteurs de l'UI)"""
+    ensure_obligation_indexes(db)
+    return db[OBLIGATIONS_COLLECTION].count_documents(upcoming_query(months, site, jurisdiction, source, now))
+
+
+def horizon_counts(db, source=None, site=None, now=None):
+    """Nombre d'échéances par tranche d'horizon"""
+    refresh_horizons(db, now)
+    match = {}
+    if source:
+        match["source"] = source
+    if site:
+        match["sites"] = site
+    counts = {label: 0 for label, _, _ in _horizon_bounds(now)}
+    for row in db[OBLIGATIONS_COLLECTION].aggregate([{"$match": match},
+                                                     {"$group": {"_id": "$horizon", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+def due_dates(db, regulation_ids, source="regulations"):
+    """Prochaine échéance (ou la plus récente si toutes dépassées) de chaque réglementation"""
+    ensure_obligation_indexes(db)
+    today = _day(None)
+    result = {}
+    for doc in db[OBLIGATIONS_COLLECTION].find(
+            {"source": source, "regulation_id": {"$in": list(regulation_ids)}},
+            {"regulation_id": 1, "due_date": 1}).sort("due_date", ASCENDING):
+        current = result.get(doc["regulation_id"])
+        if current is None or current < today:
+            result[doc["regulation_id"]] = doc["due_date"]
+    return result
+
+
+def backfill(db):
+    """Reconstruit les obligations depuis `regulations` et `purchasing_regulations`"""
+    ensure_obligation_indexes(db)
+    total = sync_obligations(db, db["regulations"].find(
+        {}, {"id_loi": 1, "nom_loi": 1, "pays_concernes": 1, "jurisdiction": 1, "type": 1, "statut": 1,
+             "date_effet": 1, "date_vigueur": 1}))
+    total += sync_obligations(db, db["purchasing_regulations"].find({}, {"_id": 0}), source="purchasing")
+    refresh_horizons(db, force=True)
+    print(f"✅ {total} échéances normalisées")
+    return total
+
+
+if __name__ == "__main__":
+    from db import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "upcoming"
+    if command == "backfill":
+        backfill(db)
+    elif command == "horizons":
+        for label, count in horizon_counts(db).items():
+            print(f"📅 {label:>8}: {count}")
+    else:
+        months = int(sys.argv[2]) if len(sys.argv) > 2 else URGENT_MONTHS
+        site = sys.argv[3] if len(sys.argv) > 3 else None
+        for obligation in upcoming(db, months, site=site):
+            print(f"⏰ {obligation['due_date']:%d/%m/%Y} | {obligation['source']} | {obligation['title']} "
+                  f"({', '.join(obligation['jurisdictions'])})")
@@ -0,0 +1,312 @@
+"""
+Détection des doublons et quasi-doublons de réglementations
+(versions consolidées, modificatifs, traductions d'un même acte)
+
+- À l'ingestion : signature MinHash des shingles de mots + clés LSH par bande (index multiclé),
+  les candidats d'un lot sont récupérés en une requête puis comparés par similarité de Jaccard estimée.
+- Après l'encodage : rapprochement par cosinus des embeddings (traductions, reformulations).
+Chaque document porte un `cluster_id` et un drapeau `is_canonical` ; la recherche ne garde
+qu'un représentant par cluster.
+"""
+import hashlib
+import re
+from datetime import datetime
+
+import numpy as np
+from bson.binary import Binary
+
+# Shingles de 5 mots, 128 permutations réparties en 32 bandes de 4 lignes (seuil LSH ≈ 0,42)
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+# Seuils de rapprochement
+NEAR_DUPLICATE_JACCARD = 0.7
+EMBEDDING_DUPLICATE_COSINE = 0.95
+EMBEDDING_NEIGHBOURS = 5
+
+# Textes trop courts (ex. "...[TEXTE COMPLET DISPONIBLE VIA LE LIEN]") jamais rapprochés
+MIN_TOKENS = 30
+
+# Résultats demandés en plus à la recherche vectorielle avant regroupement par cluster
+RETRIEVAL_OVERFETCH = 3
+
+_PRIME = 4294967311  # premier > 2^32 : (a * x + b) tient sur 64 bits pour a, x, b < 2^32
+_rng = np.random.default_rng(20250926)
+_PERM_A = _rng.integers(1, 2 ** 32, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2 ** 32, NUM_PERMUTATIONS, dtype=np.uint64)
+
+# Champs de signature stockés (inutiles hors déduplication : exclus des projections d'affichage)
+SIGNATURE_FIELDS = ("minhash", "lsh_bands")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Ensemble des shingles de mots d'un texte normalisé (vide si texte trop court)"""
+    tokens = _TOKEN.findall((text or "").lower())
+    if len(tokens) < MIN_TOKENS:
+        return set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(text):
+    """Signature MinHash (uint32 x NUM_PERMUTATIONS), None si texte trop court"""
+    shingle_set = shingles(text)
+    if not shingle_set:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingle_set),
+        dtype=np.uint64, count=len(shingle_set)
+    )
+    signature = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # Par blocs pour borner la mémoire sur les textes longs
+    for start in range(0, len(hashes), 4096):
+        block = hashes[start:start + 4096]
+        permuted = (_PERM_A[:, None] * block[None, :] + _PERM_B[:, None]) % _PRIME
+        signature = np.minimum(signature, permuted.min(axis=1))
+    return (signature & 0xFFFFFFFF).astype(np.uint32)
+
+
+def lsh_bands(signature):
+    """Clés LSH (une par bande) d'une signature"""
+    return [
+        f"{band}:{hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).hexdigest()}"
+        for band in range(LSH_BANDS)
+    ]
+
+
+def estimated_jaccard(signature_a, signature_b):
+    """Similarité de Jaccard estimée entre deux signatures"""
+    return float(np.mean(signature_a == signature_b))
+
+
+def _decode_signature(value):
+    return np.frombuffer(bytes(value), dtype=np.uint32)
+
+
+def dedup_fields(doc):
+    """
+    Champs de déduplication d'une réglementation normalisée (ingestion)
+    Le document démarre seul dans son cluster ; assign_minhash_clusters le rattache ensuite.
+    """
+    signature = minhash_signature(doc.get("texte", ""))
+    fields = {
+        "cluster_id": doc["id_loi"],
+        "is_canonical": True,
+        "text_length": len(doc.get("texte", "")),
+    }
+    if signature is None:
+        fields.update({"minhash": None, "lsh_bands": []})
+    else:
+        fields.update({"minhash": Binary(signature.tobytes()), "lsh_bands": lsh_bands(signature)})
+    return fields
+
+
+def ensure_dedup_indexes(collection):
+    """Index des clés LSH (multiclé) et des clusters"""
+    collection.create_index("lsh_bands")
+    collection.create_index("cluster_id")
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Racine stable : le plus petit identifiant
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+def elect_canonical(collection, cluster_id):
+    """Représentant d'un cluster : version la plus récente, puis texte le plus long"""
+    members = list(collection.find(
+        {"cluster_id": cluster_id}, {"_id": 0, "id_loi": 1, "date_publication": 1, "text_length": 1}
+    ))
+    if not members:
+        return None
+    best = max(members, key=lambda m: (m.get("date_publication") or datetime.min, m.get("text_length") or 0,
+                                       m["id_loi"]))
+    collection.update_many({"cluster_id": cluster_id, "id_loi": {"$ne": best["id_loi"]}},
+                           {"$set": {"is_canonical": False}})
+    collection.update_one({"id_loi": best["id_loi"]}, {"$set": {"is_canonical": True}})
+    return best["id_loi"]
+
+
+def merge_pairs(collection, pairs, touched=()):
+    """
+    Fusionne les clusters des paires (id_loi, id_loi) et réélit leurs représentants
+
+    Returns:
+        int: nombre de clusters fusionnés
+    """
+    if not pairs and not touched:
+        return 0
+    ids = {regulation_id for pair in pairs for regulation_id in pair}
+    clusters = {
+        doc["id_loi"]: doc.get("cluster_id") or doc["id_loi"]
+        for doc in collection.find({"id_loi": {"$in": list(ids)}}, {"_id": 0, "id_loi": 1, "cluster_id": 1})
+    }
+
+    union_find = _UnionFind()
+    for a, b in pairs:
+        if a in clusters and b in clusters:
+            union_find.union(clusters[a], clusters[b])
+
+    components = {}
+    for cluster_id in set(clusters.values()):
+        components.setdefault(union_find.find(cluster_id), set()).add(cluster_id)
+
+    merged = 0
+    to_elect = set(touched)
+    for root, members in components.items():
+        others = [cluster_id for cluster_id in members if cluster_id != root]
+        if others:
+            collection.update_many({"cluster_id": {"$in": others}}, {"$set": {"cluster_id": root}})
+            merged += len(others)
+            to_elect.add(root)
+    for cluster_id in to_elect:
+        elect_canonical(collection, cluster_id)
+    return merged
+
+
+def assign_minhash_clusters(collection, regulation_ids, previous_clusters=()):
+    """
+    Rattache des réglementations fraîchement ingérées à leurs quasi-doublons (MinHash / LSH)
+
+    Args:
+        collection: collection `regulations`
+        regulation_ids (list): id_loi écrits par le lot d'ingestion
+        previous_clusters (iterable): clusters quittés par des documents modifiés (à réélire)
+
+    Returns:
+        int: nombre de clusters fusionnés
+    """
+    regulation_ids = list(regulation_ids)
+    # Clusters encore peuplés d'autres membres sous l'identifiant d'un document modifié : réélus
+    touched = set(collection.distinct("cluster_id", {"cluster_id": {"$in": regulation_ids},
+                                                     "id_loi": {"$nin": regulation_ids}}))
+    touched.update(previous_clusters)
+    batch = {
+        doc["id_loi"]: doc for doc in collection.find(
+            {"id_loi": {"$in": regulation_ids}, "minhash": {"$ne": None}},
+            {"_id": 0, "id_loi": 1, "minhash": 1, "lsh_bands": 1}
+        )
+    }
+    if not batch:
+        return merge_pairs(collection, set(), touched)
+
+    # Une requête pour tous les candidats du lot (collisions sur au moins une bande)
+    band_set = {band for doc in batch.values() for band in doc.get("lsh_bands", [])}
+    bands = sorted(band_set)
+    candidates_by_band = {}
+    for candidate in collection.find({"lsh_bands": {"$in": bands}}, {"_id": 0, "id_loi": 1, "minhash": 1, "lsh_bands": 1}):
+        for band in candidate.get("lsh_bands", []):
+            if band in band_set:
+                candidates_by_band.setdefault(band, []).append(candidate)
+
+    pairs = set()
+    for regulation_id, doc in batch.items():
+        signature = _decode_signature(doc["minhash"])
+        seen = set()
+        for band in doc.get("lsh_bands", []):
+            for candidate in candidates_by_band.get(band, []):
+                other = candidate["id_loi"]
+                if other == regulation_id or other in seen:
+                    continue
+                seen.add(other)
+                if estimated_jaccard(signature, _decode_signature(candidate["minhash"])) >= NEAR_DUPLICATE_JACCARD:
+                    pairs.add(tuple(sorted((regulation_id, other))))
+
+    return merge_pairs(collection, pairs, touched)
+
+
+def assign_embedding_clusters(collection, index, regulation_ids, threshold=EMBEDDING_DUPLICATE_COSINE):
+    """
+    Rapproche des réglementations encodées de leurs voisins quasi identiques (cosinus), p. ex. traductions
+
+    Args:
+        collection: collection `regulations`
+        index: EmbeddingIndex de la version servie
+        regulation_ids (list): id_loi fraîchement encodés
+
+    Returns:
+        int: nombre de clusters fusionnés
+    """
+    index.refresh()
+    rows = [index.offsets[i] for i in regulation_ids if i in index.offsets]
+    if not rows or not index.rows:
+        return 0
+
+    # Un produit matriciel pour tout le lot ; seules les lignes actives de l'index comptent
+    scores = np.asarray(index.matrix[rows]) @ np.asarray(index.matrix).T
+    scores[:, ~index.valid] = -1.0
+    pairs = set()
+    for position, row in enumerate(rows):
+        scores[position, row] = -1.0
+        neighbours = np.argpartition(-scores[position], min(EMBEDDING_NEIGHBOURS, index.rows - 1))
+        for neighbour in neighbours[:EMBEDDING_NEIGHBOURS]:
+            if scores[position, neighbour] >= threshold:
+                pairs.add(tuple(sorted((index.ids[row], index.ids[neighbour]))))
+
+    # Les textes trop courts (sans signature MinHash) ne sont jamais rapprochés
+    involved = list({regulation_id for pair in pairs for regulation_id in pair})
+    eligible = {doc["id_loi"] for doc in collection.find(
+        {"id_loi": {"$in": involved}, "minhash": {"$ne": None}}, {"_id": 0, "id_loi": 1}
+    )}
+    return merge_pairs(collection, {pair for pair in pairs if set(pair) <= eligible})
+
+
+def collapse_clusters(results, limit):
+    """Garde le mieux classé de chaque cluster (résultats triés par score décroissant)"""
+    collapsed = []
+    positions = {}
+    for reg in results:
+        key = reg.get("cluster_id") or reg.get("id_loi")
+        if key in positions:
+            collapsed[positions[key]]["cluster_variants"] += 1
+            continue
+        positions[key] = len(collapsed)
+        collapsed.append({**reg, "cluster_variants": 0})
+    return collapsed[:limit]
+
+
+def backfill_clusters(collection, batch_size=500):
+    """Calcule signatures et clusters pour les documents ingérés avant la déduplication"""
+    from pymongo import UpdateOne
+
+    ensure_dedup_indexes(collection)
+    ids = []
+    operations = []
+    cursor = collection.find({"lsh_bands": {"$exists": False}}, {"_id": 0, "id_loi": 1, "texte": 1}).batch_size(batch_size)
+    for doc in cursor:
+        operations.append(UpdateOne({"id_loi": doc["id_loi"]}, {"$set": dedup_fields(doc)}))
+        ids.append(doc["id_loi"])
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            assign_minhash_clusters(collection, ids)
+            operations, ids = [], []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        assign_minhash_clusters(collection, ids)
+    clusters = collection.count_documents({"is_canonical": True})
+    print(f"✅ Déduplication: {collection.count_documents({})} réglementations, {clusters} clusters")
+    return clusters
+
+
+if __name__ == "__main__":
+    from db import db
+
+    backfill_clusters(db["regulations"])
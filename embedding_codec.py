@@ -0,0 +1,197 @@
+"""
+Stockage compact des embeddings
+- `embedding`       : vecteur float32 normalisé en BSON Binary sous-type 9 (format vectoriel
+                      accepté par Atlas $vectorSearch), ~1,5 Ko au lieu de ~5 Ko en tableau de doubles
+- `embedding_i8`    : copie int8 (sous-type 9) pour les scans locaux, ~0,4 Ko
+- `embedding_scale` : facteur de dé-quantification de la copie int8
+La recherche locale parcourt les vecteurs int8 puis re-classe exactement les meilleurs candidats
+avec les vecteurs float32.
+"""
+import heapq
+import sys
+
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+
+# Sous-type BSON des vecteurs et octet de type (cf. spécification BSON Binary Vector)
+VECTOR_SUBTYPE = 9
+DTYPE_INT8 = 0x03
+DTYPE_FLOAT32 = 0x27
+
+
+def embedding_fields(field="embedding"):
+    """Champs écrits par encode_embedding pour un champ de base (supprimés ensemble)"""
+    return [field, f"{field}_i8", f"{field}_scale"]
+
+
+# Champs du modèle historique (all-MiniLM-L6-v2)
+EMBEDDING_FIELDS = embedding_fields()
+
+# Candidats re-classés en float32 par résultat demandé
+RESCORE_FACTOR = 4
+
+# Documents par lot lors des scans
+SCAN_BATCH_SIZE = 1000
+
+
+def _pack(dtype, array):
+    return Binary(bytes([dtype, 0]) + array.tobytes(), VECTOR_SUBTYPE)
+
+
+def quantize_int8(vector):
+    """Quantification symétrique par vecteur : (int8, échelle)"""
+    vector = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    return np.clip(np.rint(vector / scale), -127, 127).astype(np.int8), scale
+
+
+def encode_embedding(vector, field="embedding"):
+    """
+    Champs MongoDB d'un embedding
+
+    Args:
+        vector: sortie du modèle (liste ou ndarray)
+        field (str): champ de base (un champ par version de modèle, cf. embedding_models)
+
+    Returns:
+        dict: <field> (float32 normalisé), <field>_i8, <field>_scale
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector = vector / norm
+    quantized, scale = quantize_int8(vector)
+    exact_field, int8_field, scale_field = embedding_fields(field)
+    return {
+        exact_field: _pack(DTYPE_FLOAT32, vector.astype("<f4")),
+        int8_field: _pack(DTYPE_INT8, quantized),
+        scale_field: scale,
+    }
+
+
+def decode_vector(value):
+    """Vecteur float32 depuis un tableau BSON (ancien format) ou un Binary sous-type 9"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, Binary)):
+        raw = bytes(value)
+        dtype, payload = raw[0], raw[2:]
+        if dtype == DTYPE_FLOAT32:
+            return np.frombuffer(payload, dtype="<f4")
+        if dtype == DTYPE_INT8:
+            return np.frombuffer(payload, dtype=np.int8).astype(np.float32)
+        raise ValueError(f"Type de vecteur BSON non supporté: {dtype:#x}")
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_int8(doc, field="embedding"):
+    """Vecteur int8 dé-quantifié d'un document (None si absent)"""
+    _, int8_field, scale_field = embedding_fields(field)
+    if doc.get(int8_field) is None:
+        return None
+    return decode_vector(doc[int8_field]) * float(doc.get(scale_field, 1.0))
+
+
+def embedding_size_bytes(doc, field="embedding"):
+    """Taille BSON approximative des champs d'embedding d'un document"""
+    import bson
+    return len(bson.encode({name: doc[name] for name in embedding_fields(field) if name in doc}))
+
+
+def quantized_search(collection, query_vector, k=5, query=None, rescore_factor=RESCORE_FACTOR,
+                     field="embedding"):
+    """
+    Recherche locale top-k : scan int8 puis re-classement exact en float32
+
+    Args:
+        collection: collection `regulations`
+        query_vector: embedding de la requête
+        k (int): nombre de résultats
+        query (dict): filtre MongoDB optionnel
+        field (str): champ de base de la version de modèle interrogée
+
+    Returns:
+        list: [(id_loi, score cosinus)] triés par score décroissant
+    """
+    exact_field, int8_field, scale_field = embedding_fields(field)
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+    candidates_count = max(k * rescore_factor, k)
+
+    # 1. Scan des vecteurs int8 par blocs (seuls id_loi, embedding_i8 et l'échelle transitent)
+    candidates = []
+    cursor = collection.find(
+        {**(query or {}), int8_field: {"$exists": True}},
+        {"_id": 0, "id_loi": 1, int8_field: 1, scale_field: 1}
+    ).batch_size(SCAN_BATCH_SIZE)
+
+    ids, rows, scales = [], [], []
+
+    def score_block():
+        matrix = np.frombuffer(b"".join(rows), dtype=np.int8).reshape(len(rows), -1)
+        scores = (matrix.astype(np.float32) @ query_vector) * np.asarray(scales, dtype=np.float32)
+        for regulation_id, score in zip(ids, scores.tolist()):
+            if len(candidates) < candidates_count:
+                heapq.heappush(candidates, (score, regulation_id))
+            elif score > candidates[0][0]:
+                heapq.heapreplace(candidates, (score, regulation_id))
+
+    for doc in cursor:
+        ids.append(doc["id_loi"])
+        rows.append(bytes(doc[int8_field])[2:])
+        scales.append(doc.get(scale_field, 1.0))
+        if len(rows) >= SCAN_BATCH_SIZE:
+            score_block()
+            ids, rows, scales = [], [], []
+    if rows:
+        score_block()
+
+    if not candidates:
+        return []
+
+    # 2. Re-classement exact des candidats avec les vecteurs float32
+    exact = []
+    for doc in collection.find({"id_loi": {"$in": [regulation_id for _, regulation_id in candidates]}},
+                               {"_id": 0, "id_loi": 1, exact_field: 1}):
+        vector = decode_vector(doc.get(exact_field))
+        if vector is None:
+            continue
+        norm = float(np.linalg.norm(vector)) or 1.0
+        exact.append((doc["id_loi"], float(vector @ query_vector) / norm))
+    exact.sort(key=lambda item: item[1], reverse=True)
+    return exact[:k]
+
+
+def compact_embeddings(collection, batch_size=SCAN_BATCH_SIZE, field="embedding"):
+    """Convertit les embeddings stockés en tableaux de doubles vers le format binaire"""
+    converted = 0
+    operations = []
+    cursor = collection.find(
+        {field: {"$type": "array"}}, {"_id": 1, field: 1}
+    ).batch_size(batch_size)
+    for doc in cursor:
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": encode_embedding(doc[field], field)}))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            converted += len(operations)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        converted += len(operations)
+    print(f"✅ {converted} embeddings convertis au format binaire")
+    return converted
+
+
+if __name__ == "__main__":
+    from db import db
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--dry-run":
+        sample = db["regulations"].find_one({"embedding": {"$type": "array"}}, {"embedding": 1})
+        if sample:
+            before = embedding_size_bytes(sample)
+            after = embedding_size_bytes(encode_embedding(sample["embedding"]))
+            print(f"📦 {before} octets → {after} octets par document")
+    else:
+        compact_embeddings(db["regulations"])
@@ -0,0 +1,272 @@
+"""
+Index local des embeddings en mémoire projetée (np.memmap)
+Un dossier contient :
+- vectors.f32 : matrice float32 contiguë (une ligne normalisée par embedding, ajout en fin de fichier)
+- ids.txt     : table id_loi -> ligne (ligne i du fichier = ligne i de la matrice)
+- meta.json   : dimension et nombre de lignes publiées (écrit en dernier : un lecteur ne voit
+                jamais un ajout partiel)
+Les processus (workers Streamlit, batchs) partagent les mêmes pages via le cache de l'OS ;
+l'ouverture ne désérialise aucun vecteur et une recherche top-k est un seul produit matrice-vecteur.
+Un id ré-encodé est ajouté à nouveau : la dernière ligne l'emporte (compact() purge les anciennes).
+"""
+import json
+import os
+
+import numpy as np
+
+from embedding_codec import decode_vector
+
+try:
+    import fcntl
+except ImportError:  # Windows : un seul écrivain attendu
+    fcntl = None
+
+DEFAULT_INDEX_DIR = os.getenv(
+    "EMBEDDING_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_index")
+)
+DEFAULT_DIMENSION = 384
+
+VECTORS_FILE = "vectors.f32"
+IDS_FILE = "ids.txt"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+
+class EmbeddingIndex:
+    """Matrice d'embeddings projetée en mémoire + table des id_loi"""
+
+    def __init__(self, path=DEFAULT_INDEX_DIR):
+        self.path = path
+        self.dimension = DEFAULT_DIMENSION
+        self.rows = 0
+        self.matrix = np.zeros((0, self.dimension), dtype=np.float32)
+        self.ids = []
+        self.valid = np.zeros(0, dtype=bool)
+        self.offsets = {}
+        self._version = None
+        self.refresh()
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def exists(self):
+        return os.path.exists(self._file(META_FILE))
+
+    def refresh(self):
+        """Recharge la vue si un écrivain a publié de nouvelles lignes"""
+        meta = self._read_meta()
+        if meta is None:
+            return self
+        version = (meta["rows"], meta.get("generation", 0))
+        if version == self._version:
+            return self
+
+        self.dimension = meta["dimension"]
+        self.rows = meta["rows"]
+
+        with open(self._file(IDS_FILE), "r", encoding="utf-8") as f:
+            self.ids = [line.rstrip("\n") for _, line in zip(range(self.rows), f)]
+        self.rows = len(self.ids)
+
+        if self.rows:
+            self.matrix = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r",
+                                    shape=(self.rows, self.dimension))
+        else:
+            self.matrix = np.zeros((0, self.dimension), dtype=np.float32)
+
+        # Dernière ligne de chaque id = ligne active
+        self.offsets = {regulation_id: row for row, regulation_id in enumerate(self.ids)}
+        self.valid = np.zeros(self.rows, dtype=bool)
+        self.valid[list(self.offsets.values())] = True
+        self._version = version
+        return self
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, regulation_id):
+        return regulation_id in self.offsets
+
+    def vector(self, regulation_id):
+        """Vecteur normalisé d'un id_loi (vue sur la mémoire projetée)"""
+        row = self.offsets.get(regulation_id)
+        return None if row is None else self.matrix[row]
+
+    def search(self, query_vector, k=5, allowed_ids=None):
+        """
+        Top-k par similarité cosinus
+
+        Args:
+            query_vector: embedding de la requête
+            k (int): nombre de résultats
+            allowed_ids (iterable): restreint la recherche à ces id_loi
+
+        Returns:
+            list: [(id_loi, score)] triés par score décroissant
+        """
+        self.refresh()
+        if not self.rows:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+
+        scores = self.matrix @ query_vector
+        mask = self.valid
+        if allowed_ids is not None:
+            mask = np.zeros(self.rows, dtype=bool)
+            rows = [self.offsets[i] for i in allowed_ids if i in self.offsets]
+            mask[rows] = True
+        scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, int(mask.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], float(scores[row])) for row in top]
+
+    # ------------------------------------------------------------------
+    # Écriture (un seul écrivain à la fois, verrou fichier)
+    # ------------------------------------------------------------------
+
+    def _lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        handle = open(self._file(LOCK_FILE), "w")
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _read_meta(self):
+        try:
+            with open(self._file(META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _publish(self, rows, ids_bytes, generation):
+        temporary = self._file(META_FILE + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "dtype": "float32", "rows": rows,
+                       "ids_bytes": ids_bytes, "generation": generation}, f)
+        os.replace(temporary, self._file(META_FILE))
+
+    def append(self, ids, vectors):
+        """
+        Ajoute des embeddings en fin d'index
+
+        Args:
+            ids (list): id_loi
+            vectors: matrice (n, dimension) ou liste de vecteurs / Binary
+
+        Returns:
+            int: nombre de lignes publiées
+        """
+        if not ids:
+            return self.rows
+        matrix = np.vstack([decode_vector(v) for v in vectors]).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1.0)
+        self.dimension = matrix.shape[1]
+
+        lock = self._lock()
+        try:
+            meta = self._read_meta() or {"rows": 0, "ids_bytes": 0, "generation": 0}
+            # Tronquer une éventuelle écriture interrompue au-delà des lignes publiées
+            with open(self._file(VECTORS_FILE), "ab") as f:
+                f.truncate(meta["rows"] * self.dimension * 4)
+                f.write(matrix.tobytes())
+            table = "".join(f"{regulation_id}\n" for regulation_id in ids).encode("utf-8")
+            with open(self._file(IDS_FILE), "ab") as f:
+                f.truncate(meta["ids_bytes"])
+                f.write(table)
+            self._publish(meta["rows"] + len(ids), meta["ids_bytes"] + len(table), meta["generation"])
+        finally:
+            lock.close()
+        return self.refresh().rows
+
+    def _write_all(self, batches):
+        """Réécrit l'index à partir de lots (ids, vecteurs) puis publie atomiquement"""
+        lock = self._lock()
+        try:
+            rows, ids_bytes = 0, 0
+            generation = (self._read_meta() or {}).get("generation", 0) + 1
+            vectors_tmp = self._file(VECTORS_FILE + ".tmp")
+            ids_tmp = self._file(IDS_FILE + ".tmp")
+            with open(vectors_tmp, "wb") as vf, open(ids_tmp, "wb") as idf:
+                for ids, matrix in batches:
+                    self.dimension = matrix.shape[1]
+                    vf.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+                    table = "".join(f"{regulation_id}\n" for regulation_id in ids).encode("utf-8")
+                    idf.write(table)
+                    rows += len(ids)
+                    ids_bytes += len(table)
+            # Les lecteurs déjà ouverts gardent l'ancien fichier (inode) jusqu'au prochain refresh
+            os.replace(vectors_tmp, self._file(VECTORS_FILE))
+            os.replace(ids_tmp, self._file(IDS_FILE))
+            self._publish(rows, ids_bytes, generation)
+        finally:
+            lock.close()
+        return self.refresh()
+
+    def compact(self):
+        """Supprime les lignes remplacées par un ré-encodage"""
+        self.refresh()
+        live = sorted(self.offsets.values())
+        ids = [self.ids[row] for row in live]
+        matrix = np.array(self.matrix[live]) if live else np.zeros((0, self.dimension), np.float32)
+        return self._write_all([(ids, matrix)])
+
+    def rebuild(self, collection, batch_size=1000, query=None, field="embedding"):
+        """Reconstruit l'index complet depuis la collection (lecture en flux des embeddings)"""
+        def batches():
+            ids, vectors = [], []
+            cursor = collection.find(
+                {**(query or {}), field: {"$exists": True}}, {"_id": 0, "id_loi": 1, field: 1}
+            ).batch_size(batch_size)
+            for doc in cursor:
+                ids.append(doc["id_loi"])
+                vectors.append(decode_vector(doc[field]))
+                if len(ids) >= batch_size:
+                    yield ids, _normalized(vectors)
+                    ids, vectors = [], []
+            if ids:
+                yield ids, _normalized(vectors)
+
+        index = self._write_all(batches())
+        print(f"✅ Index d'embeddings reconstruit: {len(index)} vecteurs ({self.path})")
+        return index
+
+
+def _normalized(vectors):
+    matrix = np.vstack(vectors).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+_shared_index = None
+
+
+def get_index(path=DEFAULT_INDEX_DIR):
+    """Index partagé du processus (None si aucun index n'a encore été construit)"""
+    global _shared_index
+    if _shared_index is None or _shared_index.path != path:
+        _shared_index = EmbeddingIndex(path)
+    return _shared_index.refresh() if _shared_index.exists() else None
+
+
+if __name__ == "__main__":
+    import sys
+    from db import db
+    from embedding_models import index_path, model_spec
+
+    # Index de la version servie (EMBEDDING_MODEL_VERSION)
+    index = EmbeddingIndex(index_path())
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        index.compact()
+        print(f"✅ Index compacté: {len(index)} vecteurs")
+    else:
+        index.rebuild(db["regulations"], field=model_spec()["field"])
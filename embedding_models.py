@@ -0,0 +1,220 @@
+"""
+Versions des modèles d'embedding et migration en ligne
+Chaque version écrit ses vecteurs dans ses propres champs (cf. embedding_codec) et a son propre
+index Atlas / index memmap : une recherche ne compare jamais des vecteurs de modèles différents.
+
+- EMBEDDING_MODEL_VERSION     : version servie (requêtes et recherche)
+- EMBEDDING_MIGRATION_TARGET  : version en cours de déploiement (double écriture + ré-encodage en tâche de fond)
+
+Déploiement d'un nouveau modèle sans interruption :
+    1. EMBEDDING_MIGRATION_TARGET=<nouvelle> : add_embeddings écrit les deux versions
+    2. python embedding_models.py reembed <nouvelle> : complète le corpus (débit limité)
+    3. python embedding_models.py status : couverture à 100 % -> EMBEDDING_MODEL_VERSION=<nouvelle>
+    4. python embedding_models.py drop <ancienne> : libère les anciens champs
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from dedup import SIGNATURE_FIELDS
+from embedding_codec import embedding_fields, encode_embedding
+from embedding_index import DEFAULT_INDEX_DIR, EmbeddingIndex
+
+# Registre des versions : modèle, dimension, champ MongoDB et index Atlas associés
+EMBEDDING_MODELS = {
+    "minilm-l6-v1": {
+        "model": "all-MiniLM-L6-v2",
+        "dimension": 384,
+        "field": "embedding",
+        "atlas_index": "vector_index",
+        "max_seq_length": 256,
+    },
+    "multilingual-minilm-l12-v1": {
+        "model": "paraphrase-multilingual-MiniLM-L12-v2",
+        "dimension": 384,
+        "field": "embedding_mml12",
+        "atlas_index": "vector_index_mml12",
+        "max_seq_length": 128,
+    },
+}
+
+ACTIVE_VERSION = os.getenv("EMBEDDING_MODEL_VERSION", "minilm-l6-v1")
+MIGRATION_TARGET = os.getenv("EMBEDDING_MIGRATION_TARGET") or None
+
+# Moteur d'inférence : torch (sentence-transformers), onnx ou onnx-int8 (cf. embedding_onnx)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Ré-encodage en tâche de fond : taille des lots et plafond de documents par seconde
+REEMBED_BATCH_SIZE = 32
+REEMBED_MAX_DOCS_PER_SECOND = 20
+
+_models = {}
+
+
+def model_spec(version=None):
+    """Description d'une version (ValueError si inconnue)"""
+    version = version or ACTIVE_VERSION
+    if version not in EMBEDDING_MODELS:
+        raise ValueError(f"Version d'embedding inconnue: {version} (connues: {', '.join(EMBEDDING_MODELS)})")
+    return EMBEDDING_MODELS[version]
+
+
+def write_versions():
+    """Versions écrites à chaque encodage : servie + cible de migration (double écriture)"""
+    versions = [ACTIVE_VERSION]
+    if MIGRATION_TARGET and MIGRATION_TARGET != ACTIVE_VERSION:
+        model_spec(MIGRATION_TARGET)
+        versions.append(MIGRATION_TARGET)
+    return versions
+
+
+def all_embedding_fields():
+    """Tous les champs d'embedding connus (suppression groupée, projections)"""
+    fields = ["embedding_meta"]
+    for spec in EMBEDDING_MODELS.values():
+        fields.extend(embedding_fields(spec["field"]))
+    return fields
+
+
+def without_heavy_fields(projection=None):
+    """Projection excluant vecteurs (toutes versions) et signatures MinHash, pour l'affichage"""
+    return {**(projection or {}), **{field: 0 for field in [*all_embedding_fields(), *SIGNATURE_FIELDS]}}
+
+
+def get_model(version=None, backend=None):
+    """Modèle d'une version, chargé une seule fois par processus et par moteur"""
+    version = version or ACTIVE_VERSION
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Moteur d'embedding inconnu: {backend} (connus: {', '.join(EMBEDDING_BACKENDS)})")
+
+    if (version, backend) not in _models:
+        spec = model_spec(version)
+        name = spec["model"]
+        if backend == "torch":
+            from sentence_transformers import SentenceTransformer
+            _models[(version, backend)] = SentenceTransformer(name)
+        else:
+            from embedding_onnx import OnnxSentenceEncoder
+            # Même troncature que sentence-transformers (128 tokens pour MiniLM-L12 multilingue)
+            _models[(version, backend)] = OnnxSentenceEncoder(name, quantized=backend == "onnx-int8",
+                                                              max_seq_length=spec.get("max_seq_length"))
+    return _models[(version, backend)]
+
+
+def index_path(version=None):
+    """Dossier de l'index memmap d'une version"""
+    return os.path.join(DEFAULT_INDEX_DIR, version or ACTIVE_VERSION)
+
+
+def version_fields(vector, version=None):
+    """Champs $set d'un embedding pour une version (vecteurs + métadonnées)"""
+    version = version or ACTIVE_VERSION
+    spec = model_spec(version)
+    return {
+        **encode_embedding(vector, spec["field"]),
+        f"embedding_meta.{version}": {
+            "model": spec["model"],
+            "dimension": spec["dimension"],
+            "encoded_at": datetime.now(),
+        },
+    }
+
+
+def missing_query(version=None):
+    """Filtre des documents sans vecteur pour une version"""
+    return {model_spec(version)["field"]: {"$exists": False}}
+
+
+def reembed(collection, version, batch_size=REEMBED_BATCH_SIZE,
+            max_docs_per_second=REEMBED_MAX_DOCS_PER_SECOND, limit=None):
+    """
+    Ré-encodage en tâche de fond d'une version, reprenable et à débit limité
+
+    Args:
+        collection: collection `regulations`
+        version (str): version à compléter
+        batch_size (int): textes encodés par appel au modèle
+        max_docs_per_second (float): plafond de débit (préserve la base et le CPU du service)
+        limit (int): nombre maximum de documents traités
+
+    Returns:
+        int: documents encodés
+    """
+    from embedding_service import get_encoder
+
+    model = get_encoder(version)
+    index = EmbeddingIndex(index_path(version))
+    done = 0
+    started = time.monotonic()
+
+    while limit is None or done < limit:
+        size = batch_size if limit is None else min(batch_size, limit - done)
+        batch = list(collection.find(missing_query(version), {"_id": 1, "id_loi": 1, "texte": 1}).limit(size))
+        if not batch:
+            break
+
+        vectors = model.encode([doc.get("texte", "") for doc in batch])
+        collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": version_fields(vector, version)})
+            for doc, vector in zip(batch, vectors)
+        ], ordered=False)
+        index.append([doc["id_loi"] for doc in batch], vectors)
+        done += len(batch)
+
+        # Limitation de débit : attendre pour ne pas dépasser max_docs_per_second
+        expected = done / max_docs_per_second if max_docs_per_second else 0
+        elapsed = time.monotonic() - started
+        if expected > elapsed:
+            time.sleep(expected - elapsed)
+        print(f"🔄 {version}: {done} documents ré-encodés")
+
+    print(f"✅ Ré-encodage {version} terminé: {done} documents")
+    return done
+
+
+def migration_status(collection):
+    """Couverture de chaque version sur le corpus"""
+    total = collection.count_documents({})
+    status = {}
+    for version, spec in EMBEDDING_MODELS.items():
+        encoded = collection.count_documents({spec["field"]: {"$exists": True}})
+        status[version] = {
+            "encoded": encoded,
+            "total": total,
+            "coverage": encoded / total if total else 0.0,
+            "active": version == ACTIVE_VERSION,
+            "target": version == MIGRATION_TARGET,
+        }
+    return status
+
+
+def drop_version(collection, version):
+    """Supprime les vecteurs d'une version retirée (refuse la version servie)"""
+    if version == ACTIVE_VERSION:
+        raise ValueError("Impossible de supprimer la version servie")
+    spec = model_spec(version)
+    unset = {field: "" for field in embedding_fields(spec["field"])}
+    unset[f"embedding_meta.{version}"] = ""
+    result = collection.update_many({spec["field"]: {"$exists": True}}, {"$unset": unset})
+    print(f"🗑️ {result.modified_count} embeddings {version} supprimés")
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    from db import db
+
+    regulations = db["regulations"]
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "reembed":
+        reembed(regulations, sys.argv[2] if len(sys.argv) > 2 else MIGRATION_TARGET or ACTIVE_VERSION)
+    elif command == "drop" and len(sys.argv) > 2:
+        drop_version(regulations, sys.argv[2])
+    else:
+        for version, info in migration_status(regulations).items():
+            flags = " (servie)" if info["active"] else " (cible)" if info["target"] else ""
+            print(f"📊 {version}{flags}: {info['encoded']}/{info['total']} ({info['coverage']:.0%})")
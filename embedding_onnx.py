@@ -0,0 +1,217 @@
+"""
+Encodeur ONNX Runtime (CPU) pour les modèles sentence-transformers
+Export ONNX du transformer, quantification dynamique int8 optionnelle, puis inférence ONNX Runtime
+avec le même post-traitement que sentence-transformers (mean pooling + normalisation L2).
+Sélection via EMBEDDING_BACKEND=onnx | onnx-int8 (cf. embedding_models.get_model).
+
+Vérification d'équivalence avec PyTorch :
+    python embedding_onnx.py [all-MiniLM-L6-v2] [--int8]
+"""
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+ONNX_CACHE_DIR = os.getenv(
+    "EMBEDDING_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".onnx_models")
+)
+
+# Threads intra-op ONNX Runtime (par défaut : tous les cœurs du processus)
+ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0")) or os.cpu_count() or 1
+
+# Longueur maximale (tokens) si ni le registre ni sentence_bert_config.json ne la donnent
+DEFAULT_MAX_SEQ_LENGTH = 256
+SBERT_CONFIG = "sentence_bert_config.json"
+DEFAULT_BATCH_SIZE = 32
+
+# Cosinus minimal attendu entre PyTorch et ONNX
+MIN_COSINE_FP32 = 0.999
+MIN_COSINE_INT8 = 0.98
+
+EQUIVALENCE_SENTENCES = [
+    "Regulation on automotive sealing systems and emission standards",
+    "Directive sur la fabrication pharmaceutique et les bonnes pratiques",
+    "Carbon Border Adjustment Mechanism reporting obligations for steel and aluminium importers",
+    "Federal Aviation Regulation 145.67 - Aircraft Vibration Control",
+    "中华人民共和国网络安全法",
+    "Verordnung über die Sorgfaltspflichten in der Lieferkette",
+    "...[TEXTE COMPLET DISPONIBLE VIA LE LIEN]",
+    # Texte long : vérifie la troncature (max_seq_length) identique à sentence-transformers
+    " ".join(["Operators shall exercise due diligence before placing rubber products on the Union market."] * 40),
+]
+
+
+def _hub_name(model_name):
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def _save_sbert_config(model_name, directory):
+    """Copie sentence_bert_config.json (max_seq_length du modèle) à côté de l'export"""
+    if os.path.exists(os.path.join(directory, SBERT_CONFIG)):
+        return
+    try:
+        from huggingface_hub import hf_hub_download
+        shutil.copy(hf_hub_download(_hub_name(model_name), SBERT_CONFIG), os.path.join(directory, SBERT_CONFIG))
+    except Exception as e:
+        print(f"⚠️ {SBERT_CONFIG} indisponible pour {model_name}: {e}")
+
+
+def exported_max_seq_length(directory, tokenizer=None):
+    """Troncature de sentence-transformers pour un export (config, sinon limite du tokenizer)"""
+    try:
+        with open(os.path.join(directory, SBERT_CONFIG), "r", encoding="utf-8") as f:
+            return int(json.load(f)["max_seq_length"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    limit = getattr(tokenizer, "model_max_length", None) or DEFAULT_MAX_SEQ_LENGTH
+    return min(limit, DEFAULT_MAX_SEQ_LENGTH)
+
+
+def export_onnx(model_name, quantized=False, cache_dir=ONNX_CACHE_DIR):
+    """
+    Exporte le transformer en ONNX (et sa version int8) si absent du cache
+
+    Returns:
+        str: chemin du fichier .onnx à charger
+    """
+    directory = os.path.join(cache_dir, model_name.replace("/", "__"))
+    fp32_path = os.path.join(directory, "model.onnx")
+    int8_path = os.path.join(directory, "model-int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        print(f"📦 Export ONNX de {model_name}...")
+        os.makedirs(directory, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+        model = AutoModel.from_pretrained(_hub_name(model_name)).eval()
+        tokenizer.save_pretrained(directory)
+
+        sample = tokenizer(["export"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model, tuple(sample[name] for name in input_names), fp32_path,
+                input_names=input_names, output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes, opset_version=14,
+            )
+    _save_sbert_config(model_name, directory)
+
+    if quantized and not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"📦 Quantification int8 de {model_name}...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    return int8_path if quantized else fp32_path
+
+
+class OnnxSentenceEncoder:
+    """Encodeur compatible SentenceTransformer.encode, exécuté par ONNX Runtime"""
+
+    def __init__(self, model_name, quantized=False, threads=ONNX_THREADS, cache_dir=ONNX_CACHE_DIR,
+                 max_seq_length=None):
+        if ort is None:
+            raise ImportError("onnxruntime n'est pas installé (pip install onnxruntime)")
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantized = quantized
+        path = export_onnx(model_name, quantized, cache_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(path))
+        self.max_seq_length = max_seq_length or exported_max_seq_length(os.path.dirname(path), self.tokenizer)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def encode(self, sentences, batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+        """Embeddings normalisés (1D pour un texte, 2D pour une liste), comme SentenceTransformer"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Tri par longueur : lots homogènes, moins de padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        output = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for position, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                output[position] = vector
+
+        embeddings = np.vstack(output)
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length,
+                                return_tensors="np")
+        feed = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feed)[0]
+
+        # Mean pooling sur les tokens réels puis normalisation L2 (pipeline sentence-transformers)
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def check_equivalence(model_name="all-MiniLM-L6-v2", quantized=False, sentences=None, repeat=5):
+    """
+    Compare l'encodeur ONNX à la sortie PyTorch (cosinus) et mesure le débit
+
+    Returns:
+        dict: cosinus min / moyen, débits (textes/s), succès selon le seuil
+    """
+    from sentence_transformers import SentenceTransformer
+
+    sentences = sentences or EQUIVALENCE_SENTENCES
+    reference_model = SentenceTransformer(model_name)
+    onnx_model = OnnxSentenceEncoder(model_name, quantized, max_seq_length=reference_model.max_seq_length)
+
+    reference = reference_model.encode(sentences, normalize_embeddings=True)
+    candidate = onnx_model.encode(sentences)
+    cosines = np.sum(reference * candidate, axis=1)
+
+    def throughput(encoder):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            encoder.encode(sentences)
+        return repeat * len(sentences) / (time.perf_counter() - started)
+
+    threshold = MIN_COSINE_INT8 if quantized else MIN_COSINE_FP32
+    result = {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "torch_per_second": throughput(reference_model),
+        "onnx_per_second": throughput(onnx_model),
+        "threshold": threshold,
+        "ok": bool(cosines.min() >= threshold),
+    }
+    return result
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    int8 = "--int8" in sys.argv
+    result = check_equivalence(args[0] if args else "all-MiniLM-L6-v2", quantized=int8)
+    print(f"{'✅' if result['ok'] else '❌'} Cosinus PyTorch/ONNX{' int8' if int8 else ''}: "
+          f"min {result['min_cosine']:.4f}, moyen {result['mean_cosine']:.4f} (seuil {result['threshold']})")
+    print(f"🚀 PyTorch {result['torch_per_second']:.0f} textes/s, ONNX {result['onnx_per_second']:.0f} textes/s "
+          f"(x{result['onnx_per_second'] / result['torch_per_second']:.1f})")
+    sys.exit(0 if result["ok"] else 1)
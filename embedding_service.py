@@ -0,0 +1,273 @@
+"""
+Service d'encodage multi-processus avec micro-batching par longueur
+Les demandes (backfill add_embeddings, requêtes retrieve_relevant_regulations) passent par une file
+locale : un thread regroupe les textes arrivés pendant une courte fenêtre, les trie par longueur
+estimée en tokens et forme des lots à budget de padding constant, consommés par un pool de
+processus épinglés chacun sur un sous-ensemble de cœurs.
+Chaque lot est confié à un worker précis (le moins chargé) : si ce worker meurt, ses lots échouent
+aussitôt au lieu d'attendre RESULT_TIMEOUT_S.
+
+EMBEDDING_WORKERS=0 (défaut) : encodage dans le processus, comme avant.
+"""
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+
+# Fenêtre de micro-batching (attente max d'autres demandes après la première)
+MAX_WAIT_MS = 5
+# Textes max par lot et budget de tokens (lot x longueur du plus long texte, padding inclus)
+MAX_BATCH_SIZE = 64
+MAX_BATCH_TOKENS = 8192
+# Troncature du modèle (tokens)
+MAX_SEQ_TOKENS = 256
+# Attente max d'un résultat avant erreur (worker bloqué ; un worker mort est détecté plus tôt)
+RESULT_TIMEOUT_S = 300
+# Période de vérification des workers (secondes)
+WORKER_CHECK_S = 0.5
+
+
+def estimate_tokens(text):
+    """Longueur approximative en tokens (≈ 4 caractères par token), plafonnée à la troncature"""
+    return min(len(text) // 4 + 2, MAX_SEQ_TOKENS)
+
+
+def plan_batches(lengths, max_batch_size=MAX_BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """
+    Regroupe des indices par longueur croissante en lots dont le coût paddé reste sous le budget
+
+    Returns:
+        list: lots d'indices
+    """
+    batches = []
+    current, longest = [], 0
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        longest_if_added = max(longest, lengths[index])
+        if current and (len(current) >= max_batch_size or
+                        (len(current) + 1) * longest_if_added > max_batch_tokens):
+            batches.append(current)
+            current, longest_if_added = [], lengths[index]
+        current.append(index)
+        longest = longest_if_added
+    if current:
+        batches.append(current)
+    return batches
+
+
+def core_groups(workers):
+    """Répartit les cœurs disponibles en groupes contigus, un par worker"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    workers = max(1, min(workers, len(cores)))
+    size = len(cores) // workers
+    return [cores[i * size:(i + 1) * size] if i < workers - 1 else cores[i * size:] for i in range(workers)]
+
+
+def _worker_main(version, backend, cores, tasks, results):
+    """Processus worker : épinglage, threads limités à ses cœurs, boucle d'encodage"""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    threads = str(max(len(cores), 1))
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "EMBEDDING_ONNX_THREADS"):
+        os.environ[variable] = threads
+    try:
+        import torch
+        torch.set_num_threads(int(threads))
+    except ImportError:
+        pass
+
+    from embedding_models import get_model
+    model = get_model(version, backend)
+    results.put(("ready", None, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        batch_id, texts = task
+        try:
+            results.put((batch_id, np.asarray(model.encode(texts, batch_size=len(texts)), dtype=np.float32), None))
+        except Exception as e:
+            results.put((batch_id, None, repr(e)))
+
+
+class _Request:
+    __slots__ = ("texts", "future", "vectors", "remaining")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+        self.vectors = [None] * len(texts)
+        self.remaining = len(texts)
+
+
+class EmbeddingService:
+    """Pool de workers d'encodage alimenté par une file locale avec micro-batching"""
+
+    def __init__(self, version=None, backend=None, workers=EMBEDDING_WORKERS or os.cpu_count() or 1):
+        context = mp.get_context("spawn")
+        self._results = context.Queue()
+        self._pending = queue.Queue()
+        # batch_id -> (worker, [(demande, position)]) ; lots en cours par worker
+        self._inflight = {}
+        self._dead = set()
+        self._lock = threading.Lock()
+        self._next_batch = 0
+        self._closed = False
+
+        groups = core_groups(workers)
+        self._tasks = [context.Queue() for _ in groups]
+        self._load = [0] * len(groups)
+        self.processes = [
+            context.Process(target=_worker_main, args=(version, backend, cores, tasks, self._results),
+                            daemon=True)
+            for cores, tasks in zip(groups, self._tasks)
+        ]
+        for process in self.processes:
+            process.start()
+        # Attendre le chargement du modèle dans chaque worker
+        for _ in self.processes:
+            self._results.get(timeout=RESULT_TIMEOUT_S)
+
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+        threading.Thread(target=self._collect_loop, daemon=True).start()
+        atexit.register(self.close)
+        print(f"✅ Service d'embedding: {len(self.processes)} workers")
+
+    def submit(self, texts):
+        """Met des textes en file, retourne un Future (ndarray n x dimension)"""
+        if self._closed:
+            raise RuntimeError("Service d'embedding arrêté")
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+        else:
+            self._pending.put(request)
+        return request.future
+
+    def encode(self, sentences, batch_size=None, **kwargs):
+        """Interface SentenceTransformer.encode : 1D pour un texte, 2D pour une liste"""
+        single = isinstance(sentences, str)
+        vectors = self.submit([sentences] if single else sentences).result(timeout=RESULT_TIMEOUT_S)
+        return vectors[0] if single else vectors
+
+    def _dispatch_loop(self):
+        while not self._closed:
+            try:
+                requests = [self._pending.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            # Fenêtre de micro-batching : regrouper les demandes arrivées entre-temps
+            deadline = time.monotonic() + MAX_WAIT_MS / 1000
+            while sum(len(r.texts) for r in requests) < MAX_BATCH_SIZE * len(self.processes):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    requests.append(self._pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            items = [(request, position) for request in requests for position in range(len(request.texts))]
+            lengths = [estimate_tokens(request.texts[position]) for request, position in items]
+            for batch in plan_batches(lengths):
+                members = [items[i] for i in batch]
+                with self._lock:
+                    alive = [w for w in range(len(self.processes)) if w not in self._dead]
+                    if not alive:
+                        worker = None
+                    else:
+                        worker = min(alive, key=lambda w: self._load[w])
+                        batch_id = self._next_batch
+                        self._next_batch += 1
+                        self._inflight[batch_id] = (worker, members)
+                        self._load[worker] += 1
+                if worker is None:
+                    self._fail(members, "aucun worker d'embedding actif")
+                    continue
+                self._tasks[worker].put((batch_id, [request.texts[position] for request, position in members]))
+
+    @staticmethod
+    def _fail(members, reason):
+        for request, _ in members:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError(f"Erreur worker d'embedding: {reason}"))
+
+    def _check_workers(self):
+        """Lots des workers morts en échec immédiat"""
+        for worker, process in enumerate(self.processes):
+            if worker in self._dead or process.is_alive():
+                continue
+            # Lots jamais lus : ne pas bloquer la sortie du processus sur le vidage de la file
+            self._tasks[worker].cancel_join_thread()
+            with self._lock:
+                self._dead.add(worker)
+                lost = [batch_id for batch_id, (owner, _) in self._inflight.items() if owner == worker]
+                members = [member for batch_id in lost for member in self._inflight.pop(batch_id)[1]]
+            print(f"❌ Worker d'embedding {worker} arrêté (code {process.exitcode}), {len(lost)} lots en échec")
+            self._fail(members, f"worker {worker} arrêté (code {process.exitcode})")
+
+    def _collect_loop(self):
+        last_check = time.monotonic()
+        while not self._closed:
+            if time.monotonic() - last_check >= WORKER_CHECK_S:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                batch_id, vectors, error = self._results.get(timeout=WORKER_CHECK_S)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                worker, members = self._inflight.pop(batch_id, (None, []))
+                if worker is not None:
+                    self._load[worker] -= 1
+            for offset, (request, position) in enumerate(members):
+                if request.future.done():
+                    continue
+                if error:
+                    request.future.set_exception(RuntimeError(f"Erreur worker d'embedding: {error}"))
+                    continue
+                request.vectors[position] = vectors[offset]
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.future.set_result(np.vstack(request.vectors))
+
+    def close(self):
+        """Arrête les workers"""
+        if self._closed:
+            return
+        self._closed = True
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+
+
+_services = {}
+
+
+def get_encoder(version=None):
+    """
+    Encodeur à utiliser pour une version : service multi-processus si EMBEDDING_WORKERS > 0,
+    sinon le modèle chargé dans le processus
+    """
+    from embedding_models import ACTIVE_VERSION, get_model
+
+    version = version or ACTIVE_VERSION
+    if EMBEDDING_WORKERS <= 0:
+        return get_model(version)
+    if version not in _services:
+        _services[version] = EmbeddingService(version, workers=EMBEDDING_WORKERS)
+    return _services[version]
@@ -1,17 +1,65 @@
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
+from pymongo import UpdateOne
 from db import db  # <--- on importe la connexion propre
+from dedup import assign_embedding_clusters
+from embedding_codec import decode_vector
+from embedding_index import EmbeddingIndex
+from embedding_models import ACTIVE_VERSION, index_path, missing_query, model_spec, version_fields, write_versions
+from embedding_service import get_encoder
 
-# Modèle d'embedding (384 dimensions)
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Textes envoyés ensemble à l'encodeur (triés et découpés par longueur, cf. embedding_service)
+ENCODE_CHUNK = 256
+
+def _reusable_vectors(regulations, version, docs):
+    """Vecteurs déjà calculés pour des textes identiques (doublons exacts, même text_hash)"""
+    field = model_spec(version)["field"]
+    hashes = [doc["text_hash"] for doc in docs if doc.get("text_hash")]
+    if not hashes:
+        return {}
+    return {
+        twin["text_hash"]: decode_vector(twin[field])
+        for twin in regulations.find({"text_hash": {"$in": hashes}, field: {"$exists": True}},
+                                     {"_id": 0, "text_hash": 1, field: 1})
+    }
+
+def _encode_chunk(regulations, index, encoder, version, docs):
+    # Les doublons exacts reprennent le vecteur existant au lieu d'être ré-encodés
+    reusable = _reusable_vectors(regulations, version, docs)
+    to_encode = [doc for doc in docs if doc.get("text_hash") not in reusable]
+    encoded = encoder.encode([doc["texte"] for doc in to_encode]) if to_encode else []
+    vectors_by_id = {doc["id_loi"]: vector for doc, vector in zip(to_encode, encoded)}
+    vectors = [vectors_by_id.get(doc["id_loi"], reusable.get(doc.get("text_hash"))) for doc in docs]
+
+    # Stockage binaire compact (float32 + copie int8), cf. embedding_codec
+    regulations.bulk_write([
+        UpdateOne({"_id": doc["_id"]}, {"$set": version_fields(vector, version)})
+        for doc, vector in zip(docs, vectors)
+    ], ordered=False)
+    index.append([doc["id_loi"] for doc in docs], vectors)
+    for doc in docs:
+        print(f"✅ Embedding {version} ajouté pour {doc['id_loi']}")
+    if len(docs) > len(to_encode):
+        print(f"♻️ {len(docs) - len(to_encode)} vecteurs repris de textes identiques")
+
+    # Quasi-doublons sémantiques (traductions, reformulations) sur la version servie
+    if version == ACTIVE_VERSION:
+        assign_embedding_clusters(regulations, index, [doc["id_loi"] for doc in docs])
 
 def add_embeddings():
-    """Ajoute un embedding pour chaque loi qui n’en a pas encore"""
+    """Ajoute un embedding pour chaque loi qui n’en a pas encore (version servie + cible de migration)"""
     regulations = db["regulations"]
-    for doc in regulations.find({"embedding": {"$exists": False}}):
-        emb = model.encode(doc["texte"]).tolist()
-        regulations.update_one({"_id": doc["_id"]}, {"$set": {"embedding": emb}})
-        print(f"✅ Embedding ajouté pour {doc['id_loi']}")
+    # Double écriture pendant une migration : chaque version a ses champs, son modèle et son index
+    for version in write_versions():
+        encoder = get_encoder(version)
+        index = EmbeddingIndex(index_path(version))
+        docs = []
+        for doc in regulations.find(missing_query(version), {"_id": 1, "id_loi": 1, "texte": 1, "text_hash": 1}):
+            docs.append(doc)
+            if len(docs) >= ENCODE_CHUNK:
+                _encode_chunk(regulations, index, encoder, version, docs)
+                docs = []
+        if docs:
+            _encode_chunk(regulations, index, encoder, version, docs)
 
 if __name__ == "__main__":
     add_embeddings()
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+Moteur d'émissions vectorisé pour le service achats
+Calcule en une seule passe NumPy le tenseur fournisseurs × sites × chaînes de transport
+(distance, émissions, temps) et mémoïse les résultats par scénario de volumes
+Partagé entre les sessions Streamlit (st.cache_resource) : cache de scénarios et extension du tenseur
+sous verrou
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Rayon terrestre moyen (km) utilisé pour la distance orthodromique
+EARTH_RADIUS_KM = 6371.0088
+
+# Répartition approximative des distances selon le nombre de segments de la chaîne
+CHAIN_SPLITS = {
+    1: (1.0,),
+    2: (0.3, 0.7),        # Ex: Route -> Maritime ou Train -> Route
+    3: (0.2, 0.6, 0.2),   # Ex: Route -> Maritime -> Train
+}
+
+# Seuils de couleur des marqueurs (kg CO2)
+EMISSION_THRESHOLDS = (8000, 20000)
+
+# Nombre de scénarios de volumes gardés en mémoire
+MAX_CACHED_SCENARIOS = 64
+
+
+def haversine_matrix(origins, destinations):
+    """Matrice des distances orthodromiques (km) entre deux listes de coordonnées [lat, lon]"""
+    origins = np.radians(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=np.float64).reshape(-1, 2))
+
+    lat1 = origins[:, 0][:, None]
+    lon1 = origins[:, 1][:, None]
+    lat2 = destinations[:, 0][None, :]
+    lon2 = destinations[:, 1][None, :]
+
+    h = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def chain_splits(chain):
+    """Fractions de distance parcourues par chaque mode de la chaîne"""
+    return CHAIN_SPLITS.get(len(chain), (1.0 / len(chain),) * len(chain))
+
+
+def material_matches(product, materiau):
+    """Un produit demandé correspond à un matériau fournisseur s'il en fait partie ("caoutchouc" -> "Caoutchouc naturel")"""
+    return product.lower() in materiau.lower()
+
+
+def emissions_color(emissions):
+    """Couleur du marqueur selon les émissions totales (kg CO2)"""
+    low, high = EMISSION_THRESHOLDS
+    if emissions < low:
+        return "green"
+    elif emissions < high:
+        return "orange"
+    return "red"
+
+
+class EmissionsEngine:
+    """
+    Tenseur d'émissions pré-calculé pour tous les couples fournisseur/site
+    Les distances et facteurs par tonne sont calculés une fois, chaque scénario
+    (site, volumes par produit, chaîne) n'est qu'une sélection + produit vectoriel
+    """
+
+    def __init__(self, suppliers, sites, transport_modes, chains=(),
+                 auto_chain=None, site_continent=None, routes=None):
+        self.suppliers = list(suppliers)
+        self.site_names = list(sites.keys())
+        self._site_index = {name: i for i, name in enumerate(self.site_names)}
+        self.transport_modes = transport_modes
+
+        # Chaînes connues (manuelles + automatiques), dédupliquées en gardant l'ordre
+        self.chains = []
+        self._chain_index = {}
+        for chain in chains:
+            self._register_chain(chain)
+
+        # Chaîne automatique par couple (fournisseur, site) selon les continents
+        self.auto_chain_idx = None
+        if auto_chain is not None:
+            site_continents = [
+                site_continent(name) if site_continent else "Europe"
+                for name in self.site_names
+            ]
+            pair_cache = {}
+            auto_idx = np.zeros((len(self.suppliers), len(self.site_names)), dtype=np.intp)
+            for s, supplier in enumerate(self.suppliers):
+                for t, continent in enumerate(site_continents):
+                    pair = (supplier.get("continent"), continent)
+                    if pair not in pair_cache:
+                        pair_cache[pair] = self._register_chain(auto_chain(*pair))
+                    auto_idx[s, t] = pair_cache[pair]
+            self.auto_chain_idx = auto_idx
+
+        # Coefficients par chaîne : kg CO2 par tonne.km et heures par km
+        coefficients = np.array([self._chain_coefficients(c) for c in self.chains]).reshape(-1, 2)
+        factor_per_km, hours_per_km = coefficients[:, 0], coefficients[:, 1]
+
+        supplier_coords = [s["coordinates"] for s in self.suppliers]
+        site_coords = [sites[name] for name in self.site_names]
+
+        # Tenseurs (S, T) et (S, T, C)
+        self.distance_km = haversine_matrix(supplier_coords, site_coords)
+        self.transport_kg_per_tonne = self.distance_km[:, :, None] * factor_per_km[None, None, :]
+        self.transport_hours = self.distance_km[:, :, None] * hours_per_km[None, None, :]
+        self.production_kg_per_tonne = np.array(
+            [s.get("emissions_co2_kg_tonne", 0) for s in self.suppliers], dtype=np.float64
+        )
+
+        # Itinéraires multimodaux pré-calculés (RouteTable) : remplacent les répartitions
+        # fixes de distance en mode automatique quand un itinéraire existe
+        self.routes = routes
+        if routes is not None:
+            supplier_rows = {name: i for i, name in enumerate(routes.supplier_names)}
+            site_cols = {name: j for j, name in enumerate(routes.site_names)}
+            rows = np.array([supplier_rows.get(s["nom"], -1) for s in self.suppliers])
+            cols = np.array([site_cols.get(name, -1) for name in self.site_names])
+            valid = (rows >= 0)[:, None] & (cols >= 0)[None, :]
+            self.routed_distance_km = np.where(valid, routes.distance_km[rows][:, cols], np.nan)
+            self.routed_kg_per_tonne = np.where(valid, routes.kg_per_tonne[rows][:, cols], np.nan)
+            self.routed_hours = np.where(valid, routes.hours[rows][:, cols], np.nan)
+
+        self._materials = [s.get("materiau", "").lower() for s in self.suppliers]
+        self._product_masks = {}
+        self._scenarios = OrderedDict()
+        self._scenarios_lock = threading.Lock()
+        self._chains_lock = threading.Lock()
+
+    def _register_chain(self, chain):
+        """Ajoute une chaîne de transport au tenseur et retourne son index"""
+        chain = tuple(chain)
+        if chain not in self._chain_index:
+            self._chain_index[chain] = len(self.chains)
+            self.chains.append(chain)
+        return self._chain_index[chain]
+
+    def _chain_coefficients(self, chain):
+        """kg CO2 par tonne.km et heures par km d'une chaîne, pondérés par segment"""
+        factor = hours = 0.0
+        for split, mode in zip(chain_splits(chain), chain):
+            factor += split * self.transport_modes[mode]["factor"]
+            hours += split / self.transport_modes[mode]["speed_kmh"]
+        return factor, hours
+
+    def product_mask(self, product):
+        """Vecteur booléen des fournisseurs capables de livrer un produit"""
+        if product not in self._product_masks:
+            self._product_masks[product] = np.array(
+                [material_matches(product, materiau) for materiau in self._materials], dtype=bool
+            )
+        return self._product_masks[product]
+
+    def chain_indices(self, site_name, chain=None):
+        """Index de chaîne par fournisseur pour un site (automatique si chain est None)"""
+        if chain:
+            return np.full(len(self.suppliers), self._register_chain_on_the_fly(chain), dtype=np.intp)
+        if self.auto_chain_idx is None:
+            raise ValueError("Aucune chaîne de transport fournie et pas de sélection automatique")
+        return self.auto_chain_idx[:, self._site_index[site_name]]
+
+    def transport_coefficients(self, site_name, chain=None):
+        """
+        Coefficients de transport par fournisseur vers un site
+
+        Returns:
+            tuple: (kg CO2 par tonne, heures, distance km, chaîne de modes, itinéraire routé ou None)
+        """
+        t = self._site_index[site_name]
+        n_suppliers = len(self.suppliers)
+        distance = self.distance_km[:, t].copy()
+        routed = [None] * n_suppliers
+
+        if chain or self.auto_chain_idx is not None:
+            chain_idx = self.chain_indices(site_name, chain)
+            rows = np.arange(n_suppliers)
+            kg_per_tonne = self.transport_kg_per_tonne[rows, t, chain_idx]
+            hours = self.transport_hours[rows, t, chain_idx]
+            chains = [self.chains[i] for i in chain_idx]
+        elif self.routes is None:
+            raise ValueError("Aucune chaîne de transport fournie et pas de sélection automatique")
+        else:
+            kg_per_tonne = np.full(n_suppliers, np.nan)
+            hours = np.full(n_suppliers, np.nan)
+            chains = [()] * n_suppliers
+
+        if not chain and self.routes is not None:
+            has_route = ~np.isnan(self.routed_kg_per_tonne[:, t])
+            kg_per_tonne = np.where(has_route, self.routed_kg_per_tonne[:, t], kg_per_tonne)
+            hours = np.where(has_route, self.routed_hours[:, t], hours)
+            distance = np.where(has_route, self.routed_distance_km[:, t], distance)
+            for s in np.flatnonzero(has_route):
+                routed[s] = self.routes.route(self.suppliers[s]["nom"], site_name)
+                chains[s] = tuple(routed[s]["modes"])
+
+        return kg_per_tonne, hours, distance, chains, routed
+
+    def emissions_per_tonne(self, site_name, chain=None):
+        """kg CO2 par tonne livrée (transport + production) pour chaque fournisseur"""
+        kg_per_tonne = self.transport_coefficients(site_name, chain)[0]
+        return kg_per_tonne + self.production_kg_per_tonne
+
+    def scenario(self, site_name, product_volumes, chain=None):
+        """
+        Résultats fournisseurs pour un site, des volumes par produit et une chaîne
+        (None = itinéraire routé, ou sélection selon les continents). Mémoïsé par scénario.
+        """
+        key = (site_name, tuple(sorted(product_volumes.items())), tuple(chain) if chain else None)
+        with self._scenarios_lock:
+            if key in self._scenarios:
+                self._scenarios.move_to_end(key)
+                return self._scenarios[key]
+
+        result = self._compute_scenario(site_name, product_volumes, chain)
+
+        with self._scenarios_lock:
+            self._scenarios[key] = result
+            if len(self._scenarios) > MAX_CACHED_SCENARIOS:
+                self._scenarios.popitem(last=False)
+        return result
+
+    def _compute_scenario(self, site_name, product_volumes, chain):
+        t = self._site_index[site_name]
+        products = list(product_volumes.keys())
+        n_suppliers = len(self.suppliers)
+
+        if products:
+            matches = np.stack([self.product_mask(p) for p in products], axis=1)  # (S, P)
+            volumes = np.array([product_volumes[p] for p in products], dtype=np.float64)
+            supplier_volume = matches @ volumes
+        else:
+            matches = np.zeros((n_suppliers, 0), dtype=bool)
+            supplier_volume = np.zeros(n_suppliers)
+
+        kg_per_tonne, hours, distance, chains, routed = self.transport_coefficients(site_name, chain)
+
+        # Économies d'échelle sur le transport : -5 % au-delà de 200 t, -10 % au-delà de 500 t
+        efficiency = np.where(supplier_volume > 500, 0.9, np.where(supplier_volume > 200, 0.95, 1.0))
+        transport = kg_per_tonne * supplier_volume * efficiency
+        production = self.production_kg_per_tonne * supplier_volume
+        total = transport + production
+
+        supplier_results = []
+        for s in np.flatnonzero(supplier_volume > 0):
+            supplied = [p for j, p in enumerate(products) if matches[s, j]]
+            supplier_results.append({
+                **self.suppliers[s],
+                "transport_chain": list(chains[s]),
+                "route_legs": routed[s]["legs"] if routed[s] else None,
+                "products_supplied": supplied,
+                "volumes_supplied": {p: product_volumes[p] for p in supplied},
+                "emissions_transport": float(transport[s]),
+                "emissions_production": float(production[s]),
+                "temps_transport_h": float(hours[s]),
+                "distance_km": float(distance[s]),
+                "emissions_totales": float(total[s]),
+                "color": emissions_color(total[s]),
+            })
+
+        return supplier_results
+
+    def _register_chain_on_the_fly(self, chain):
+        """Index d'une chaîne manuelle, en étendant le tenseur si elle est inconnue"""
+        chain = tuple(chain)
+        if chain in self._chain_index:
+            return self._chain_index[chain]
+
+        with self._chains_lock:
+            if chain in self._chain_index:
+                return self._chain_index[chain]
+            factor, hours = self._chain_coefficients(chain)
+            # Tenseurs étendus avant publication de l'index : une session qui lit l'index y trouve sa chaîne
+            self.transport_kg_per_tonne = np.concatenate(
+                [self.transport_kg_per_tonne, (self.distance_km * factor)[:, :, None]], axis=2
+            )
+            self.transport_hours = np.concatenate(
+                [self.transport_hours, (self.distance_km * hours)[:, :, None]], axis=2
+            )
+            return self._register_chain(chain)
@@ -0,0 +1,447 @@
+"""
+Ingestion en masse des réglementations
+Lecture en flux de fichiers JSONL / JSON (tableau, objet {"regulations": [...]} ou exports
+d'analyse {"indicators": [...]}), normalisation vers le schéma attendu par
+retrieve_relevant_regulations, empreinte de contenu et upserts bulk non ordonnés sur id_loi.
+Les documents inchangés sont ignorés ; seuls les textes nouveaux ou modifiés perdent leur
+embedding et sont donc repris par embeddings.add_embeddings.
+
+Les indicateurs d'une analyse LLM (impact_financial, notes, deadline estimée...) ne sont jamais
+des textes de loi : ils ne créent qu'une fiche minimale pour une loi inconnue ($setOnInsert) et ne
+modifient jamais une réglementation existante.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+from dedup import assign_minhash_clusters, dedup_fields, ensure_dedup_indexes
+from deadlines import sync_obligations
+from embedding_models import all_embedding_fields
+from sanctions import ensure_sanction_indexes, sanction_fields
+
+# Nombre de documents par bulk_write
+DEFAULT_BATCH_SIZE = 1000
+
+# Taille des blocs lus pour le parseur JSON incrémental
+READ_CHUNK_CHARS = 1 << 16
+
+# Champs du schéma `regulations` et alias acceptés en entrée (premier trouvé)
+FIELD_ALIASES = {
+    "id_loi": ["id_loi", "celex", "law_id", "id"],
+    "nom_loi": ["nom_loi", "law_name", "titre", "title", "name"],
+    "texte": ["texte", "text", "content", "body"],
+    "lien_loi": ["lien_loi", "law_url", "url", "link"],
+    "type": ["type", "rtype", "law_type"],
+    "date_publication": ["date_publication", "publication_date", "date_promulgation"],
+    "date_effet": ["date_effet", "effective_date"],
+    "date_vigueur": ["date_vigueur", "date_application", "application_date"],
+    "pays_concernes": ["pays_concernes", "countries", "jurisdiction", "pays"],
+    "secteurs": ["secteurs", "sectors"],
+}
+
+# Source des fiches créées depuis une analyse LLM
+ANALYSIS_SOURCE = "analyse_llm"
+
+# Champs qui composent l'empreinte de contenu (created_at / updated_at exclus)
+HASHED_FIELDS = ["nom_loi", "texte", "lien_loi", "type", "date_publication", "date_effet",
+                 "date_vigueur", "pays_concernes", "secteurs"]
+
+# Fin possible d'un nombre coupé en fin de bloc ("1." puis "25")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*\Z")
+
+# Clés de tableau reconnues dans un objet JSON de premier niveau
+CONTAINER_KEYS = ["regulations", "laws", "indicators", "items", "data"]
+
+DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%d-%m-%Y", "%Y/%m/%d"]
+
+
+def parse_date(value):
+    """Date d'entrée (datetime, ISO, DD/MM/YYYY, {"$date": ...}) en datetime, None sinon"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, dict) and "$date" in value:
+        value = value["$date"]
+        if isinstance(value, dict):  # {"$date": {"$numberLong": "..."}}
+            value = int(value.get("$numberLong", 0))
+        if isinstance(value, (int, float)):
+            return datetime.utcfromtimestamp(value / 1000)
+    if not isinstance(value, str) or not value.strip() or value.strip().lower() in ("non définie", "n/a"):
+        return None
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in re.split(r"[,;]", value) if part.strip()]
+    return [str(v) for v in value]
+
+
+def _derived_id(doc):
+    """Identifiant stable pour les entrées sans id_loi (CELEX dans l'URL, sinon empreinte)"""
+    url = doc.get("lien_loi") or ""
+    celex = re.search(r"CELEX(?::|%3A)(\w+)", url, re.IGNORECASE)
+    if celex:
+        return celex.group(1)
+    key = url if url and url != "#" else doc.get("nom_loi") or ""
+    if not key:
+        return None
+    return "AUTO-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def is_indicator(record):
+    """Vrai pour un indicateur d'analyse LLM (score d'impact) plutôt qu'une réglementation"""
+    return isinstance(record, dict) and "impact_financial" in record
+
+
+def normalize_indicator(record):
+    """
+    Fiche minimale d'une loi citée par un indicateur d'analyse : nom, lien et note LLM comme texte
+    provisoire, sans dates ni juridictions (la deadline de l'indicateur est une estimation)
+
+    Returns:
+        dict: document normalisé, None si la loi n'est pas identifiable
+    """
+    doc = normalize_regulation({
+        "id_loi": record.get("id_loi"),
+        "nom_loi": record.get("law_name"),
+        "lien_loi": record.get("law_url"),
+        "texte": record.get("notes"),
+    })
+    if doc is not None:
+        doc["source_ingestion"] = ANALYSIS_SOURCE
+    return doc
+
+
+def normalize_regulation(record):
+    """
+    Convertit un enregistrement brut vers le schéma `regulations`
+
+    Returns:
+        dict: document normalisé (sans champs techniques), None si inexploitable
+    """
+    if not isinstance(record, dict):
+        return None
+
+    doc = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if record.get(alias) not in (None, ""):
+                doc[field] = record[alias]
+                break
+
+    for field in ("date_publication", "date_effet", "date_vigueur"):
+        doc[field] = parse_date(doc.get(field))
+    doc["pays_concernes"] = _as_list(doc.get("pays_concernes"))
+    doc["secteurs"] = _as_list(doc.get("secteurs"))
+    doc["texte"] = str(doc.get("texte") or "")
+    doc["nom_loi"] = str(doc.get("nom_loi") or "").strip()
+    if doc.get("lien_loi") == "#":
+        doc.pop("lien_loi")
+
+    doc["id_loi"] = str(doc["id_loi"]).strip() if doc.get("id_loi") else _derived_id(doc)
+    if not doc["id_loi"] or not (doc["nom_loi"] or doc["texte"]):
+        return None
+
+    # Champs déjà connus de la base conservés s'ils sont fournis
+    for passthrough in ("jurisdiction", "sanctions", "created_at"):
+        if record.get(passthrough) is not None:
+            doc[passthrough] = record[passthrough]
+    if "created_at" in doc:
+        doc["created_at"] = parse_date(doc["created_at"]) or datetime.now()
+    return doc
+
+
+def _digest(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+                        .encode("utf-8")).hexdigest()
+
+
+def content_hash(doc):
+    """Empreinte des champs de contenu d'une réglementation normalisée"""
+    return _digest({field: doc.get(field) for field in HASHED_FIELDS})
+
+
+def text_hash(doc):
+    """Empreinte du texte seul (décide du ré-embedding)"""
+    return _digest(doc.get("texte", ""))
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        import zstandard  # optionnel : uniquement pour les fichiers .zst
+        return zstandard.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_json_array(handle, chunk_chars=READ_CHUNK_CHARS):
+    """
+    Parseur incrémental d'un tableau JSON : produit les éléments un à un
+    en ne gardant en mémoire que le bloc courant
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    eof = False
+
+    while True:
+        # Sauter les blancs et séparateurs
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = handle.read(chunk_chars)
+            if not chunk:
+                eof = True
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        if pos >= len(buffer):
+            return
+        if not started:
+            if buffer[pos] != "[":
+                raise ValueError("Le fichier JSON ne commence pas par un tableau")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = handle.read(chunk_chars)
+            if not chunk:
+                eof = True
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        # Un élément en fin de bloc peut être tronqué : relire si rien ne le suit
+        # (un nombre "1." est décodé en 1 : relire tant que seule une suite de nombre le suit)
+        truncated = end == len(buffer) or (
+            isinstance(item, (int, float)) and not isinstance(item, bool) and _NUMBER_TAIL.match(buffer, end)
+        )
+        if truncated and not eof:
+            chunk = handle.read(chunk_chars)
+            if chunk:
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            eof = True
+        yield item
+        pos = end
+
+
+def iter_records(path):
+    """
+    Enregistrements d'un fichier JSONL / JSON (éventuellement .gz / .zst), en flux
+
+    - JSONL : un objet par ligne
+    - JSON tableau : éléments parsés de façon incrémentale
+    - JSON objet : tableau sous une clé connue (regulations, indicators, ...) ou l'objet lui-même ;
+      l'objet est chargé en entier (pas de flux), à réserver aux exports de taille bornée
+    """
+    base = path[:-3] if path.endswith(".gz") else path[:-4] if path.endswith(".zst") else path
+    with _open_text(path) as handle:
+        if base.endswith(".jsonl") or base.endswith(".ndjson"):
+            for line_number, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"⚠️ {path}:{line_number} ignorée (JSON invalide: {e})")
+            return
+
+        # Premier caractère significatif : tableau (flux) ou objet (chargé, exports de taille bornée)
+        head = handle.read(1)
+        while head and head.isspace():
+            head = handle.read(1)
+        if head == "[":
+            remaining = PrefixedReader("[", handle)
+            yield from iter_json_array(remaining)
+        elif head == "{":
+            data = json.loads("{" + handle.read())
+            for key in CONTAINER_KEYS:
+                if isinstance(data.get(key), list):
+                    yield from data[key]
+                    return
+            yield data
+
+
+class PrefixedReader:
+    """Lecteur qui réinjecte les caractères déjà consommés devant le flux"""
+
+    def __init__(self, prefix, handle):
+        self.prefix = prefix
+        self.handle = handle
+
+    def read(self, size=-1):
+        if self.prefix:
+            data, self.prefix = self.prefix, ""
+            return data + self.handle.read(max(size - len(data), 0) if size > 0 else -1)
+        return self.handle.read(size)
+
+
+def ensure_regulation_indexes(regulations):
+    """Index du schéma regulations (id_loi unique avant toute écriture)"""
+    try:
+        regulations.create_index("id_loi", unique=True)
+    except Exception as e:
+        print(f"⚠️ Index unique id_loi impossible (doublons existants ?): {e}")
+    regulations.create_index("date_publication")
+    regulations.create_index("type")
+    regulations.create_index("pays_concernes")
+    regulations.create_index([("content_hash", ASCENDING)])
+    ensure_sanction_indexes(regulations)
+    ensure_dedup_indexes(regulations)
+
+
+def _flush(regulations, batch, stats, now, insert_only=()):
+    """
+    Upsert d'un lot : ignore les inchangés, réinitialise l'embedding des textes modifiés
+    et rattache les textes nouveaux / modifiés à leurs quasi-doublons
+
+    Args:
+        insert_only (set): id_loi issus d'indicateurs d'analyse, insérés seulement s'ils sont absents
+    """
+    existing = {
+        doc["id_loi"]: doc for doc in regulations.find(
+            {"id_loi": {"$in": list(batch)}},
+            {"_id": 0, "id_loi": 1, "content_hash": 1, "text_hash": 1, "cluster_id": 1}
+        )
+    }
+
+    operations = []
+    changed = []
+    new_texts = []
+    previous_clusters = set()
+    for regulation_id, doc in batch.items():
+        digest = content_hash(doc)
+        previous = existing.get(regulation_id)
+        if previous and (regulation_id in insert_only or previous.get("content_hash") == digest):
+            stats["unchanged"] += 1
+            continue
+
+        created_at = doc.pop("created_at", None) or now
+        fields = {**doc, **sanction_fields(doc), "content_hash": digest, "text_hash": text_hash(doc),
+                  "updated_at": now}
+        update = {"$set": fields, "$setOnInsert": {"created_at": created_at}}
+
+        if previous is None or previous.get("text_hash") != fields["text_hash"]:
+            # Texte nouveau ou modifié : signature MinHash, cluster recalculé, (ré)encodage
+            fields.update(dedup_fields(doc))
+            new_texts.append(regulation_id)
+            if previous and previous.get("cluster_id") not in (None, regulation_id):
+                previous_clusters.add(previous["cluster_id"])
+            stats["queued_for_embedding"] += 1
+        if regulation_id in insert_only:
+            # Jamais de $set : une réglementation insérée entre-temps n'est pas écrasée
+            update = {"$setOnInsert": {**fields, "created_at": created_at}}
+        if previous is None:
+            stats["inserted"] += 1
+        else:
+            stats["updated"] += 1
+            if previous.get("text_hash") != fields["text_hash"]:
+                # Texte modifié : l'embedding devient obsolète et sera recalculé
+                update["$unset"] = {field: "" for field in all_embedding_fields()}
+        operations.append(UpdateOne({"id_loi": regulation_id}, update, upsert=True))
+        changed.append(fields)
+
+    if operations:
+        regulations.bulk_write(operations, ordered=False)
+        # Échéances normalisées (dates typées, sites concernés) des textes nouveaux / modifiés
+        sync_obligations(regulations.database, changed, now=now)
+    if new_texts:
+        assign_minhash_clusters(regulations, new_texts, previous_clusters)
+
+
+def ingest_regulations(regulations, records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Ingestion en un seul passage d'un flux d'enregistrements
+
+    Args:
+        regulations: collection MongoDB `regulations`
+        records (iterable): enregistrements bruts (dicts)
+        batch_size (int): documents par bulk_write
+
+    Returns:
+        dict: compteurs inserted / updated / unchanged / invalid / queued_for_embedding
+    """
+    ensure_regulation_indexes(regulations)
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "invalid": 0, "queued_for_embedding": 0}
+    now = datetime.now()
+
+    # Dédoublonnage intra-lot : la dernière occurrence d'un id_loi l'emporte,
+    # sauf un indicateur d'analyse qui ne remplace jamais une réglementation du lot
+    batch = {}
+    insert_only = set()
+    for record in records:
+        indicator = is_indicator(record)
+        doc = normalize_indicator(record) if indicator else normalize_regulation(record)
+        if doc is None:
+            stats["invalid"] += 1
+            continue
+        regulation_id = doc["id_loi"]
+        if indicator:
+            if regulation_id in batch and regulation_id not in insert_only:
+                continue
+            insert_only.add(regulation_id)
+        else:
+            insert_only.discard(regulation_id)
+        batch[regulation_id] = doc
+        if len(batch) >= batch_size:
+            _flush(regulations, batch, stats, now, insert_only)
+            batch = {}
+            insert_only = set()
+    if batch:
+        _flush(regulations, batch, stats, now, insert_only)
+
+    print(f"✅ Ingestion: {stats['inserted']} nouvelles, {stats['updated']} mises à jour, "
+          f"{stats['unchanged']} inchangées, {stats['invalid']} invalides, "
+          f"{stats['queued_for_embedding']} à (ré)encoder")
+    return stats
+
+
+def ingest_files(regulations, paths, batch_size=DEFAULT_BATCH_SIZE):
+    """Ingestion de plusieurs fichiers JSON / JSONL"""
+    totals = {}
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"❌ Fichier introuvable: {path}")
+            continue
+        print(f"📥 Ingestion de {path}...")
+        stats = ingest_regulations(regulations, iter_records(path), batch_size)
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+if __name__ == "__main__":
+    from db import db
+
+    if len(sys.argv) < 2:
+        print("Usage: python ingestion.py fichier.jsonl [fichier.json ...]")
+        sys.exit(1)
+    ingest_files(db["regulations"], sys.argv[1:])
@@ -2,6 +2,8 @@ from pymongo import MongoClient
 from datetime import datetime
 import json
 
+from ingestion import ingest_regulations
+
 def setup_database():
     try:
         # Connexion
@@ -156,9 +158,10 @@ This directive must be transposed into national law by December 31, 2025.""",
             }
         ]
         
-        # Insérer les réglementations
-        result_regulations = regulations.insert_many(regulations_data)
-        print(f"✅ {len(result_regulations.inserted_ids)} réglementations insérées")
+        # Upserts sur id_loi (index, sanctions normalisées et empreintes gérés par l'ingestion) :
+        # le script peut être relancé sans doublons ni ré-encodage des textes inchangés
+        stats = ingest_regulations(regulations, regulations_data)
+        print(f"✅ {stats['inserted'] + stats['updated']} réglementations insérées / mises à jour")
         
         # Profil Hutchinson
         hutchinson_profile = {
@@ -200,15 +203,8 @@ This directive must be transposed into national law by December 31, 2025.""",
             "created_at": datetime.now()
         }
 
-        result_hutchinson = hutchinson.insert_one(hutchinson_profile)
-        print(f"✅ Profil Hutchinson créé ! Document ID: {result_hutchinson.inserted_id}")
-        
-        # Créer des index pour optimiser les requêtes
-        regulations.create_index("id_loi", unique=True)
-        regulations.create_index("date_publication")
-        regulations.create_index("type")
-        regulations.create_index("pays_concernes")
-        print("✅ Index créés sur la collection regulations")
+        hutchinson.replace_one({"company_info.name": "Groupe Hutchinson"}, hutchinson_profile, upsert=True)
+        print("✅ Profil Hutchinson créé / mis à jour")
         
         # Vérifier la connexion
         print(f"✅ Collections disponibles: {db.list_collection_names()}")
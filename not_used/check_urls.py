@@ -4,6 +4,7 @@ Vérification des URLs dans la collection regulations
 """
 
 from db import db
+from embedding_models import without_heavy_fields
 import json
 
 def check_regulation_urls():
@@ -13,11 +14,12 @@ def check_regulation_urls():
     print("=" * 60)
 
     try:
-        regulations = list(db.regulations.find())
-
-        print(f"📊 Nombre de réglementations: {len(regulations)}")
+        print(f"📊 Nombre de réglementations: {db.regulations.count_documents({})}")
         print()
 
+        # Curseur par lots sans les embeddings ni signatures : mémoire constante quelle que soit la taille de la base
+        regulations = db.regulations.find({}, without_heavy_fields({"texte": 0})).batch_size(500)
+
         for i, reg in enumerate(regulations, 1):
             print(f"{i}. {reg.get('nom_loi', reg.get('titre', 'Sans nom'))}")
             print(f"   ID: {reg.get('_id')}")
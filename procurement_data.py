@@ -0,0 +1,358 @@
+"""
+Données de référence du service achats (réglementations suivies, matériaux, fournisseurs, sites,
+modes de transport)
+Servent de jeu d'amorçage pour le SupplierStore (MongoDB) et de repli en mémoire hors connexion
+"""
+
+# Modes de transport avec facteurs d'émission (kg CO2/tonne/km)
+TRANSPORT_MODES = {
+    "Route": {"factor": 0.08, "speed_kmh": 80, "icon": "🚛", "color": "orange"},
+    "Train": {"factor": 0.025, "speed_kmh": 120, "icon": "🚂", "color": "green"},
+    "Maritime": {"factor": 0.015, "speed_kmh": 25, "icon": "🚢", "color": "blue"},
+    "Aérien": {"factor": 0.5, "speed_kmh": 800, "icon": "✈️", "color": "red"}
+}
+
+# Réglementations suivies par le service achats
+SAMPLE_REGULATIONS = [
+    {
+        "id": "reg-eu-cbam-001",
+        "title": "CBAM — Déclaration trimestrielle des importations (acier/alu)",
+        "jurisdiction": "UE",
+        "rtype": "CBAM",
+        "phase": "adopté",
+        "date_published": "2023-10-01",
+        "deadline": "2025-12-31T00:00:00Z",
+        "summary": "Mécanisme d'ajustement carbone aux frontières. Déclarations trimestrielles obligatoires pour certains HS.",
+        "impact_hutchinson": "Élevé - Produits acier/aluminium utilisés dans les joints"
+    },
+    {
+        "id": "reg-eu-eudr-001",
+        "title": "EUDR — Traçabilité caoutchouc naturel (géolocalisation)",
+        "jurisdiction": "UE",
+        "rtype": "EUDR",
+        "phase": "appliqué",
+        "date_published": "2024-06-01",
+        "deadline": "2025-12-30T00:00:00Z",
+        "summary": "Exclusion du marché UE des produits issus de déforestation. Géolocalisation des plantations requise.",
+        "impact_hutchinson": "Critique - Caoutchouc naturel = matière première clé"
+    },
+    {
+        "id": "reg-eu-csrd-001",
+        "title": "CSRD — ESRS E1/E2 reporting extra-financier",
+        "jurisdiction": "UE",
+        "rtype": "CSRD",
+        "phase": "appliqué",
+        "date_published": "2024-01-01",
+        "deadline": "2026-03-31T00:00:00Z",
+        "summary": "Obligation de reporting de durabilité. Périmètre et indicateurs ESRS à publier annuellement.",
+        "impact_hutchinson": "Moyen - Reporting groupe requis"
+    },
+    {
+        "id": "reg-us-sanctions-001",
+        "title": "Sanctions — Mise à jour liste entités (OFAC)",
+        "jurisdiction": "USA",
+        "rtype": "Sanctions",
+        "phase": "appliqué",
+        "date_published": "2025-01-15",
+        "deadline": "2025-10-01T00:00:00Z",
+        "summary": "Mise à jour de la liste SDN. Screening requis pour éviter transactions interdites.",
+        "impact_hutchinson": "Élevé - Fournisseurs chinois à contrôler"
+    },
+    {
+        "id": "reg-cn-reach-001",
+        "title": "Chine — Nouvelle liste substances chimiques restreintes",
+        "jurisdiction": "Chine",
+        "rtype": "Chemicals",
+        "phase": "projet",
+        "date_published": "2025-08-01",
+        "deadline": "2026-01-01T00:00:00Z",
+        "summary": "Extension de la réglementation REACH chinoise à de nouveaux composés chimiques.",
+        "impact_hutchinson": "Moyen - Sites de production chinois impactés"
+    }
+]
+
+MATERIALS_DATA = [
+    {"mat_id": "MAT-001", "libelle": "Acier laminé", "hs_code": "7208", "famille": "acier"},
+    {"mat_id": "MAT-002", "libelle": "Aluminium brut", "hs_code": "7601", "famille": "aluminium"},
+    {"mat_id": "MAT-003", "libelle": "Caoutchouc naturel", "hs_code": "4001", "famille": "caoutchouc"},
+    {"mat_id": "MAT-004", "libelle": "Elastomères synthétiques", "hs_code": "4002", "famille": "polymères"},
+    {"mat_id": "MAT-005", "libelle": "Composés chimiques", "hs_code": "2902", "famille": "chimie"}
+]
+
+# Fournisseurs avec coordonnées géographiques et émissions
+SUPPLIERS_EXTENDED = [
+    {
+        "nom": "Bridgestone Corp",
+        "pays": "Japon",
+        "ville": "Tokyo",
+        "materiau": "Caoutchouc naturel",
+        "coordinates": [35.6762, 139.6503],
+        "risque": "Faible",
+        "score": 25,
+        "emissions_co2_kg_tonne": 45,
+        "certifie_iso14001": True,
+        "certifie_cbam": False,
+        "volume_annuel_tonnes": 15000,
+        "continent": "Asie"
+    },
+    {
+        "nom": "Michelin Plantations",
+        "pays": "Brésil",
+        "ville": "São Paulo",
+        "materiau": "Caoutchouc naturel",
+        "coordinates": [-23.5505, -46.6333],
+        "risque": "Moyen",
+        "score": 45,
+        "emissions_co2_kg_tonne": 78,
+        "certifie_iso14001": True,
+        "certifie_cbam": False,
+        "volume_annuel_tonnes": 22000,
+        "continent": "Amérique du Sud"
+    },
+    {
+        "nom": "Thai Rubber Co",
+        "pays": "Thaïlande",
+        "ville": "Bangkok",
+        "materiau": "Caoutchouc naturel",
+        "coordinates": [13.7563, 100.5018],
+        "risque": "Élevé",
+        "score": 75,
+        "emissions_co2_kg_tonne": 120,
+        "certifie_iso14001": False,
+        "certifie_cbam": False,
+        "volume_annuel_tonnes": 8500,
+        "continent": "Asie"
+    },
+    {
+        "nom": "Arcelor Mittal",
+        "pays": "France",
+        "ville": "Dunkerque",
+        "materiau": "Acier laminé",
+        "coordinates": [51.0345, 2.3767],
+        "risque": "Faible",
+        "score": 20,
+        "emissions_co2_kg_tonne": 35,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 45000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Baosteel Group",
+        "pays": "Chine",
+        "ville": "Shanghai",
+        "materiau": "Acier laminé",
+        "coordinates": [31.2304, 121.4737],
+        "risque": "Élevé",
+        "score": 80,
+        "emissions_co2_kg_tonne": 150,
+        "certifie_iso14001": False,
+        "certifie_cbam": False,
+        "volume_annuel_tonnes": 67000,
+        "continent": "Asie"
+    },
+    {
+        "nom": "Norsk Hydro",
+        "pays": "Norvège",
+        "ville": "Oslo",
+        "materiau": "Aluminium brut",
+        "coordinates": [59.9139, 10.7522],
+        "risque": "Faible",
+        "score": 15,
+        "emissions_co2_kg_tonne": 28,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 12000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Chalco Aluminum",
+        "pays": "Chine",
+        "ville": "Pékin",
+        "materiau": "Aluminium brut",
+        "coordinates": [39.9042, 116.4074],
+        "risque": "Élevé",
+        "score": 85,
+        "emissions_co2_kg_tonne": 180,
+        "certifie_iso14001": False,
+        "certifie_cbam": False,
+        "volume_annuel_tonnes": 34000,
+        "continent": "Asie"
+    },
+    {
+        "nom": "Continental Rubber",
+        "pays": "Allemagne",
+        "ville": "Hanovre",
+        "materiau": "Elastomères synthétiques",
+        "coordinates": [52.3759, 9.7320],
+        "risque": "Faible",
+        "score": 30,
+        "emissions_co2_kg_tonne": 52,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 18000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "BASF Chemical",
+        "pays": "Allemagne",
+        "ville": "Ludwigshafen",
+        "materiau": "Composés chimiques",
+        "coordinates": [49.4814, 8.4451],
+        "risque": "Moyen",
+        "score": 40,
+        "emissions_co2_kg_tonne": 65,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 9500,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Dow Chemical India",
+        "pays": "Inde",
+        "ville": "Mumbai",
+        "materiau": "Composés chimiques",
+        "coordinates": [19.0760, 72.8777],
+        "risque": "Élevé",
+        "score": 88,
+        "emissions_co2_kg_tonne": 195,
+        "certifie_iso14001": False,
+        "certifie_cbam": False,
+        "volume_annuel_tonnes": 14000,
+        "continent": "Asie"
+    },
+    {
+        "nom": "ThyssenKrupp Steel",
+        "pays": "Allemagne",
+        "ville": "Duisburg",
+        "materiau": "Acier laminé",
+        "coordinates": [51.4344, 6.7623],
+        "risque": "Faible",
+        "score": 25,
+        "emissions_co2_kg_tonne": 38,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 38000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Repsol Chemicals",
+        "pays": "Espagne",
+        "ville": "Tarragone",
+        "materiau": "Elastomères synthétiques",
+        "coordinates": [41.1189, 1.2445],
+        "risque": "Moyen",
+        "score": 35,
+        "emissions_co2_kg_tonne": 58,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 16000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Borealis Polymers",
+        "pays": "Autriche",
+        "ville": "Linz",
+        "materiau": "Elastomères synthétiques",
+        "coordinates": [48.3069, 14.2858],
+        "risque": "Faible",
+        "score": 28,
+        "emissions_co2_kg_tonne": 48,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 21000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Aperam Stainless",
+        "pays": "France",
+        "ville": "Isbergues",
+        "materiau": "Acier laminé",
+        "coordinates": [50.6167, 2.4500],
+        "risque": "Faible",
+        "score": 22,
+        "emissions_co2_kg_tonne": 32,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 28000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Alcoa Netherlands",
+        "pays": "Pays-Bas",
+        "ville": "Delfzijl",
+        "materiau": "Aluminium brut",
+        "coordinates": [53.3167, 6.9167],
+        "risque": "Faible",
+        "score": 18,
+        "emissions_co2_kg_tonne": 26,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 35000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Pirelli Rubber Europe",
+        "pays": "Italie",
+        "ville": "Milan",
+        "materiau": "Caoutchouc naturel",
+        "coordinates": [45.4642, 9.1900],
+        "risque": "Moyen",
+        "score": 42,
+        "emissions_co2_kg_tonne": 68,
+        "certifie_iso14001": True,
+        "certifie_cbam": False,
+        "volume_annuel_tonnes": 19000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Orlen Petrochemicals",
+        "pays": "Pologne",
+        "ville": "Płock",
+        "materiau": "Composés chimiques",
+        "coordinates": [52.5467, 19.7064],
+        "risque": "Moyen",
+        "score": 38,
+        "emissions_co2_kg_tonne": 62,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 24000,
+        "continent": "Europe"
+    },
+    {
+        "nom": "Covestro Polymers",
+        "pays": "Allemagne",
+        "ville": "Leverkusen",
+        "materiau": "Composés chimiques",
+        "coordinates": [51.0347, 7.0122],
+        "risque": "Faible",
+        "score": 30,
+        "emissions_co2_kg_tonne": 55,
+        "certifie_iso14001": True,
+        "certifie_cbam": True,
+        "volume_annuel_tonnes": 32000,
+        "continent": "Europe"
+    }
+]
+
+# Sites Hutchinson avec coordonnées
+HUTCHINSON_SITES = {
+    "Chalette-sur-Loing (Siège)": [48.0167, 2.7333],
+    "Wrocław (Pologne)": [51.1079, 17.0385],
+    "Shanghai (Chine)": [31.2304, 121.4737],
+    "Birmingham (USA)": [33.5207, -86.8025],
+    "São Paulo (Brésil)": [-23.5505, -46.6333],
+    "Munich (Allemagne)": [48.1351, 11.5820]
+}
+
+# Pays et continent de chaque site Hutchinson
+# (iso : ISO 3166-1 alpha-2, subdivision : ISO 3166-2 si des lois locales s'appliquent)
+HUTCHINSON_SITES_INFO = {
+    "Chalette-sur-Loing (Siège)": {"pays": "France", "continent": "Europe", "iso": "FR"},
+    "Wrocław (Pologne)": {"pays": "Pologne", "continent": "Europe", "iso": "PL"},
+    "Shanghai (Chine)": {"pays": "Chine", "continent": "Asie", "iso": "CN"},
+    "Birmingham (USA)": {"pays": "États-Unis", "continent": "Amérique du Nord", "iso": "US",
+                         "subdivision": "US-AL"},
+    "São Paulo (Brésil)": {"pays": "Brésil", "continent": "Amérique du Sud", "iso": "BR"},
+    "Munich (Allemagne)": {"pays": "Allemagne", "continent": "Europe", "iso": "DE"}
+}
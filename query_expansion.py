@@ -0,0 +1,188 @@
+"""
+Normalisation et expansion multilingue des requêtes
+- repli des accents et de la casse ("Réglementations" -> "reglementations")
+- dictionnaire de concepts français / anglais : matériaux, secteurs, pays, termes réglementaires
+  ("caoutchouc" = "rubber", "États-Unis" = "United States" = "USA")
+- expansion d'une requête en quelques variantes (originale, anglaise, française) encodées en un seul
+  batch puis fusionnées (moyenne des vecteurs normalisés) : un seul vecteur de requête, donc ni
+  numCandidates ni le nombre d'appels LLM ne changent
+- vecteurs fusionnés en cache (LRU) par requête et version de modèle (requête d'un profil : company_profile)
+
+Les textes réglementaires sont majoritairement en anglais, les profils et requêtes en français.
+"""
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from site_index import country_code
+
+MAX_VARIANTS = 3
+CACHE_SIZE = 256
+
+# Concepts : (forme française, forme anglaise, autres graphies)
+MATERIALS = [
+    ("caoutchouc naturel", "natural rubber", ("natural_rubber",)),
+    ("caoutchouc synthétique", "synthetic rubber", ("synthetic_rubber",)),
+    ("caoutchouc", "rubber", ()),
+    ("acier", "steel", ()),
+    ("aluminium", "aluminum", ("aluminium",)),
+    ("polymères", "polymers", ("polymère", "polymer")),
+    ("plastiques", "plastics", ("plastique", "plastic", "matières plastiques")),
+    ("élastomères", "elastomers", ("élastomère", "elastomer")),
+    ("métaux", "metals", ("métal", "metal")),
+    ("silicone", "silicone", ("silicones",)),
+    ("produits chimiques", "chemicals", ("substances chimiques", "chemical substances", "composés chimiques")),
+    ("composites", "composites", ("matériaux composites", "composite materials")),
+]
+SECTORS = [
+    ("automobile", "automotive", ("véhicules", "vehicles", "automobiles")),
+    ("aéronautique", "aerospace", ("aviation", "aérospatial", "aircraft")),
+    ("industrie", "industry", ("manufacturing", "industriel", "industrial")),
+    ("ferroviaire", "railway", ("rail", "railways")),
+]
+REGULATORY_TERMS = [
+    ("réglementation", "regulation", ("réglementations", "regulations", "règlement")),
+    ("directive", "directive", ("directives",)),
+    ("déforestation", "deforestation", ()),
+    ("émissions carbone", "carbon emissions", ("émissions de carbone", "co2 emissions")),
+    ("chaîne d'approvisionnement", "supply chain", ("chaine d'approvisionnement", "supply chains")),
+    ("droits de douane", "customs duties", ("tarifs douaniers", "tariffs")),
+    ("reporting de durabilité", "sustainability reporting", ("reporting durabilité",)),
+    ("devoir de vigilance", "due diligence", ()),
+    ("substances restreintes", "restricted substances", ()),
+]
+# Concepts plus précis qui impliquent un concept général ("caoutchouc naturel" est du "caoutchouc")
+PARENT_CONCEPTS = {
+    "material:natural rubber": "material:rubber",
+    "material:synthetic rubber": "material:rubber",
+}
+# Pays : forme française, forme anglaise (les autres graphies viennent de site_index.country_code)
+COUNTRIES = {
+    "FR": ("France", "France"), "DE": ("Allemagne", "Germany"), "PL": ("Pologne", "Poland"),
+    "ES": ("Espagne", "Spain"), "IT": ("Italie", "Italy"), "GB": ("Royaume-Uni", "United Kingdom"),
+    "US": ("États-Unis", "United States"), "MX": ("Mexique", "Mexico"), "BR": ("Brésil", "Brazil"),
+    "CN": ("Chine", "China"), "IN": ("Inde", "India"), "KR": ("Corée du Sud", "South Korea"),
+    "JP": ("Japon", "Japan"), "CA": ("Canada", "Canada"), "EU": ("Union européenne", "European Union"),
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def fold(text):
+    """Minuscules, sans accents, espaces normalisés ("_" traité comme un espace)"""
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().replace("_", " ").split())
+
+
+def _build_lexicon():
+    concepts = {}
+    for group, entries in (("material", MATERIALS), ("sector", SECTORS), ("term", REGULATORY_TERMS)):
+        for french, english, aliases in entries:
+            concept = f"{group}:{fold(english)}"
+            concepts[concept] = (french, english, {fold(french), fold(english), *map(fold, aliases)})
+    for code, (french, english) in COUNTRIES.items():
+        concepts[f"country:{code}"] = (french, english, {fold(french), fold(english)})
+    # Graphies de pays connues de site_index (usa, etats-unis, deutschland...)
+    from site_index import COUNTRY_CODES
+    for alias, code in COUNTRY_CODES.items():
+        if f"country:{code}" in concepts and len(alias) > 2:
+            concepts[f"country:{code}"][2].add(alias)
+
+    alias_to_concept = {alias: concept for concept, (_, _, aliases) in concepts.items() for alias in aliases}
+    # Expressions les plus longues d'abord ("caoutchouc naturel" avant "caoutchouc")
+    pattern = re.compile(r"\b(" + "|".join(re.escape(alias) for alias in
+                                          sorted(alias_to_concept, key=len, reverse=True)) + r")\b")
+    return concepts, alias_to_concept, pattern
+
+
+CONCEPTS, ALIAS_TO_CONCEPT, _PATTERN = _build_lexicon()
+
+
+def concepts(text):
+    """Concepts reconnus dans un texte (ensemble d'identifiants "material:rubber", "country:US"...)"""
+    found = {ALIAS_TO_CONCEPT[match] for match in _PATTERN.findall(fold(text))}
+    return found | {PARENT_CONCEPTS[concept] for concept in found if concept in PARENT_CONCEPTS}
+
+
+def term_concepts(terms):
+    """Concepts d'une liste de termes de profil (pays inconnus du lexique via leur code ISO)"""
+    found = set()
+    for term in terms or []:
+        term_found = concepts(term)
+        if not term_found and country_code(term):
+            term_found = {f"country:{country_code(term)}"}
+        found |= term_found
+    return found
+
+
+def term_pattern(term):
+    """Motif d'un terme replié, en mots entiers ("inde" ne reconnaît pas "independent")"""
+    return re.compile(r"\b" + re.escape(fold(term)) + r"\b")
+
+
+def mentions_any(terms, text, text_concepts=None):
+    """Vrai si le texte mentionne l'un des termes, quelle que soit la langue ou l'accentuation"""
+    text_concepts = concepts(text) if text_concepts is None else text_concepts
+    if term_concepts(terms) & text_concepts:
+        return True
+    folded = fold(text)
+    return any(term_pattern(term).search(folded) for term in terms or [] if fold(term))
+
+
+def _render(text, language):
+    index = 0 if language == "fr" else 1
+    return _PATTERN.sub(lambda match: fold(CONCEPTS[ALIAS_TO_CONCEPT[match.group(0)]][index]), text)
+
+
+def expand_query(query, max_variants=MAX_VARIANTS):
+    """
+    Variantes d'une requête : originale, traduite en anglais, traduite en français (sans doublons
+    à accents et casse près)
+
+    Returns:
+        list: au plus max_variants chaînes, la requête originale en premier
+    """
+    folded = fold(query)
+    variants, seen = [], set()
+    for variant in (" ".join(str(query or "").split()), _render(folded, "en"), _render(folded, "fr")):
+        if variant and fold(variant) not in seen:
+            seen.add(fold(variant))
+            variants.append(variant)
+    return variants[:max_variants]
+
+
+def _cache_key(query, version):
+    return hashlib.sha1(f"{version}|{fold(query)}".encode("utf-8")).hexdigest()
+
+
+def expanded_embedding(encoder, query, version=None):
+    """
+    Vecteur de requête fusionné : variantes encodées en un seul batch, moyenne des vecteurs normalisés
+
+    Args:
+        encoder: objet exposant encode(list) (SentenceTransformer, service d'embedding, ONNX)
+        version: version du modèle (clé de cache)
+    """
+    key = _cache_key(query, version)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    vectors = np.asarray(encoder.encode(expand_query(query)), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    fused = vectors.mean(axis=0)
+    fused /= max(float(np.linalg.norm(fused)), 1e-12)
+    embedding = fused.tolist()
+
+    with _cache_lock:
+        _cache[key] = embedding
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return embedding
+
@@ -1,10 +1,38 @@
-from sentence_transformers import SentenceTransformer
 from db import db
+from dedup import RETRIEVAL_OVERFETCH, collapse_clusters
+from embedding_codec import quantized_search
+from embedding_index import get_index
+from embedding_models import ACTIVE_VERSION, index_path, model_spec
+from embedding_service import get_encoder
+from company_profile import CompanyProfile
+from query_expansion import expanded_embedding
+from site_index import jurisdiction_codes, regulation_jurisdictions
 import json
 from datetime import datetime
 
-# Modèle d'embedding - ENCORE UTILISÉ pour l'initialisation
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Champs renvoyés par la recherche (jamais les vecteurs d'embedding)
+RETRIEVAL_PROJECTION = {
+    "_id": 1,
+    "id_loi": 1,
+    "nom_loi": 1,
+    "titre": 1,
+    "texte": 1,
+    "date_promulgation": 1,
+    "date_effet": 1,
+    "date_vigueur": 1,
+    "jurisdiction": 1,
+    "pays_concernes": 1,
+    "secteurs": 1,
+    "sanctions": 1,
+    "sanctions_resume": 1,
+    "sanction_max_eur": 1,
+    "sanction_ca_pct": 1,
+    "prison_max_mois": 1,
+    "exposition_financiere_eur": 1,
+    "lien_loi": 1,
+    "cluster_id": 1,
+    "content_hash": 1,
+}
 
 class RegulatoryRiskRAG:
     """
@@ -13,7 +41,6 @@ class RegulatoryRiskRAG:
     """
 
     def __init__(self):
-        self.model = model
         self.regulations = db["regulations"]
 
         # Types de risques réglementaires à surveiller - NON UTILISÉ DANS LE SYSTÈME PRINCIPAL
@@ -27,50 +54,46 @@ class RegulatoryRiskRAG:
         #     "supply_chain": ["chaîne d'approvisionnement", "fournisseurs", "due diligence"]
         # }
 
+    @property
+    def model(self):
+        """
+        Encodeur de la version servie (EMBEDDING_MODEL_VERSION), créé au premier encodage et non à
+        l'import : importer ce module ne charge pas le modèle ni ne démarre le pool de workers
+        (EMBEDDING_WORKERS > 0)
+        """
+        return get_encoder()
+
     def retrieve_relevant_regulations(self, query_text, company_context=None, limit=5):
         """
         ÉTAPE 1 - RETRIEVAL : Récupère les réglementations pertinentes
         UTILISE LA RECHERCHE VECTORIELLE avec l'index MongoDB Atlas
         """
+        query_embedding = None
         try:
             print(f"🔍 Recherche vectorielle des réglementations pertinentes...")
 
             # Enrichir la requête avec le contexte entreprise si fourni
-            enriched_query = query_text
+            # Embedding de la requête : variantes français / anglais fusionnées (en cache par requête)
             if company_context:
-                enriched_query += f" {company_context.get('secteur', '')} {' '.join(company_context.get('presence_geographique', []))}"
-
-            # Générer l'embedding de la requête
-            query_embedding = self.model.encode(enriched_query).tolist()
+                compiled = CompanyProfile.coerce(company_context).compiled
+                query_embedding = compiled.query_embedding(self.model, compiled.enrich(query_text), ACTIVE_VERSION)
+            else:
+                query_embedding = expanded_embedding(self.model, query_text, ACTIVE_VERSION)
 
             # Pipeline de recherche vectorielle MongoDB Atlas
             pipeline = [
                 {
                     "$vectorSearch": {
-                        "index": "vector_index",  # Nom corrigé de votre index dans Atlas
-                        "path": "embedding",
+                        "index": model_spec()["atlas_index"],  # Un index Atlas par version de modèle
+                        "path": model_spec()["field"],
                         "queryVector": query_embedding,
-                        "numCandidates": 100,
-                        "limit": limit
+                        "numCandidates": max(100, limit * RETRIEVAL_OVERFETCH * 10),
+                        # Sur-échantillonnage : les doublons d'un même acte sont regroupés ensuite
+                        "limit": limit * RETRIEVAL_OVERFETCH
                     }
                 },
                 {
-                    "$project": {
-                        "_id": 1,
-                        "id_loi": 1,
-                        "nom_loi": 1,
-                        "titre": 1,
-                        "texte": 1,
-                        "date_promulgation": 1,
-                        "date_effet": 1,
-                        "date_vigueur": 1,
-                        "jurisdiction": 1,
-                        "pays_concernes": 1,
-                        "secteurs": 1,
-                        "sanctions": 1,
-                        "lien_loi": 1,
-                        "score": {"$meta": "vectorSearchScore"}
-                    }
+                    "$project": {**RETRIEVAL_PROJECTION, "score": {"$meta": "vectorSearchScore"}}
                 }
             ]
 
@@ -80,25 +103,7 @@ class RegulatoryRiskRAG:
             print(f"✅ {len(results)} réglementations trouvées par recherche vectorielle")
 
             # Formatter les résultats pour correspondre à la structure attendue
-            formatted_results = []
-            for reg in results:
-                formatted_reg = {
-                    "_id": reg.get("_id"),
-                    "id_loi": reg.get("id_loi", str(reg.get("_id"))),
-                    "titre": reg.get("titre", reg.get("nom_loi", "Titre non disponible")),
-                    "texte": reg.get("texte", ""),
-                    "date_promulgation": reg.get("date_promulgation", reg.get("date_effet")),
-                    "jurisdiction": reg.get("jurisdiction", reg.get("pays_concernes", "Non spécifiée")),
-                    "score": reg.get("score", 0.0),  # Score de similarité vectorielle
-                    "nom_loi": reg.get("nom_loi", reg.get("titre", "Loi non nommée")),
-                    "lien_loi": reg.get("lien_loi", "#"),
-                    "date_effet": reg.get("date_effet"),
-                    "date_vigueur": reg.get("date_vigueur"),
-                    "sanctions": reg.get("sanctions", "Non spécifiées"),
-                    "secteurs": reg.get("secteurs", []),
-                    "pays_concernes": reg.get("pays_concernes", [])
-                }
-                formatted_results.append(formatted_reg)
+            formatted_results = collapse_clusters([self._format_regulation(reg) for reg in results], limit)
 
             return formatted_results
 
@@ -106,43 +111,68 @@ class RegulatoryRiskRAG:
             print(f"❌ Erreur lors de la recherche vectorielle : {e}")
             print("🔄 Basculement vers récupération directe...")
             # Fallback vers récupération directe si la recherche vectorielle échoue
-            return self._fallback_direct_retrieval(limit)
-
-    # MÉTHODE FALLBACK COMMENTÉE - La recherche vectorielle avec index "vector_index" fonctionne maintenant
-    # def _fallback_direct_retrieval(self, limit=5):
-    #     """Fallback vers récupération directe si la recherche vectorielle échoue"""
-    #     try:
-    #         print(f"🔄 Fallback: Récupération directe depuis la collection...")
-
-    #         # Récupérer toutes les réglementations de la collection
-    #         results = list(self.regulations.find().limit(limit))
-
-    #         print(f"✅ {len(results)} réglementations trouvées en fallback")
-
-    #         # Formatter les résultats pour correspondre à la structure attendue
-    #         formatted_results = []
-    #         for reg in results:
-    #             formatted_reg = {
-    #                 "_id": reg.get("_id"),
-    #                 "id_loi": reg.get("id_loi", str(reg.get("_id"))),
-    #                 "titre": reg.get("titre", reg.get("nom_loi", "Titre non disponible")),
-    #                 "texte": reg.get("texte", reg.get("description", "")),
-    #                 "date_promulgation": reg.get("date_promulgation", reg.get("date_effet")),
-    #                 "jurisdiction": reg.get("jurisdiction", reg.get("pays_concernes", "Non spécifiée")),
-    #                 "score": 0.5,  # Score par défaut pour fallback
-    #                 "nom_loi": reg.get("nom_loi", reg.get("titre", "Loi non nommée")),
-    #                 "lien_loi": reg.get("lien_loi", reg.get("url", "#")),
-    #                 "date_effet": reg.get("date_effet"),
-    #                 "date_vigueur": reg.get("date_vigueur"),
-    #                 "sanctions": reg.get("sanctions", "Non spécifiées")
-    #             }
-    #             formatted_results.append(formatted_reg)
-
-    #         return formatted_results
-
-    #     except Exception as e:
-    #         print(f"❌ Erreur fallback direct : {e}")
-    #         return []
+            return self._fallback_direct_retrieval(limit, query_embedding)
+
+    def _format_regulation(self, reg):
+        """Formate un document regulations vers la structure attendue par l'analyse"""
+        return {
+            "_id": reg.get("_id"),
+            "id_loi": reg.get("id_loi", str(reg.get("_id"))),
+            "titre": reg.get("titre", reg.get("nom_loi", "Titre non disponible")),
+            "texte": reg.get("texte", ""),
+            "date_promulgation": reg.get("date_promulgation", reg.get("date_effet")),
+            "jurisdiction": reg.get("jurisdiction", reg.get("pays_concernes", "Non spécifiée")),
+            "score": reg.get("score", 0.0),  # Score de similarité vectorielle
+            "nom_loi": reg.get("nom_loi", reg.get("titre", "Loi non nommée")),
+            "lien_loi": reg.get("lien_loi", "#"),
+            "date_effet": reg.get("date_effet"),
+            "date_vigueur": reg.get("date_vigueur"),
+            "sanctions": reg.get("sanctions") or reg.get("sanctions_resume") or "Non spécifiées",
+            "sanction_max_eur": reg.get("sanction_max_eur"),
+            "sanction_ca_pct": reg.get("sanction_ca_pct"),
+            "prison_max_mois": reg.get("prison_max_mois"),
+            "exposition_financiere_eur": reg.get("exposition_financiere_eur"),
+            "secteurs": reg.get("secteurs", []),
+            "pays_concernes": reg.get("pays_concernes", []),
+            "cluster_id": reg.get("cluster_id"),
+            "content_hash": reg.get("content_hash")
+        }
+
+    def _fallback_direct_retrieval(self, limit=5, query_embedding=None):
+        """
+        Fallback si $vectorSearch échoue (index Atlas absent, base locale) :
+        index memmap local s'il existe, sinon scan des embeddings int8 avec re-classement exact
+        """
+        try:
+            if query_embedding is None:
+                return []
+
+            index = get_index(index_path())
+            if index is not None and len(index):
+                print(f"🔄 Fallback: recherche sur l'index local ({len(index)} vecteurs)...")
+                ranked = index.search(query_embedding, k=limit * RETRIEVAL_OVERFETCH)
+            else:
+                print(f"🔄 Fallback: recherche locale sur les embeddings quantifiés...")
+                ranked = quantized_search(self.regulations, query_embedding, k=limit * RETRIEVAL_OVERFETCH,
+                                          field=model_spec()["field"])
+            scores = dict(ranked)
+            documents = {
+                reg["id_loi"]: reg
+                for reg in self.regulations.find({"id_loi": {"$in": list(scores)}}, RETRIEVAL_PROJECTION)
+            }
+
+            results = []
+            for regulation_id, score in ranked:
+                if regulation_id in documents:
+                    results.append(self._format_regulation({**documents[regulation_id], "score": score}))
+            results = collapse_clusters(results, limit)
+
+            print(f"✅ {len(results)} réglementations trouvées en fallback")
+            return results
+
+        except Exception as e:
+            print(f"❌ Erreur fallback direct : {e}")
+            return []
 
     def analyze_regulatory_impact(self, regulations, company_profile):
         """
@@ -156,11 +186,14 @@ class RegulatoryRiskRAG:
             "recommendations": []
         }
 
+        company_profile = CompanyProfile.coerce(company_profile)
         for reg in regulations:
-            risk_level = self._assess_risk_level(reg, company_profile)
+            # Termes du profil reconnus dans le texte : un seul passage par réglementation
+            matches = company_profile.compiled.match(reg.get('texte', ''))
+            risk_level = self._assess_risk_level(reg, company_profile, matches)
             impact_analysis[f"{risk_level}_risk"].append({
                 "regulation": reg,
-                "impact_details": self._get_specific_impact(reg, company_profile)
+                "impact_details": self._get_specific_impact(reg, company_profile, matches)
             })
 
         # Générer des recommandations - NON UTILISÉES DANS LE SYSTÈME PRINCIPAL (LLM génère tout)
@@ -170,26 +203,27 @@ class RegulatoryRiskRAG:
 
         return impact_analysis
 
-    def _assess_risk_level(self, regulation, company_profile):
+    def _assess_risk_level(self, regulation, company_profile, matches=None):
         """
         Évalue le niveau de risque d'une réglementation pour l'entreprise
         ENCORE UTILISÉ - Nécessaire pour la classification des risques avant LLM
         """
         score = regulation.get('score', 0)
+        compiled = CompanyProfile.coerce(company_profile).compiled
+        if matches is None:
+            matches = compiled.match(regulation.get('texte', ''))
 
         # Facteurs de risque basés sur le profil entreprise
         risk_factors = 0
 
-        # Géographie
-        company_regions = company_profile.get('presence_geographique', [])
-        reg_text = regulation.get('texte', '').lower()
-
-        if any(region.lower() in reg_text for region in company_regions):
+        # Géographie : juridictions déclarées en codes ISO, mention dans le texte sinon (toutes langues)
+        if compiled.country_codes & jurisdiction_codes(regulation_jurisdictions(regulation)):
+            risk_factors += 0.3
+        elif matches["presence_geographique"]:
             risk_factors += 0.3
 
         # Secteur d'activité
-        secteur = company_profile.get('secteur', '').lower()
-        if secteur in reg_text:
+        if matches["secteur"]:
             risk_factors += 0.4
 
         # Score de similarité
@@ -204,32 +238,22 @@ class RegulatoryRiskRAG:
         else:
             return "low"
 
-    def _get_specific_impact(self, regulation, company_profile):
+    def _get_specific_impact(self, regulation, company_profile, matches=None):
         """
         Détermine l'impact spécifique d'une réglementation
         ENCORE UTILISÉ - Nécessaire pour l'analyse de base avant LLM
         """
-        impacts = []
+        if matches is None:
+            matches = CompanyProfile.coerce(company_profile).compiled.match(regulation.get('texte', ''))
 
-        reg_text = regulation.get('texte', '').lower()
-
-        # Impacts sur les matières premières
-        if company_profile.get('matieres_premieres'):
-            for matiere in company_profile['matieres_premieres']:
-                if matiere.lower() in reg_text:
-                    impacts.append(f"Impact sur matière première: {matiere}")
+        # Impacts sur les matières premières ("caoutchouc" reconnu dans un texte anglais)
+        impacts = [f"Impact sur matière première: {matiere}" for matiere in matches["matieres_premieres"]]
 
         # Impacts sur les fournisseurs
-        if company_profile.get('fournisseurs_regions'):
-            for region in company_profile['fournisseurs_regions']:
-                if region.lower() in reg_text:
-                    impacts.append(f"Impact sur fournisseurs région: {region}")
+        impacts += [f"Impact sur fournisseurs région: {region}" for region in matches["fournisseurs_regions"]]
 
         # Impacts clients
-        if company_profile.get('clients_regions'):
-            for region in company_profile['clients_regions']:
-                if region.lower() in reg_text:
-                    impacts.append(f"Impact sur clients région: {region}")
+        impacts += [f"Impact sur clients région: {region}" for region in matches["clients_regions"]]
 
         return impacts if impacts else ["Impact général sur les opérations"]
 
@@ -272,20 +296,10 @@ class RegulatoryRiskRAG:
         ENCORE UTILISÉ - Appelé par rag_with_llm.py pour obtenir les données de base
         """
         print("🔍 Analyse des risques réglementaires en cours...")
+        company_profile = CompanyProfile.coerce(company_profile)
 
-        # Construire la requête basée sur le profil entreprise
-        if specific_query:
-            query = specific_query
-        else:
-            query_parts = []
-            if company_profile.get('secteur'):
-                query_parts.append(company_profile['secteur'])
-            if company_profile.get('matieres_premieres'):
-                query_parts.extend(company_profile['matieres_premieres'])
-            if company_profile.get('presence_geographique'):
-                query_parts.extend(company_profile['presence_geographique'])
-
-            query = " ".join(query_parts)
+        # Requête basée sur le profil entreprise (pré-calculée par version du profil)
+        query = specific_query or company_profile.compiled.query_text
 
         # Récupération des réglementations pertinentes
         relevant_regulations = self.retrieve_relevant_regulations(
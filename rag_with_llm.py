@@ -1,7 +1,90 @@
 from rag_system import RegulatoryRiskRAG
 import requests
 import json
+import hashlib
 from datetime import datetime
+from analysis_store import latest_analysis, load_indicators, save_analysis
+from company_profile import CompanyProfile
+from single_flight import assessment_key, flight_key, get_single_flight
+from snapshot import write_analysis_file
+
+# Modèle Ollama utilisé pour les analyses
+LLM_MODEL = "llama2"
+
+# Champs d'une réglementation formatée qui, s'ils changent, imposent une nouvelle analyse LLM
+# (utilisés quand le document n'a pas de content_hash d'ingestion)
+FINGERPRINT_FIELDS = ("nom_loi", "texte", "date_effet", "date_vigueur", "sanctions", "lien_loi")
+
+
+def regulation_fingerprint(reg):
+    """Empreinte de contenu d'une réglementation (content_hash d'ingestion si disponible)"""
+    if reg.get("content_hash"):
+        return reg["content_hash"]
+    raw = json.dumps({field: reg.get(field) for field in FINGERPRINT_FIELDS}, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def report_regulations(report):
+    """Réglementations d'un rapport de base, tous niveaux de risque confondus"""
+    analysis = report["detailed_analysis"]
+    return [risk["regulation"] for level in ("high_risk", "medium_risk", "low_risk") for risk in analysis[level]]
+
+
+def restrict_report(report, ids):
+    """Copie d'un rapport de base limitée à certaines lois (id_loi)"""
+    analysis = dict(report["detailed_analysis"])
+    for level in ("high_risk", "medium_risk", "low_risk"):
+        analysis[level] = [risk for risk in analysis[level] if risk["regulation"].get("id_loi") in ids]
+    return {**report, "detailed_analysis": analysis}
+
+
+def _normalize_label(value):
+    return " ".join(str(value or "").casefold().split())
+
+
+def attach_regulation_ids(indicators, regulations):
+    """
+    Rattache chaque indicateur LLM à sa loi (URL, puis nom exact, puis nom inclus)
+
+    Returns:
+        int: nombre d'indicateurs non rattachés (id_loi None)
+    """
+    by_url = {reg["lien_loi"].strip(): reg.get("id_loi") for reg in regulations
+              if reg.get("lien_loi") and reg["lien_loi"] != "#"}
+    by_name = {_normalize_label(reg.get("nom_loi")): reg.get("id_loi") for reg in regulations if reg.get("nom_loi")}
+
+    unmatched = 0
+    for indicator in indicators:
+        name = _normalize_label(indicator.get("law_name"))
+        regulation_id = by_url.get(str(indicator.get("law_url") or "").strip()) or by_name.get(name)
+        if regulation_id is None and name:
+            regulation_id = next((rid for label, rid in by_name.items() if label in name or name in label), None)
+        indicator["id_loi"] = regulation_id
+        unmatched += regulation_id is None
+    return unmatched
+
+
+def diff_regulations(regulations, previous):
+    """
+    Compare la sélection courante aux lois revues par l'analyse précédente
+
+    Returns:
+        dict: listes d'id_loi added / modified / unchanged / removed
+    """
+    reviewed = {entry["id_loi"]: entry["content_hash"] for entry in previous.get("regulations_reviewed", [])}
+    delta = {"added": [], "modified": [], "unchanged": [], "removed": []}
+    current = set()
+    for reg in regulations:
+        regulation_id = reg.get("id_loi")
+        current.add(regulation_id)
+        if regulation_id not in reviewed:
+            delta["added"].append(regulation_id)
+        elif reviewed[regulation_id] != regulation_fingerprint(reg):
+            delta["modified"].append(regulation_id)
+        else:
+            delta["unchanged"].append(regulation_id)
+    delta["removed"] = [regulation_id for regulation_id in reviewed if regulation_id not in current]
+    return delta
 
 class RegulatoryRiskRAGWithLLM(RegulatoryRiskRAG):
     """
@@ -11,6 +94,8 @@ class RegulatoryRiskRAGWithLLM(RegulatoryRiskRAG):
     def __init__(self, llm_provider="ollama"):
         super().__init__()
         self.llm_provider = llm_provider
+        # Session HTTP partagée : connexions keep-alive réutilisées entre les appels LLM
+        self.http = requests.Session()
 
     def generate_llm_analysis(self, report, company_profile):
         """
@@ -76,6 +161,7 @@ TOUTES LES RÉGLEMENTATIONS À ANALYSER:"""
    URL: {real_url}
    Date limite: {deadline_str}
    Sanctions: {reg.get('sanctions', 'Non spécifiées')}
+   Exposition financière estimée: {f"{reg['exposition_financiere_eur'] / 1e6:.2f} M€" if reg.get('exposition_financiere_eur') else 'Non chiffrée'}
    Texte: {str(reg.get('texte', ''))[:200]}...
 """
 
@@ -148,10 +234,10 @@ IMPORTANT:
     def _call_ollama(self, prompt):
         """Appelle un modèle Ollama local"""
         try:
-            response = requests.post(
+            response = self.http.post(
                 "http://localhost:11434/api/generate",
                 json={
-                    "model": "llama2",  # Changé pour utiliser llama2
+                    "model": LLM_MODEL,
                     "prompt": prompt,
                     "stream": False
                 },
@@ -278,11 +364,21 @@ IMPORTANT:
                 "error": f"Erreur extraction: {str(e)}"
             }
 
-    def get_ui_ready_data(self, company_profile, specific_query=None):
+    def get_ui_ready_data(self, company_profile, specific_query=None, incremental=False):
         """
         MÉTHODE PRINCIPALE pour obtenir les données prêtes pour l'UI
         Retourne directement les données JSON que vous voulez afficher
+        Les appels identiques simultanés (profil, requête, modèle, mode incrémental) partagent un seul calcul
+
+        incremental=True : seules les lois nouvelles ou modifiées depuis la dernière analyse de même
+        profil/requête sont envoyées au LLM, les indicateurs des autres sont repris de cette analyse
         """
+        company_profile = CompanyProfile.coerce(company_profile)
+        key = flight_key(assessment_key(company_profile, specific_query, LLM_MODEL), incremental)
+        return get_single_flight().do(key, self._compute_ui_ready_data, company_profile, specific_query, incremental)
+
+    def _compute_ui_ready_data(self, company_profile, specific_query=None, incremental=False):
+        """Recherche, analyse LLM et sauvegarde d'une évaluation (cf. get_ui_ready_data)"""
         print("🦙 Analyse LLM pour interface utilisateur...")
 
         # Obtenir le rapport de base (limité à 2 réglementations)
@@ -294,11 +390,29 @@ IMPORTANT:
                 "error": base_report["error"]
             }
 
-        # Générer l'analyse LLM (retourne du JSON)
-        llm_response = self.generate_llm_analysis(base_report, company_profile)
+        regulations = report_regulations(base_report)
+        previous = self.get_previous_analysis(company_profile, specific_query) if incremental else None
+        delta = diff_regulations(regulations, previous) if previous else None
 
-        # Extraire les données UI du LLM
-        ui_data = self.extract_ui_data_from_llm_response(llm_response)
+        if delta is None:
+            ui_data, reviewed = self._analyze_regulations(base_report, regulations, company_profile)
+        else:
+            to_analyze = set(delta["added"] + delta["modified"])
+            print(f"🔄 Analyse incrémentale: {len(to_analyze)} lois à analyser, "
+                  f"{len(delta['unchanged'])} reprises de l'analyse {previous['_id']}")
+            if to_analyze:
+                ui_data, reviewed = self._analyze_regulations(
+                    restrict_report(base_report, to_analyze),
+                    [reg for reg in regulations if reg.get("id_loi") in to_analyze], company_profile
+                )
+            else:
+                ui_data, reviewed = {"indicators": []}, []
+
+            # Indicateurs et statut "revue" des lois inchangées repris de l'analyse précédente
+            unchanged = set(delta["unchanged"])
+            ui_data["indicators"] = [indicator for indicator in previous.get("analysis_results", [])
+                                     if indicator.get("id_loi") in unchanged] + ui_data["indicators"]
+            reviewed = [entry for entry in previous["regulations_reviewed"] if entry["id_loi"] in unchanged] + reviewed
 
         # Ajouter des métadonnées utiles
         ui_data["metadata"] = {
@@ -306,73 +420,104 @@ IMPORTANT:
             "analysis_date": datetime.now().strftime('%d/%m/%Y %H:%M'),
             "total_indicators": len(ui_data.get("indicators", [])),
             "llm_used": True,
-            "model": "llama2"
+            "model": LLM_MODEL
         }
+        if delta is not None:
+            ui_data["metadata"]["incremental"] = {
+                "previous_analysis_id": str(previous["_id"]),
+                "analyzed": len(delta["added"]) + len(delta["modified"]),
+                "reused": len(delta["unchanged"]),
+                "removed": len(delta["removed"])
+            }
 
         # Sauvegarder les résultats dans la collection risk_analysis
-        self.save_analysis_to_risk_collection(ui_data, company_profile, specific_query)
+        analysis_id = self.save_analysis_to_risk_collection(
+            ui_data, company_profile, specific_query, reviewed=reviewed,
+            previous_id=previous["_id"] if previous else None, delta=delta
+        )
+        if analysis_id is not None:
+            ui_data["analysis_id"] = str(analysis_id)
 
         return ui_data
 
-    def save_analysis_to_risk_collection(self, ui_data, company_profile, query):
+    def _analyze_regulations(self, report, regulations, company_profile):
         """
-        Sauvegarde les résultats de l'analyse LLM dans la collection risk_analysis
+        Analyse LLM d'un rapport et rattachement des indicateurs aux lois
+
+        Returns:
+            tuple: (ui_data, lois revues [{id_loi, content_hash}])
         """
+        llm_response = self.generate_llm_analysis(report, company_profile)
+        ui_data = self.extract_ui_data_from_llm_response(llm_response)
+        if ui_data.get("error"):
+            # Réponse inexploitable : aucune loi n'est considérée comme revue
+            return ui_data, []
+
+        unmatched = attach_regulation_ids(ui_data["indicators"], regulations)
+        matched = {indicator["id_loi"] for indicator in ui_data["indicators"] if indicator["id_loi"]}
+        # Une loi sans indicateur n'est "revue" (écartée par le LLM) que si tous les indicateurs
+        # ont pu être rattachés ; sinon elle sera ré-analysée au prochain passage
+        reviewed = [
+            {"id_loi": reg.get("id_loi"), "content_hash": regulation_fingerprint(reg)}
+            for reg in regulations if unmatched == 0 or reg.get("id_loi") in matched
+        ]
+        return ui_data, reviewed
+
+    def get_previous_analysis(self, company_profile, specific_query=None):
+        """Dernière analyse réutilisable de même profil, requête et modèle (None si aucune)"""
         try:
             from db import db
-            risk_analysis = db["risk_analysis"]
-
-            # Préparer le document à sauvegarder
-            analysis_document = {
-                "company_name": company_profile.get('nom', 'Hutchinson'),
-                "analysis_timestamp": datetime.now(),
-                "query_used": query,
-                "llm_model": "llama2",
-                "total_regulations_analyzed": ui_data["metadata"]["total_indicators"],
-                "analysis_results": ui_data["indicators"],
-                "metadata": ui_data["metadata"],
-                "company_profile_snapshot": {
-                    "secteur": company_profile.get('secteur'),
-                    "presence_geographique": company_profile.get('presence_geographique', []),
-                    "matieres_premieres": company_profile.get('matieres_premieres', [])
-                },
-                "status": "completed",
-                "created_at": datetime.now()
-            }
+            previous = latest_analysis(
+                db, assessment_key=assessment_key(company_profile, specific_query, LLM_MODEL),
+                projection={"regulations_reviewed": 1, "analysis_results": 1}
+            )
+            if previous is not None:
+                previous["analysis_results"] = load_indicators(db, previous)
+            return previous
+        except Exception as e:
+            print(f"⚠️ Analyse précédente indisponible, analyse complète: {e}")
+            return None
 
-            # Calculer des statistiques pour la sauvegarde
-            if ui_data.get("indicators"):
-                indicators = ui_data["indicators"]
-                analysis_document["analysis_summary"] = {
-                    "total_laws_identified": len(indicators),
-                    "avg_financial_impact": sum(law.get('impact_financial', 0) for law in indicators) / len(indicators),
-                    "avg_reputation_impact": sum(law.get('impact_reputation', 0) for law in indicators) / len(indicators),
-                    "avg_operational_impact": sum(law.get('impact_operational', 0) for law in indicators) / len(indicators),
-                    "high_impact_laws": len([law for law in indicators if law.get('impact_financial', 0) >= 8]),
-                    "laws_with_deadlines": len([law for law in indicators if law.get('deadline') and law.get('deadline') != 'Non définie'])
-                }
-
-            # Insérer dans la collection
-            result = risk_analysis.insert_one(analysis_document)
-            print(f"💾 Analyse sauvegardée dans risk_analysis: {result.inserted_id}")
+    def save_analysis_to_risk_collection(self, ui_data, company_profile, query, reviewed=None,
+                                         previous_id=None, delta=None):
+        """
+        Sauvegarde les résultats de l'analyse LLM : en-tête dans risk_analysis, un document par
+        indicateur dans risk_indicators (cf. analysis_store)
+        Retourne l'_id de l'en-tête (None si la sauvegarde échoue)
+
+        Args:
+            reviewed (list): lois revues [{id_loi, content_hash}] (base des analyses incrémentales)
+            previous_id: analyse de référence d'une analyse incrémentale
+            delta (dict): id_loi ajoutées / modifiées / inchangées / retirées depuis previous_id
+        """
+        try:
+            from db import db
+            analysis_id = save_analysis(
+                db, ui_data, company_profile, query, LLM_MODEL,
+                assessment_key=assessment_key(company_profile, query, LLM_MODEL),
+                reviewed=reviewed, previous_id=previous_id, delta=delta
+            )
+            print(f"💾 Analyse sauvegardée dans risk_analysis: {analysis_id}")
+            return analysis_id
 
         except Exception as e:
             print(f"⚠️ Erreur sauvegarde risk_analysis: {e}")
             # Ne pas faire échouer l'analyse si la sauvegarde échoue
+            return None
 
 def get_hutchinson_profile():
     """
-    Récupère le profil Hutchinson depuis la collection MongoDB
+    Récupère le profil Hutchinson depuis la collection MongoDB (CompanyProfile, schéma normalisé)
     """
     try:
         from db import db
         hutchinson_data = db.hutchinson.find_one()
 
         if hutchinson_data:
-            return hutchinson_data
+            return CompanyProfile.from_document(hutchinson_data)
         else:
             # Profil par défaut si pas trouvé dans la collection
-            return {
+            return CompanyProfile.from_document({
                 "nom": "Hutchinson",
                 "secteur": "automobile aerospace manufacturing industrie",
                 "presence_geographique": [
@@ -392,7 +537,7 @@ def get_hutchinson_profile():
                 "secteurs_clients": [
                     "automobile", "aéronautique", "défense", "industrie"
                 ]
-            }
+            })
     except Exception as e:
         print(f"Erreur récupération profil Hutchinson: {e}")
         return None
@@ -474,9 +619,8 @@ def interactive_risk_consultant():
 
             # Sauvegarder les données UI
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"hutchinson_ui_data_{timestamp}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(ui_data, f, ensure_ascii=False, indent=2)
+            filename = f"hutchinson_ui_data_{timestamp}.jsonl"
+            write_analysis_file(filename, ui_data)
             print(f"\n💾 Données UI sauvegardées: {filename}")
 
         else:
@@ -501,9 +645,10 @@ def interactive_risk_consultant():
         import traceback
         traceback.print_exc()
 
-def launch_hutchinson_analysis():
+def launch_hutchinson_analysis(incremental=False):
     """
     Lance directement l'analyse Hutchinson sans questions interactives
+    incremental=True (--incremental) : ré-analyse quotidienne limitée aux lois nouvelles ou modifiées
     """
     print("🏢 ANALYSE HUTCHINSON - SYSTÈME AUTOMATIQUE")
     print("=" * 60)
@@ -532,12 +677,12 @@ def launch_hutchinson_analysis():
     print("\n" + "="*60)
     print("🔍 ANALYSE EN COURS...")
     print(f"🏢 Entreprise: {company_profile.get('nom', 'Hutchinson')}")  # Utiliser .get() avec valeur par défaut
-    print(f"🤖 Mode: LLM Ollama")
+    print(f"🤖 Mode: LLM Ollama{' (incrémental)' if incremental else ''}")
     print(f"🔍 Requête: {specific_query}")
 
     try:
         # Lancement de l'analyse LLM directe
-        ui_data = rag.get_ui_ready_data(company_profile, specific_query)
+        ui_data = rag.get_ui_ready_data(company_profile, specific_query, incremental=incremental)
 
         if "error" in ui_data:
             print(f"❌ Erreur: {ui_data['error']}")
@@ -594,9 +739,8 @@ def launch_hutchinson_analysis():
 
         # Sauvegarder les données UI
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"hutchinson_analysis_{timestamp}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(ui_data, f, ensure_ascii=False, indent=2)
+        filename = f"hutchinson_analysis_{timestamp}.jsonl"
+        write_analysis_file(filename, ui_data)
         print(f"\n💾 Données sauvegardées: {filename}")
 
         # Affichage des données JSON brutes pour debug
@@ -610,4 +754,5 @@ def launch_hutchinson_analysis():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    launch_hutchinson_analysis()
+    import sys
+    launch_hutchinson_analysis(incremental="--incremental" in sys.argv)
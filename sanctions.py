@@ -0,0 +1,307 @@
+"""
+Extraction et normalisation des sanctions réglementaires
+Un seul balayage du texte par une expression régulière combinée et précompilée
+(anglais, français, allemand, espagnol), montants ramenés en EUR, pourcentages de
+chiffre d'affaires et durées en mois, stockés dans des champs indexés de `regulations`
+pour classer les lois par exposition financière avec un simple tri indexé.
+"""
+import os
+import re
+from datetime import datetime
+
+from pymongo import DESCENDING, UpdateOne
+
+# Version de l'extraction : l'incrémenter force le recalcul des champs stockés
+SANCTIONS_VERSION = 2
+
+# Taux de conversion indicatifs vers l'EUR (ordre de grandeur, surchargeables)
+EUR_RATES = {
+    "EUR": 1.0,
+    "USD": 0.92,
+    "GBP": 1.17,
+    "CHF": 1.05,
+    "CNY": 0.13,
+    "JPY": 0.0062,
+    "INR": 0.011,
+    "BRL": 0.17,
+}
+
+# Chiffre d'affaires de référence pour valoriser les amendes en % du CA (EUR)
+REFERENCE_TURNOVER_EUR = float(os.getenv("HUTCHINSON_TURNOVER_EUR", "4.6e9"))
+
+# Fenêtre (caractères) avant un montant / une durée où chercher le mot-clé de sanction
+CONTEXT_WINDOW = 120
+# Fenêtre (caractères) après un montant / une durée, limitée à la proposition ("2 ans d'emprisonnement")
+AFTER_WINDOW = 40
+
+CURRENCY_ALIASES = {
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "$": "USD", "us$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD",
+    "£": "GBP", "gbp": "GBP", "pound": "GBP", "pounds": "GBP", "livres": "GBP",
+    "chf": "CHF", "francs suisses": "CHF",
+    "¥": "CNY", "cny": "CNY", "rmb": "CNY", "yuan": "CNY",
+    "jpy": "JPY", "yen": "JPY",
+    "₹": "INR", "inr": "INR", "rupees": "INR",
+    "r$": "BRL", "brl": "BRL", "reais": "BRL",
+}
+
+MULTIPLIERS = {
+    "thousand": 1e3, "k": 1e3, "mille": 1e3, "tausend": 1e3, "mil": 1e3,
+    "million": 1e6, "millions": 1e6, "m": 1e6, "mio": 1e6, "millionen": 1e6, "millones": 1e6, "millón": 1e6,
+    "billion": 1e9, "billions": 1e9, "bn": 1e9, "milliard": 1e9, "milliards": 1e9, "mrd": 1e9,
+    "milliarden": 1e9,
+}
+
+_CURRENCY_PREFIX = r"(?:us\$|r\$|[€$£¥₹]|(?:eur|usd|gbp|chf|cny|jpy|inr|brl)(?=\s?\d))"
+_CURRENCY_SUFFIX = (r"(?:[€$£¥₹]|eur(?:os?)?\b|usd\b|dollars?\b|gbp\b|pounds?\b|livres\b|chf\b|francs\s+suisses\b"
+                    r"|cny\b|rmb\b|yuan\b|jpy\b|yen\b|inr\b|rupees\b|brl\b|reais\b)")
+_NUMBER = r"\d{1,3}(?:[ ,.\u00a0\u202f]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?"
+_MULTIPLIER = (r"(?:(?:thousand|million(?:s|en)?|millones|millón|billions?|bn|milliards?|milliarden|mrd|mio"
+               r"|mille|tausend|mil|k|m)\b|(?:mrd|mio)\.)")
+_DURATION_UNIT = r"(?:years?|months?|ans?|années?|mois|jahre[n]?|monate[n]?|años|meses)\b"
+
+# Une seule expression combinée : montant préfixé, montant suffixé, % du CA, durée
+SANCTION_SCAN = re.compile(
+    rf"(?P<cur_a>{_CURRENCY_PREFIX})\s?(?P<num_a>{_NUMBER})(?:\s*(?P<mult_a>{_MULTIPLIER}))?"
+    rf"|(?P<num_b>{_NUMBER})(?:\s*(?P<mult_b>{_MULTIPLIER}))?\s*(?:of\s+|d'|de\s+)?(?P<cur_b>{_CURRENCY_SUFFIX})"
+    rf"|(?P<pct>\d+(?:[.,]\d+)?)\s?(?:%|per\s?cent|pour\s?cent|prozent|por\s?ciento)"
+    rf"(?=[^.;]{{0,60}}?(?:turnover|revenue|chiffre\s+d'affaires|umsatz|volumen\s+de\s+negocios|facturación))"
+    rf"|(?P<dur>\d+)\s*(?P<dur_unit>{_DURATION_UNIT})",
+    re.IGNORECASE,
+)
+
+# Mots-clés de contexte (cherchés avant la correspondance, puis dans la proposition qui la suit)
+FINE_CONTEXT = re.compile(
+    r"fines?|penalt(?:y|ies)|sanctions?|amendes?|pénalités?|astreintes?|bußgeld(?:er)?|geldbußen?|geldstrafen?"
+    r"|strafen?|multas?|sanciones|pecuniary|monetary|administrative",
+    re.IGNORECASE,
+)
+PRISON_CONTEXT = re.compile(
+    r"imprisonment|prison|jail|emprisonnement|incarcération|freiheitsstrafe|haft|prisión|cárcel",
+    re.IGNORECASE,
+)
+SUSPENSION_CONTEXT = re.compile(
+    r"suspension|suspend(?:ed)?|withdrawal|revocation|retrait|interdiction|aussetzung|entzug|grounding|inhabilitación",
+    re.IGNORECASE,
+)
+PER_UNIT = re.compile(r"\s*(?:per|par|pro|por|for\s+each|pour\s+chaque)\b", re.IGNORECASE)
+GENERIC_SANCTION = re.compile(r"sanction|penalt|fine\b|amende|punish|bußgeld|multa", re.IGNORECASE)
+
+
+def parse_number(raw):
+    """Nombre au format anglais ou européen ("2,500,000", "2.500.000", "2,5", "2 500") en float"""
+    raw = raw.replace("\u00a0", " ").replace("\u202f", " ").strip()
+    if " " in raw:
+        raw = raw.replace(" ", "")
+    if "," in raw and "." in raw:
+        # Le dernier séparateur est la décimale
+        if raw.rfind(",") > raw.rfind("."):
+            raw = raw.replace(".", "").replace(",", ".")
+        else:
+            raw = raw.replace(",", "")
+    elif "," in raw or "." in raw:
+        sep = "," if "," in raw else "."
+        parts = raw.split(sep)
+        # Groupes de 3 chiffres -> séparateur de milliers, sinon décimale
+        if len(parts) > 2 or (len(parts) == 2 and len(parts[1]) == 3):
+            raw = raw.replace(sep, "")
+        else:
+            raw = raw.replace(sep, ".")
+    return float(raw)
+
+
+def _currency(raw):
+    return CURRENCY_ALIASES.get(re.sub(r"\s+", " ", raw.lower().strip()), "EUR")
+
+
+def _multiplier(raw):
+    if not raw:
+        return 1.0
+    return MULTIPLIERS.get(raw.lower().rstrip("."), 1.0)
+
+
+def _duration_months(value, unit):
+    unit = unit.lower()
+    if unit.startswith(("mo", "me")):  # months, mois, monate, meses
+        return value
+    return value * 12
+
+
+def extract_sanctions(text):
+    """
+    Extrait les sanctions structurées d'un texte réglementaire
+
+    Returns:
+        list: sanctions {type, montant_eur, devise, montant_original, pourcentage_ca,
+              duree_mois, par_unite, contexte} dans l'ordre du texte
+    """
+    if not text:
+        return []
+
+    sanctions = []
+    for match in SANCTION_SCAN.finditer(text):
+        start, end = match.span()
+        before = text[max(0, start - CONTEXT_WINDOW):start]
+        after = re.split(r"[.;,]", text[end:end + AFTER_WINDOW], maxsplit=1)[0]
+        context = text[max(0, start - 50):end + 50]
+
+        if match.group("num_a") or match.group("num_b"):
+            if not (FINE_CONTEXT.search(before) or FINE_CONTEXT.search(after)):
+                continue
+            if match.group("num_a"):
+                number, multiplier, currency = match.group("num_a"), match.group("mult_a"), match.group("cur_a")
+            else:
+                number, multiplier, currency = match.group("num_b"), match.group("mult_b"), match.group("cur_b")
+            try:
+                amount = parse_number(number) * _multiplier(multiplier)
+            except ValueError:
+                continue
+            code = _currency(currency)
+            sanctions.append({
+                "type": "FINANCIERE",
+                "montant_original": match.group(0).strip(),
+                "devise": code,
+                "montant_eur": round(amount * EUR_RATES.get(code, 1.0), 2),
+                "par_unite": bool(PER_UNIT.match(text, end)),
+                "contexte": context,
+            })
+
+        elif match.group("pct"):
+            if not FINE_CONTEXT.search(before):
+                continue
+            sanctions.append({
+                "type": "FINANCIERE",
+                "montant_original": match.group(0).strip(),
+                "pourcentage_ca": parse_number(match.group("pct")),
+                "contexte": context,
+            })
+
+        elif match.group("dur"):
+            if PRISON_CONTEXT.search(before) or PRISON_CONTEXT.search(after):
+                kind = "PENALE"
+            elif SUSPENSION_CONTEXT.search(before) or SUSPENSION_CONTEXT.search(after):
+                kind = "SUSPENSION"
+            else:
+                continue
+            sanctions.append({
+                "type": kind,
+                "montant_original": match.group(0).strip(),
+                "duree_mois": _duration_months(int(match.group("dur")), match.group("dur_unit")),
+                "contexte": context,
+            })
+
+    return sanctions
+
+
+def summarize_sanctions(sanctions):
+    """Résumé lisible des sanctions (pour les prompts et l'affichage)"""
+    parts = []
+    amounts = [s["montant_eur"] for s in sanctions if s.get("montant_eur") and not s.get("par_unite")]
+    if amounts:
+        parts.append(f"Amende jusqu'à {max(amounts) / 1e6:.2f} M€")
+    per_unit = [s["montant_eur"] for s in sanctions if s.get("montant_eur") and s.get("par_unite")]
+    if per_unit:
+        parts.append(f"{max(per_unit):,.0f} € par unité/infraction".replace(",", " "))
+    pct = [s["pourcentage_ca"] for s in sanctions if s.get("pourcentage_ca")]
+    if pct:
+        parts.append(f"{max(pct):g}% du CA")
+    prison = [s["duree_mois"] for s in sanctions if s["type"] == "PENALE"]
+    if prison:
+        parts.append(f"Emprisonnement jusqu'à {max(prison)} mois")
+    suspension = [s["duree_mois"] for s in sanctions if s["type"] == "SUSPENSION"]
+    if suspension:
+        parts.append(f"Suspension jusqu'à {max(suspension)} mois")
+    return "; ".join(parts)
+
+
+def sanction_fields(regulation):
+    """
+    Champs de sanctions à stocker sur un document `regulations`
+
+    Returns:
+        dict: détail, maxima normalisés, exposition financière estimée (EUR) et résumé
+    """
+    sanctions = extract_sanctions(regulation.get("texte", ""))
+
+    fixed = [s["montant_eur"] for s in sanctions if s.get("montant_eur") and not s.get("par_unite")]
+    per_unit = [s["montant_eur"] for s in sanctions if s.get("montant_eur") and s.get("par_unite")]
+    pct = [s["pourcentage_ca"] for s in sanctions if s.get("pourcentage_ca")]
+    prison = [s["duree_mois"] for s in sanctions if s["type"] == "PENALE"]
+    suspension = [s["duree_mois"] for s in sanctions if s["type"] == "SUSPENSION"]
+
+    max_eur = max(fixed + per_unit) if fixed or per_unit else None
+    max_pct = max(pct) if pct else None
+    exposure = max(max_eur or 0.0, (max_pct or 0.0) / 100 * REFERENCE_TURNOVER_EUR)
+
+    summary = summarize_sanctions(sanctions)
+    if not summary and GENERIC_SANCTION.search(regulation.get("texte", "")):
+        summary = "Sanctions mentionnées sans détails précis"
+
+    return {
+        "sanctions_detail": sanctions,
+        "sanction_max_eur": max_eur,
+        "sanction_ca_pct": max_pct,
+        "prison_max_mois": max(prison) if prison else None,
+        "suspension_max_mois": max(suspension) if suspension else None,
+        "exposition_financiere_eur": exposure,
+        "sanctions_resume": summary or None,
+        "sanctions_version": SANCTIONS_VERSION,
+    }
+
+
+def ensure_sanction_indexes(regulations):
+    """Index de tri par exposition financière et par sanctions maximales"""
+    regulations.create_index([("exposition_financiere_eur", DESCENDING)])
+    regulations.create_index([("sanction_max_eur", DESCENDING)])
+    regulations.create_index([("prison_max_mois", DESCENDING)])
+
+
+def annotate_regulations(regulations, batch_size=500, force=False):
+    """
+    Calcule et stocke les champs de sanctions des réglementations non à jour (backfill)
+
+    Args:
+        regulations: collection MongoDB `regulations`
+        batch_size (int): taille des lots de bulk_write
+        force (bool): recalculer même les documents à la version courante
+
+    Returns:
+        int: nombre de documents mis à jour
+    """
+    ensure_sanction_indexes(regulations)
+    query = {} if force else {"sanctions_version": {"$ne": SANCTIONS_VERSION}}
+    cursor = regulations.find(query, {"_id": 1, "texte": 1}).batch_size(batch_size)
+
+    updated = 0
+    operations = []
+    for doc in cursor:
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": sanction_fields(doc)}))
+        if len(operations) >= batch_size:
+            regulations.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        regulations.bulk_write(operations, ordered=False)
+        updated += len(operations)
+
+    print(f"✅ Sanctions normalisées pour {updated} réglementations")
+    return updated
+
+
+def top_financial_exposure(regulations, limit=10, min_exposure_eur=0):
+    """Réglementations triées par exposition financière (tri indexé, sans regex à la requête)"""
+    return list(regulations.find(
+        {"exposition_financiere_eur": {"$gt": min_exposure_eur}},
+        {"_id": 0, "id_loi": 1, "nom_loi": 1, "lien_loi": 1, "exposition_financiere_eur": 1,
+         "sanction_max_eur": 1, "sanction_ca_pct": 1, "prison_max_mois": 1, "sanctions_resume": 1}
+    ).sort("exposition_financiere_eur", DESCENDING).limit(limit))
+
+
+if __name__ == "__main__":
+    from db import db
+
+    started = datetime.now()
+    annotate_regulations(db["regulations"])
+    print(f"⏱️ Terminé en {(datetime.now() - started).total_seconds():.1f}s")
+    for reg in top_financial_exposure(db["regulations"]):
+        print(f"💰 {reg['id_loi']}: {reg['exposition_financiere_eur'] / 1e6:.2f} M€ - {reg.get('sanctions_resume')}")
@@ -0,0 +1,209 @@
+"""
+Single-flight des évaluations identiques simultanées
+Les appels concurrents de même clé (profil, requête normalisée, modèle) attendent un seul calcul
+et partagent son résultat :
+- entre threads du processus (sessions Streamlit, API) : attente sur un Event
+- entre processus : bail (lease) dans la collection `single_flight`, résultat publié dans le même
+  document et conservé DONE_GRACE_S secondes pour les appels arrivés juste après
+Si MongoDB est indisponible, la coordination inter-processus est ignorée (calcul local).
+"""
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+# Durée du bail d'un calcul (au-delà, considéré abandonné et repris par un autre processus)
+LEASE_S = 180
+# Durée de réutilisation d'un résultat publié pour les appels arrivés juste après
+DONE_GRACE_S = 30
+# Intervalle de scrutation des autres processus et attente maximale
+POLL_INTERVAL_S = 0.5
+WAIT_TIMEOUT_S = 300
+
+
+def normalize_query(query):
+    """Requête normalisée : casse, espaces (None et vide sont équivalents)"""
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+def assessment_key(company_profile, query, model):
+    """Clé d'une évaluation : empreinte du profil, requête normalisée, modèle LLM"""
+    profile = {key: value for key, value in (company_profile or {}).items() if key != "_id"}
+    profile_hash = hashlib.sha1(
+        json.dumps(profile, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    raw = f"{profile_hash}|{normalize_query(query)}|{model}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def flight_key(assessment, incremental=False):
+    """Clé de coalescence d'une évaluation : une évaluation complète et une incrémentale ne sont jamais fusionnées"""
+    return f"{assessment}|{'incremental' if incremental else 'full'}"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value):
+    # MongoDB rend des dates naïves (UTC)
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Regroupe les calculs identiques simultanés (threads et processus)"""
+
+    def __init__(self, collection=None):
+        self.collection = collection
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._calls = {}
+        self._lock = threading.Lock()
+        if collection is not None:
+            try:
+                collection.create_index("expires_at", expireAfterSeconds=0)
+            except PyMongoError as e:
+                print(f"⚠️ Index single_flight non créé: {e}")
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Exécute function(*args, **kwargs) une seule fois par clé parmi les appels simultanés
+
+        Returns:
+            résultat du calcul (copie indépendante pour les appels qui l'ont attendu)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            print("♻️ Évaluation identique en cours dans ce processus, résultat partagé")
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = self._do_across_processes(key, function, args, kwargs)
+            return copy.deepcopy(call.result)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _do_across_processes(self, key, function, args, kwargs):
+        if self.collection is None:
+            return function(*args, **kwargs)
+
+        deadline = time.monotonic() + WAIT_TIMEOUT_S
+        while True:
+            try:
+                token, shared = self._acquire(key)
+            except PyMongoError as e:
+                print(f"⚠️ Verrou single_flight indisponible, calcul local: {e}")
+                return function(*args, **kwargs)
+
+            if token is not None:
+                return self._run_as_leader(key, token, function, args, kwargs)
+            if shared is not None:
+                print("♻️ Évaluation identique terminée par un autre processus, résultat partagé")
+                return shared
+            if time.monotonic() > deadline:
+                print("⚠️ Attente du calcul d'un autre processus expirée, calcul local")
+                return function(*args, **kwargs)
+            time.sleep(POLL_INTERVAL_S)
+
+    def _acquire(self, key):
+        """
+        Tente de prendre le bail d'une clé
+
+        Returns:
+            tuple: (jeton si bail obtenu, résultat publié si disponible)
+        """
+        now = _now()
+        token = uuid.uuid4().hex
+        lease = {"status": "running", "owner": self.owner, "token": token,
+                 "started_at": now, "expires_at": now + timedelta(seconds=LEASE_S)}
+        try:
+            self.collection.insert_one({"_id": key, **lease})
+            return token, None
+        except DuplicateKeyError:
+            pass
+
+        doc = self.collection.find_one({"_id": key})
+        if doc is None:
+            return None, None
+        if doc.get("status") == "done" and _as_utc(doc["expires_at"]) > now:
+            return None, doc.get("result")
+        if _as_utc(doc["expires_at"]) <= now:
+            # Bail abandonné ou résultat périmé : reprise conditionnelle (un seul gagnant)
+            taken = self.collection.update_one(
+                {"_id": key, "token": doc.get("token"), "expires_at": doc["expires_at"]},
+                {"$set": lease, "$unset": {"result": ""}},
+            )
+            if taken.modified_count:
+                return token, None
+        return None, None
+
+    def _run_as_leader(self, key, token, function, args, kwargs):
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            # Libérer la clé : un processus en attente reprend le calcul
+            self._release(key, token)
+            raise
+        try:
+            self.collection.update_one(
+                {"_id": key, "token": token},
+                {"$set": {"status": "done", "result": result, "finished_at": _now(),
+                          "expires_at": _now() + timedelta(seconds=DONE_GRACE_S)}},
+            )
+        except PyMongoError as e:
+            print(f"⚠️ Résultat single_flight non publié: {e}")
+            self._release(key, token)
+        return result
+
+    def _release(self, key, token):
+        try:
+            self.collection.delete_one({"_id": key, "token": token})
+        except PyMongoError as e:
+            print(f"⚠️ Libération single_flight échouée: {e}")
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Instance partagée du processus, coordonnée via la collection `single_flight`"""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            try:
+                from db import db
+                collection = db["single_flight"]
+            except Exception as e:
+                print(f"⚠️ MongoDB indisponible, single-flight limité au processus: {e}")
+                collection = None
+            _single_flight = SingleFlight(collection)
+    return _single_flight
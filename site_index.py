@@ -0,0 +1,258 @@
+"""
+Index d'impact réglementation -> sites Hutchinson
+- juridictions normalisées en codes ISO : pays ISO 3166-1 alpha-2 (graphies françaises et anglaises),
+  "EU" développé en ses États membres, États américains en ISO 3166-2 ("US-AL")
+- chaque site porte ses codes (pays, et subdivision si connue) ; index inversé code -> sites
+- lois indexées dans les deux sens : loi -> sites, site -> lois (recherches en O(1))
+
+Une loi fédérale ("US") touche tous les sites américains, une loi d'État ("US-CA") seulement les sites
+de cet État ; une loi "EU" touche les sites des États membres.
+
+Seuls les sites géolocalisés (collection hutchinson_sites, sinon procurement_data) sont indexés :
+coverage() compare leur nombre au total_sites déclaré dans le profil.
+
+    python site_index.py [site] | law <id_loi> | coverage
+"""
+import sys
+import time
+import unicodedata
+
+from procurement_data import HUTCHINSON_SITES, HUTCHINSON_SITES_INFO
+
+EU = "EU"
+EU_MEMBER_STATES = ("AT", "BE", "BG", "HR", "CY", "CZ", "DK", "EE", "FI", "FR", "DE", "GR", "HU", "IE",
+                    "IT", "LV", "LT", "LU", "MT", "NL", "PL", "PT", "RO", "SK", "SI", "ES", "SE")
+
+# Noms de pays (français, anglais, variantes) -> ISO 3166-1 alpha-2, clés sans accents en minuscules
+COUNTRY_CODES = {
+    "france": "FR", "allemagne": "DE", "germany": "DE", "deutschland": "DE",
+    "pologne": "PL", "poland": "PL", "polska": "PL", "espagne": "ES", "spain": "ES",
+    "italie": "IT", "italy": "IT", "belgique": "BE", "belgium": "BE", "pays-bas": "NL", "netherlands": "NL",
+    "portugal": "PT", "autriche": "AT", "austria": "AT", "suede": "SE", "sweden": "SE",
+    "republique tcheque": "CZ", "czech republic": "CZ", "czechia": "CZ", "slovaquie": "SK", "slovakia": "SK",
+    "hongrie": "HU", "hungary": "HU", "roumanie": "RO", "romania": "RO", "bulgarie": "BG", "bulgaria": "BG",
+    "croatie": "HR", "croatia": "HR", "slovenie": "SI", "slovenia": "SI", "grece": "GR", "greece": "GR",
+    "irlande": "IE", "ireland": "IE", "danemark": "DK", "denmark": "DK", "finlande": "FI", "finland": "FI",
+    "estonie": "EE", "estonia": "EE", "lettonie": "LV", "latvia": "LV", "lituanie": "LT", "lithuania": "LT",
+    "luxembourg": "LU", "malte": "MT", "malta": "MT", "chypre": "CY", "cyprus": "CY",
+    "royaume-uni": "GB", "united kingdom": "GB", "uk": "GB", "suisse": "CH", "switzerland": "CH",
+    "norvege": "NO", "norway": "NO", "turquie": "TR", "turkey": "TR", "russie": "RU", "russia": "RU",
+    "etats-unis": "US", "united states": "US", "usa": "US", "us": "US", "united states of america": "US",
+    "canada": "CA", "mexique": "MX", "mexico": "MX", "bresil": "BR", "brazil": "BR", "brasil": "BR",
+    "argentine": "AR", "argentina": "AR", "chili": "CL", "chile": "CL",
+    "chine": "CN", "china": "CN", "japon": "JP", "japan": "JP", "inde": "IN", "india": "IN",
+    "coree du sud": "KR", "south korea": "KR", "korea": "KR", "thailande": "TH", "thailand": "TH",
+    "vietnam": "VN", "viet nam": "VN", "indonesie": "ID", "indonesia": "ID", "malaisie": "MY", "malaysia": "MY",
+    "singapour": "SG", "singapore": "SG", "australie": "AU", "australia": "AU",
+    "maroc": "MA", "morocco": "MA", "tunisie": "TN", "tunisia": "TN", "afrique du sud": "ZA", "south africa": "ZA",
+    "ue": EU, "eu": EU, "union europeenne": EU, "european union": EU,
+}
+
+US_STATES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA", "californie": "CA",
+    "colorado": "CO", "connecticut": "CT", "delaware": "DE", "florida": "FL", "floride": "FL", "georgia": "GA",
+    "hawaii": "HI", "idaho": "ID", "illinois": "IL", "indiana": "IN", "iowa": "IA", "kansas": "KS",
+    "kentucky": "KY", "louisiana": "LA", "louisiane": "LA", "maine": "ME", "maryland": "MD",
+    "massachusetts": "MA", "michigan": "MI", "minnesota": "MN", "mississippi": "MS", "missouri": "MO",
+    "montana": "MT", "nebraska": "NE", "nevada": "NV", "new hampshire": "NH", "new jersey": "NJ",
+    "new mexico": "NM", "new york": "NY", "north carolina": "NC", "caroline du nord": "NC",
+    "north dakota": "ND", "ohio": "OH", "oklahoma": "OK", "oregon": "OR", "pennsylvania": "PA",
+    "pennsylvanie": "PA", "rhode island": "RI", "south carolina": "SC", "caroline du sud": "SC",
+    "south dakota": "SD", "tennessee": "TN", "texas": "TX", "utah": "UT", "vermont": "VT", "virginia": "VA",
+    "virginie": "VA", "washington": "WA", "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY",
+}
+
+# Reconstruction de l'index depuis MongoDB (sites et lois) au plus toutes les INDEX_TTL_S secondes
+INDEX_TTL_S = 600
+
+_ISO_CODES = set(COUNTRY_CODES.values())
+
+
+def _key(value):
+    value = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(value.lower().replace("_", " ").split())
+
+
+def country_code(value):
+    """
+    Code ISO d'un pays ou d'une juridiction ("France", "Germany", "UE", "US-CA", "California")
+
+    Returns:
+        str: "FR", "EU", "US-CA"... ou None si inconnu
+    """
+    if not value or not str(value).strip():
+        return None
+    raw = str(value).strip()
+    if raw.upper() in _ISO_CODES:
+        return raw.upper()
+    if raw.upper().startswith("US-") and raw[3:].upper() in US_STATES.values():
+        return raw.upper()
+    key = _key(raw)
+    if key in COUNTRY_CODES:
+        return COUNTRY_CODES[key]
+    if key in US_STATES:
+        return f"US-{US_STATES[key]}"
+    return None
+
+
+def jurisdiction_codes(values):
+    """Codes ISO touchés par une liste de juridictions ("EU" développé en États membres)"""
+    if isinstance(values, str):
+        values = [values]
+    codes = set()
+    for value in values or []:
+        code = country_code(value)
+        if code == EU:
+            codes.update(EU_MEMBER_STATES)
+        if code:
+            codes.add(code)
+    return codes
+
+
+def regulation_jurisdictions(regulation):
+    """Juridictions déclarées d'un document regulations ou d'une réglementation suivie"""
+    values = regulation.get("pays_concernes") or []
+    if isinstance(values, str):
+        values = [values]
+    jurisdiction = regulation.get("jurisdiction")
+    if isinstance(jurisdiction, str):
+        values = [*values, jurisdiction]
+    elif isinstance(jurisdiction, list):
+        values = [*values, *jurisdiction]
+    return values
+
+
+def site_codes(site):
+    """Codes d'un site : pays (champ iso, sinon nom du pays) et subdivision si connue"""
+    codes = set()
+    country = site.get("iso") or country_code(site.get("pays"))
+    if country:
+        codes.add(country)
+    if site.get("subdivision"):
+        codes.add(site["subdivision"])
+    return codes
+
+
+class SiteImpactIndex:
+    """Index inversés code ISO -> sites, loi -> sites, site -> lois"""
+
+    def __init__(self, sites):
+        """
+        Args:
+            sites (dict): nom -> {pays, iso?, subdivision?, coordinates}
+        """
+        self.sites = {name: dict(site) for name, site in sites.items()}
+        self.codes_by_site = {}
+        self.sites_by_code = {}
+        for name, site in self.sites.items():
+            codes = site_codes(site)
+            self.codes_by_site[name] = codes
+            for code in codes:
+                self.sites_by_code.setdefault(code, set()).add(name)
+        self.sites_by_law = {}
+        self.laws_by_site = {name: set() for name in self.sites}
+
+    @classmethod
+    def from_reference(cls):
+        """Index des sites de référence de procurement_data"""
+        return cls({name: {"nom": name, "coordinates": coordinates, **HUTCHINSON_SITES_INFO.get(name, {})}
+                    for name, coordinates in HUTCHINSON_SITES.items()})
+
+    def sites_for(self, jurisdictions):
+        """Sites situés dans l'une des juridictions"""
+        hit = set()
+        for code in jurisdiction_codes(jurisdictions):
+            hit |= self.sites_by_code.get(code, set())
+        return hit
+
+    def add_law(self, law_id, jurisdictions):
+        """Indexe (ou ré-indexe) une loi"""
+        self.remove_law(law_id)
+        sites = self.sites_for(jurisdictions)
+        self.sites_by_law[law_id] = sites
+        for site in sites:
+            self.laws_by_site[site].add(law_id)
+        return sites
+
+    def add_laws(self, regulations, id_field="id_loi"):
+        for regulation in regulations:
+            if regulation.get(id_field):
+                self.add_law(regulation[id_field], regulation_jurisdictions(regulation))
+        return self
+
+    def remove_law(self, law_id):
+        for site in self.sites_by_law.pop(law_id, ()):
+            self.laws_by_site[site].discard(law_id)
+
+    def sites_for_law(self, law_id):
+        """Sites touchés par une loi indexée"""
+        return self.sites_by_law.get(law_id, set())
+
+    def laws_for_site(self, site):
+        """Lois indexées touchant un site"""
+        return self.laws_by_site.get(site, set())
+
+    def sites_in_country(self, country):
+        """Sites d'un pays (nom ou code)"""
+        return self.sites_by_code.get(country_code(country), set())
+
+
+_reference_index = None
+
+
+def reference_index():
+    """Index des sites de référence, sans lois (partagé, construit une fois par processus)"""
+    global _reference_index
+    if _reference_index is None:
+        _reference_index = SiteImpactIndex.from_reference()
+    return _reference_index
+
+
+_site_index = None
+_site_index_built_at = 0.0
+
+
+def build_site_index(db):
+    """Index des sites de hutchinson_sites (référence si vide) et des lois de regulations"""
+    sites = {doc["nom"]: doc for doc in db["hutchinson_sites"].find({}, {"_id": 0, "location": 0})}
+    index = SiteImpactIndex(sites) if sites else SiteImpactIndex.from_reference()
+    index.add_laws(db["regulations"].find({}, {"_id": 0, "id_loi": 1, "pays_concernes": 1, "jurisdiction": 1}))
+    return index
+
+
+def get_site_index(db=None, max_age_s=INDEX_TTL_S):
+    """Index partagé du processus, reconstruit au-delà de max_age_s secondes (référence si MongoDB absent)"""
+    global _site_index, _site_index_built_at
+    if _site_index is not None and time.monotonic() - _site_index_built_at < max_age_s:
+        return _site_index
+    try:
+        if db is None:
+            from db import db
+        _site_index = build_site_index(db)
+    except Exception as e:
+        print(f"⚠️ MongoDB indisponible, index des sites de référence: {e}")
+        _site_index = SiteImpactIndex.from_reference()
+    _site_index_built_at = time.monotonic()
+    return _site_index
+
+
+def coverage(index, profile=None):
+    """Sites géolocalisés indexés comparés au total_sites du profil"""
+    declared = (profile or {}).get("total_sites")
+    return {"indexed_sites": len(index.sites), "declared_sites": declared,
+            "countries": sorted({code for codes in index.codes_by_site.values() for code in codes if "-" not in code})}
+
+
+if __name__ == "__main__":
+    from db import db
+
+    index = get_site_index(db)
+    if len(sys.argv) > 2 and sys.argv[1] == "law":
+        print(f"🏭 {sys.argv[2]}: {', '.join(sorted(index.sites_for_law(sys.argv[2]))) or 'aucun site'}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "coverage":
+        stats = coverage(index, db["hutchinson"].find_one({}, {"total_sites": 1}))
+        print(f"📊 {stats['indexed_sites']} sites indexés / {stats['declared_sites']} déclarés "
+              f"({', '.join(stats['countries'])})")
+    else:
+        for site in ([sys.argv[1]] if len(sys.argv) > 1 else sorted(index.sites)):
+            print(f"🏭 {site}: {len(index.laws_for_site(site))} lois")
@@ -0,0 +1,238 @@
+"""
+Snapshots en flux des collections (regulations, embeddings, risk_analysis et indicateurs)
+Export / import JSON lignes (Extended JSON, éventuellement compressé .zst ou .gz) avec
+curseurs par lots et projections : la mémoire reste constante quelle que soit la taille du corpus.
+
+Usage:
+    python snapshot.py export <dossier> [--zstd]
+    python snapshot.py import <dossier>
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from datetime import datetime
+
+from bson import json_util
+from pymongo import UpdateOne
+
+from embedding_models import EMBEDDING_MODELS, all_embedding_fields
+from ingestion import PrefixedReader, iter_json_array
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Documents par lot (curseur et bulk_write)
+DEFAULT_BATCH_SIZE = 500
+
+# Flux d'un snapshot, dans l'ordre d'import (les embeddings complètent les réglementations)
+SNAPSHOT_STREAMS = {
+    "regulations": {
+        "collection": "regulations",
+        "projection": {"_id": 0, **{field: 0 for field in all_embedding_fields()}},
+        "key": "id_loi",
+        "upsert": True,
+    },
+    "embeddings": {
+        "collection": "regulations",
+        "query": {"$or": [{spec["field"]: {"$exists": True}} for spec in EMBEDDING_MODELS.values()]},
+        "projection": {"_id": 0, "id_loi": 1, **{field: 1 for field in all_embedding_fields()}},
+        "key": "id_loi",
+        "upsert": False,
+    },
+    "risk_analysis": {
+        "collection": "risk_analysis",
+        "projection": None,
+        "key": "_id",
+        "upsert": True,
+    },
+    # Stockage des runs LLM (cf. analysis_store)
+    **{
+        name: {"collection": name, "projection": None, "key": "_id", "upsert": True}
+        for name in ("risk_indicators", "risk_law_latest", "risk_indicator_rollups", "risk_profile_snapshots")
+    },
+}
+
+# Extended JSON relâché : dates et ObjectId restaurés à l'identique
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+
+def open_stream(path, mode="rt"):
+    """Ouvre un fichier texte, compressé selon son extension (.zst, .gz)"""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstandard n'est pas installé (pip install zstandard)")
+        return zstandard.open(path, mode, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_jsonl(path, documents):
+    """Écrit un itérable de documents en JSON lignes, retourne le nombre de lignes"""
+    count = 0
+    with open_stream(path, "wt") as handle:
+        for doc in documents:
+            handle.write(json_util.dumps(doc, json_options=JSON_OPTIONS, ensure_ascii=False))
+            handle.write("\n")
+            count += 1
+    return count
+
+
+def iter_jsonl(path):
+    """Documents d'un fichier JSON lignes, un à la fois"""
+    with open_stream(path, "rt") as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json_util.loads(line, json_options=JSON_OPTIONS)
+            except ValueError as e:
+                print(f"⚠️ {path}:{line_number} ignorée (JSON invalide: {e})")
+
+
+def export_stream(db, name, path, batch_size=DEFAULT_BATCH_SIZE):
+    """Exporte un flux du snapshot (curseur par lots + projection)"""
+    spec = SNAPSHOT_STREAMS[name]
+    cursor = db[spec["collection"]].find(spec.get("query", {}), spec["projection"]).batch_size(batch_size)
+    count = write_jsonl(path, cursor)
+    print(f"💾 {name}: {count} documents exportés vers {path}")
+    return count
+
+
+def import_stream(db, name, path, batch_size=DEFAULT_BATCH_SIZE):
+    """Importe un flux du snapshot par bulk_write non ordonnés (upserts sur la clé du flux)"""
+    spec = SNAPSHOT_STREAMS[name]
+    collection = db[spec["collection"]]
+    key = spec["key"]
+    count = 0
+    operations = []
+
+    for doc in iter_jsonl(path):
+        if key not in doc:
+            continue
+        fields = {field: value for field, value in doc.items() if field != "_id"}
+        operations.append(UpdateOne({key: doc[key]}, {"$set": fields}, upsert=spec["upsert"]))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            count += len(operations)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        count += len(operations)
+
+    print(f"✅ {name}: {count} documents importés depuis {path}")
+    return count
+
+
+def _stream_path(directory, name, compressed=None):
+    """Chemin du fichier d'un flux ; en lecture, la variante présente sur disque"""
+    base = os.path.join(directory, f"{name}.jsonl")
+    if compressed is not None:
+        return base + (".zst" if compressed else "")
+    for candidate in (base + ".zst", base + ".gz", base):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def export_snapshot(db, directory, compressed=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Exporte tous les flux du snapshot dans un dossier"""
+    os.makedirs(directory, exist_ok=True)
+    return {
+        name: export_stream(db, name, _stream_path(directory, name, compressed), batch_size)
+        for name in SNAPSHOT_STREAMS
+    }
+
+
+def import_snapshot(db, directory, batch_size=DEFAULT_BATCH_SIZE):
+    """Importe les flux présents dans un dossier de snapshot"""
+    counts = {}
+    for name in SNAPSHOT_STREAMS:
+        path = _stream_path(directory, name)
+        if path is None:
+            print(f"⚠️ {name}: aucun fichier dans {directory}")
+            continue
+        counts[name] = import_stream(db, name, path, batch_size)
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Fichiers d'analyse (hutchinson_analysis_*.jsonl)
+# Ligne 1 : en-tête (métadonnées), puis une ligne par indicateur.
+# ---------------------------------------------------------------------------
+
+def write_analysis_file(path, ui_data):
+    """Écrit une analyse UI : en-tête puis un indicateur par ligne"""
+    header = {key: value for key, value in ui_data.items() if key != "indicators"}
+    header["indicator_count"] = len(ui_data.get("indicators", []))
+    with open_stream(path, "wt") as handle:
+        handle.write(json.dumps({"header": header}, ensure_ascii=False, default=str) + "\n")
+        for indicator in ui_data.get("indicators", []):
+            handle.write(json.dumps(indicator, ensure_ascii=False, default=str) + "\n")
+
+
+def _iter_key_array(handle, key, chunk_chars=1 << 16):
+    """Éléments du tableau associé à `key` dans un objet JSON, sans charger le fichier"""
+    pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ""
+    while True:
+        chunk = handle.read(chunk_chars)
+        if not chunk:
+            return
+        buffer += chunk
+        match = pattern.search(buffer)
+        if match:
+            yield from iter_json_array(PrefixedReader(buffer[match.end() - 1:], handle), chunk_chars)
+            return
+        buffer = buffer[-len(key) - 64:]
+
+
+def read_analysis_file(path):
+    """
+    Lit une analyse sauvegardée sans la charger entièrement
+
+    Returns:
+        tuple: (en-tête dict, itérateur des indicateurs)
+        Les anciens fichiers .json ({"indicators": [...]}) sont lus en flux, sans en-tête.
+    """
+    if ".jsonl" in os.path.basename(path):
+        handle = open_stream(path, "rt")
+        first = handle.readline()
+        header = json.loads(first).get("header", {}) if first.strip() else {}
+
+        def indicators():
+            with handle:
+                for line in handle:
+                    if line.strip():
+                        yield json.loads(line)
+
+        return header, indicators()
+
+    def legacy_indicators():
+        with open_stream(path, "rt") as handle:
+            yield from _iter_key_array(handle, "indicators")
+
+    return {}, legacy_indicators()
+
+
+if __name__ == "__main__":
+    from db import db
+
+    parser = argparse.ArgumentParser(description="Snapshots en flux des collections MongoDB")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory")
+    parser.add_argument("--zstd", action="store_true", help="compresser l'export (.jsonl.zst)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    started = datetime.now()
+    if args.command == "export":
+        export_snapshot(db, args.directory, args.zstd, args.batch_size)
+    else:
+        import_snapshot(db, args.directory, args.batch_size)
+    print(f"⏱️ Terminé en {(datetime.now() - started).total_seconds():.1f}s")
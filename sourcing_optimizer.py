@@ -0,0 +1,209 @@
+"""
+Optimiseur d'approvisionnement multi-produits
+Répartit les volumes commandés entre fournisseurs pour un site Hutchinson en minimisant
+les émissions (ou le coût carbone + achat) sous contraintes de capacité, CBAM et risque.
+Programme linéaire résolu par HiGHS (scipy) si disponible, sinon glouton + recherche locale.
+"""
+import time
+
+import numpy as np
+
+try:
+    from scipy.optimize import linprog
+    from scipy.sparse import csr_matrix
+except ImportError:  # scipy optionnel : on garde l'heuristique
+    linprog = None
+
+# Prix de la tonne de CO2 utilisé pour l'objectif "coût" (€/t, ordre de grandeur EU ETS)
+DEFAULT_CARBON_PRICE_EUR_TONNE = 80.0
+
+# Pénalité par tonne non servie : très supérieure à tout coût réel
+UNMET_PENALTY = 1e9
+
+# Bornes de la recherche locale
+MAX_LOCAL_SEARCH_PASSES = 20
+
+
+def _eligibility(engine, products, require_cbam, max_risk_score):
+    """Matrice (S, P) des couples fournisseur/produit autorisés"""
+    eligible = np.stack([engine.product_mask(p) for p in products], axis=1)
+
+    allowed = np.ones(len(engine.suppliers), dtype=bool)
+    if require_cbam:
+        allowed &= np.array([bool(s.get("certifie_cbam")) for s in engine.suppliers])
+    if max_risk_score is not None:
+        allowed &= np.array([s.get("score", 100) <= max_risk_score for s in engine.suppliers])
+
+    return eligible & allowed[:, None]
+
+
+def has_purchase_prices(suppliers):
+    """Vrai si au moins un fournisseur a un prix d'achat (sinon l'objectif "cost" = émissions × prix carbone)"""
+    return any(s.get("prix_eur_tonne") for s in suppliers)
+
+
+def _unit_costs(engine, site_name, products, objective, chain, carbon_price_eur_tonne):
+    """
+    Coût unitaire (par tonne) de chaque couple fournisseur/produit selon l'objectif
+
+    Returns:
+        tuple: (coûts (S, P) de l'objectif, kg CO2 / t, € / t achat + carbone) par fournisseur
+    """
+    emissions = engine.emissions_per_tonne(site_name, chain)  # kg CO2 / t
+    # Prix d'achat (si renseigné) + coût carbone des émissions
+    prices = np.array([s.get("prix_eur_tonne", 0.0) for s in engine.suppliers], dtype=np.float64)
+    eur_per_tonne = prices + emissions / 1000.0 * carbon_price_eur_tonne
+    if objective == "emissions":
+        per_supplier = emissions
+    elif objective == "cost":
+        per_supplier = eur_per_tonne
+    else:
+        raise ValueError(f"Objectif inconnu: {objective}")
+    return np.repeat(per_supplier[:, None], len(products), axis=1), emissions, eur_per_tonne
+
+
+def _solve_lp(costs, eligible, demand, capacity):
+    """Programme linéaire creux : une variable par couple éligible + une variable de manque par produit"""
+    pairs = np.argwhere(eligible)
+    n_pairs = len(pairs)
+    n_products = len(demand)
+    n_suppliers = len(capacity)
+
+    c = np.concatenate([costs[pairs[:, 0], pairs[:, 1]], np.full(n_products, UNMET_PENALTY)])
+
+    # Demande : somme des allocations + manque = volume demandé
+    eq_rows = np.concatenate([pairs[:, 1], np.arange(n_products)])
+    eq_cols = np.arange(n_pairs + n_products)
+    A_eq = csr_matrix((np.ones(n_pairs + n_products), (eq_rows, eq_cols)),
+                      shape=(n_products, n_pairs + n_products))
+
+    # Capacité : somme des allocations d'un fournisseur <= capacité annuelle
+    A_ub = csr_matrix((np.ones(n_pairs), (pairs[:, 0], np.arange(n_pairs))),
+                      shape=(n_suppliers, n_pairs + n_products))
+
+    result = linprog(c, A_ub=A_ub, b_ub=capacity, A_eq=A_eq, b_eq=demand,
+                     bounds=(0, None), method="highs")
+    if not result.success:
+        return None
+
+    allocation = np.zeros_like(costs)
+    allocation[pairs[:, 0], pairs[:, 1]] = result.x[:n_pairs]
+    return allocation
+
+
+def _solve_greedy(costs, eligible, demand, capacity):
+    """
+    Glouton (produits les plus contraints d'abord) puis recherche locale par transferts
+    Le coût ne dépend que du fournisseur : un échange de produits entre deux fournisseurs ne
+    change pas le coût total, seuls les transferts vers de la capacité libre sont explorés
+    """
+    allocation = np.zeros_like(costs)
+    remaining = capacity.astype(np.float64).copy()
+    masked = np.where(eligible, costs, np.inf)
+
+    # Produits avec le moins de capacité éligible en premier
+    eligible_capacity = (eligible * capacity[:, None]).sum(axis=0)
+    for p in np.argsort(eligible_capacity - demand):
+        need = demand[p]
+        for s in np.argsort(masked[:, p]):
+            if need <= 0 or not np.isfinite(masked[s, p]):
+                break
+            qty = min(need, remaining[s])
+            if qty > 0:
+                allocation[s, p] += qty
+                remaining[s] -= qty
+                need -= qty
+
+    # Recherche locale : déplacer du volume vers un fournisseur moins coûteux
+    for _ in range(MAX_LOCAL_SEARCH_PASSES):
+        improved = False
+        for s, p in np.argwhere(allocation > 0):
+            for s2 in np.argsort(masked[:, p]):
+                if allocation[s, p] <= 0 or masked[s2, p] >= masked[s, p]:
+                    break
+                # Transfert direct sur la capacité libre
+                qty = min(allocation[s, p], remaining[s2])
+                if qty > 0:
+                    allocation[s, p] -= qty
+                    allocation[s2, p] += qty
+                    remaining[s2] -= qty
+                    remaining[s] += qty
+                    improved = True
+        if not improved:
+            break
+
+    return allocation
+
+
+def optimize_sourcing(engine, site_name, product_volumes, objective="emissions",
+                      require_cbam=False, max_risk_score=None, chain=None,
+                      carbon_price_eur_tonne=DEFAULT_CARBON_PRICE_EUR_TONNE, method="auto"):
+    """
+    Calcule la meilleure répartition des volumes par produit entre fournisseurs
+
+    Args:
+        engine (EmissionsEngine): moteur d'émissions pré-calculé
+        site_name (str): site Hutchinson de destination
+        product_volumes (dict): tonnes demandées par produit
+        objective (str): "emissions" (kg CO2) ou "cost" (achat + coût carbone, cf. has_purchase_prices)
+        require_cbam (bool): n'autoriser que les fournisseurs certifiés CBAM
+        max_risk_score (int): score de risque fournisseur maximal autorisé
+        chain (list): chaîne de transport imposée (None = automatique)
+        method (str): "auto", "lp" ou "greedy"
+
+    Returns:
+        dict: allocations, totaux, volumes non servis et solveur utilisé
+    """
+    started = time.perf_counter()
+    products = [p for p, v in product_volumes.items() if v > 0]
+    if not products:
+        return {"allocations": [], "total_emissions": 0.0, "total_cost": 0.0,
+                "unmet": {}, "solver": None, "status": "empty", "solve_ms": 0.0}
+
+    demand = np.array([product_volumes[p] for p in products], dtype=np.float64)
+    capacity = np.array([s.get("volume_annuel_tonnes", 0) for s in engine.suppliers], dtype=np.float64)
+    eligible = _eligibility(engine, products, require_cbam, max_risk_score)
+    costs, emissions, eur_per_tonne = _unit_costs(engine, site_name, products, objective, chain, carbon_price_eur_tonne)
+
+    allocation = None
+    solver = "greedy"
+    if method in ("auto", "lp") and linprog is not None:
+        allocation = _solve_lp(costs, eligible, demand, capacity)
+        solver = "highs"
+    if allocation is None:
+        if method == "lp":
+            raise RuntimeError("Solveur LP indisponible (scipy non installé ou échec de résolution)")
+        allocation = _solve_greedy(costs, eligible, demand, capacity)
+        solver = "greedy"
+
+    # Nettoyage des résidus numériques du solveur
+    allocation[allocation < 1e-6] = 0.0
+    served = allocation.sum(axis=0)
+    unmet = {p: float(demand[j] - served[j]) for j, p in enumerate(products) if demand[j] - served[j] > 1e-6}
+
+    allocations = []
+    for s, p in np.argwhere(allocation > 0):
+        supplier = engine.suppliers[s]
+        tonnes = float(allocation[s, p])
+        allocations.append({
+            "nom": supplier["nom"],
+            "pays": supplier.get("pays"),
+            "produit": products[p],
+            "tonnes": tonnes,
+            "emissions_kg": float(emissions[s] * tonnes),
+            "cout": float(eur_per_tonne[s] * tonnes),
+            "certifie_cbam": supplier.get("certifie_cbam", False),
+            "score": supplier.get("score"),
+        })
+    allocations.sort(key=lambda a: (a["produit"], -a["tonnes"]))
+
+    return {
+        "allocations": allocations,
+        "total_emissions": sum(a["emissions_kg"] for a in allocations),
+        "total_cost": sum(a["cout"] for a in allocations),
+        "unmet": unmet,
+        "objective": objective,
+        "solver": solver,
+        "status": "partial" if unmet else "optimal" if solver == "highs" else "heuristic",
+        "solve_ms": (time.perf_counter() - started) * 1000,
+    }
@@ -0,0 +1,377 @@
+"""
+Stockage indexé des données achats : fournisseurs, sites Hutchinson, réglementations suivies
+Collections MongoDB avec index composés (matériau, pays, continent, score) et index 2dsphere
+sur les coordonnées, derrière une API de requêtes typée utilisée par la page achats.
+Repli en mémoire (index par dictionnaires) si MongoDB n'est pas joignable.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, TypedDict
+
+import os
+
+import numpy as np
+import pymongo
+from pymongo import ASCENDING, GEOSPHERE, ReplaceOne
+
+from deadlines import URGENT_MONTHS, obligation_documents, sync_obligations, upcoming_query
+from emissions_engine import haversine_matrix, material_matches
+from procurement_data import (
+    HUTCHINSON_SITES,
+    HUTCHINSON_SITES_INFO,
+    MATERIALS_DATA,
+    SAMPLE_REGULATIONS,
+    SUPPLIERS_EXTENDED,
+)
+
+SUPPLIERS_COLLECTION = "suppliers"
+SITES_COLLECTION = "hutchinson_sites"
+REGULATIONS_COLLECTION = "purchasing_regulations"
+MATERIALS_COLLECTION = "materials"
+
+# Délai de détection d'une base injoignable avant le repli en mémoire (sélection de serveur comprise)
+STORE_PING_TIMEOUT_S = float(os.getenv("SUPPLIER_STORE_PING_TIMEOUT_S", "3"))
+
+# Champs techniques ajoutés aux documents MongoDB, retirés avant de rendre la main à l'UI
+_INTERNAL_FIELDS = ("_id", "location", "materiau_key", "seq")
+
+
+class Supplier(TypedDict, total=False):
+    nom: str
+    pays: str
+    ville: str
+    materiau: str
+    coordinates: List[float]  # [lat, lon]
+    risque: str
+    score: int
+    emissions_co2_kg_tonne: float
+    certifie_iso14001: bool
+    certifie_cbam: bool
+    volume_annuel_tonnes: int
+    continent: str
+    distance_km: float  # renseigné par nearest_suppliers
+
+
+class Site(TypedDict):
+    nom: str
+    coordinates: List[float]  # [lat, lon]
+    pays: str
+    continent: str
+
+
+class WatchedRegulation(TypedDict, total=False):
+    id: str
+    title: str
+    jurisdiction: str
+    rtype: str
+    phase: str
+    date_published: str
+    deadline: str
+    deadline_at: datetime  # échéance typée (normalisée au chargement)
+    summary: str
+    impact_hutchinson: str
+
+
+def _geo_point(coordinates):
+    """Point GeoJSON (longitude d'abord) à partir de coordonnées [lat, lon]"""
+    return {"type": "Point", "coordinates": [coordinates[1], coordinates[0]]}
+
+
+def _supplier_document(supplier, seq):
+    return {
+        **supplier,
+        "materiau_key": supplier["materiau"].lower(),
+        "location": _geo_point(supplier["coordinates"]),
+        "seq": seq,
+    }
+
+
+def _with_deadline(regulation):
+    """Réglementation suivie avec son échéance typée (deadline_at)"""
+    documents = obligation_documents(regulation, source="purchasing")
+    return {**regulation, "deadline_at": documents[0]["due_date"] if documents else None}
+
+
+def _strip(doc):
+    return {k: v for k, v in doc.items() if k not in _INTERNAL_FIELDS}
+
+
+def _material_keys(materials, keys):
+    """Clés matériau (minuscules) correspondant aux matériaux demandés, même règle que EmissionsEngine"""
+    return sorted({key for key in keys if any(material_matches(m, key) for m in materials)})
+
+
+def _supplier_filter(material_keys=None, country=None, continent=None,
+                     min_score=None, max_score=None, cbam_only=False):
+    """Filtre MongoDB équivalent aux critères de find_suppliers (matériaux résolus en clés)"""
+    query = {}
+    if material_keys is not None:
+        query["materiau_key"] = {"$in": material_keys}
+    if country:
+        query["pays"] = country
+    if continent:
+        query["continent"] = continent
+    if min_score is not None or max_score is not None:
+        query["score"] = {}
+        if min_score is not None:
+            query["score"]["$gte"] = min_score
+        if max_score is not None:
+            query["score"]["$lte"] = max_score
+    if cbam_only:
+        query["certifie_cbam"] = True
+    return query
+
+
+class MongoSupplierStore:
+    """Données achats dans MongoDB, toutes les requêtes passent par des index"""
+
+    backend = "mongodb"
+
+    def __init__(self, database):
+        self.database = database
+        self.suppliers = database[SUPPLIERS_COLLECTION]
+        self.sites_collection = database[SITES_COLLECTION]
+        self.regulations = database[REGULATIONS_COLLECTION]
+        self.materials_collection = database[MATERIALS_COLLECTION]
+
+    def ensure_indexes(self):
+        """Crée les index (idempotent)"""
+        self.suppliers.create_index("nom", unique=True)
+        self.suppliers.create_index([
+            ("materiau_key", ASCENDING), ("pays", ASCENDING),
+            ("continent", ASCENDING), ("score", ASCENDING)
+        ])
+        self.suppliers.create_index([("continent", ASCENDING), ("score", ASCENDING)])
+        self.suppliers.create_index([("score", ASCENDING)])
+        self.suppliers.create_index([("location", GEOSPHERE)])
+
+        self.sites_collection.create_index("nom", unique=True)
+        self.sites_collection.create_index([("location", GEOSPHERE)])
+
+        self.regulations.create_index("id", unique=True)
+        self.regulations.create_index([("jurisdiction", ASCENDING), ("rtype", ASCENDING)])
+        self.regulations.create_index("deadline_at")
+
+        self.materials_collection.create_index("libelle", unique=True)
+
+    def seed(self, suppliers=SUPPLIERS_EXTENDED, sites=HUTCHINSON_SITES,
+             regulations=SAMPLE_REGULATIONS, materials=MATERIALS_DATA):
+        """Charge (ou met à jour) les données de référence par upserts groupés"""
+        self.suppliers.bulk_write([
+            ReplaceOne({"nom": s["nom"]}, _supplier_document(s, i), upsert=True)
+            for i, s in enumerate(suppliers)
+        ], ordered=False)
+        self.sites_collection.bulk_write([
+            ReplaceOne({"nom": name}, {
+                "nom": name,
+                "coordinates": coords,
+                "location": _geo_point(coords),
+                "seq": i,
+                **HUTCHINSON_SITES_INFO.get(name, {"pays": None, "continent": "Europe"})
+            }, upsert=True)
+            for i, (name, coords) in enumerate(sites.items())
+        ], ordered=False)
+        self.regulations.bulk_write([
+            ReplaceOne({"id": r["id"]}, _with_deadline(r), upsert=True) for r in regulations
+        ], ordered=False)
+        sync_obligations(self.database, regulations, source="purchasing")
+        self.materials_collection.bulk_write([
+            ReplaceOne({"libelle": m["libelle"]}, {**m, "seq": i}, upsert=True)
+            for i, m in enumerate(materials)
+        ], ordered=False)
+
+    def is_empty(self):
+        return self.suppliers.estimated_document_count() == 0
+
+    def _material_keys(self, materials):
+        if not materials:
+            return None
+        return _material_keys(materials, self.suppliers.distinct("materiau_key"))
+
+    def find_suppliers(self, materials: Optional[List[str]] = None, country: Optional[str] = None,
+                       continent: Optional[str] = None, min_score: Optional[int] = None,
+                       max_score: Optional[int] = None, cbam_only: bool = False) -> List[Supplier]:
+        """Fournisseurs correspondant aux critères (matériaux par inclusion, pays, continent, score)"""
+        query = _supplier_filter(self._material_keys(materials), country, continent, min_score, max_score, cbam_only)
+        cursor = self.suppliers.find(query, {"location": 0, "materiau_key": 0}).sort("seq", ASCENDING)
+        return [_strip(doc) for doc in cursor]
+
+    def nearest_suppliers(self, coordinates: List[float], materials: Optional[List[str]] = None,
+                          max_distance_km: Optional[float] = None, limit: int = 10) -> List[Supplier]:
+        """Fournisseurs les plus proches d'un point [lat, lon] (requête $geoNear sur l'index 2dsphere)"""
+        geo_near = {
+            "near": _geo_point(coordinates),
+            "distanceField": "distance_m",
+            "spherical": True,
+            "query": _supplier_filter(self._material_keys(materials)),
+        }
+        if max_distance_km is not None:
+            geo_near["maxDistance"] = max_distance_km * 1000
+        results = []
+        for doc in self.suppliers.aggregate([{"$geoNear": geo_near}, {"$limit": limit}]):
+            doc["distance_km"] = doc.pop("distance_m") / 1000
+            results.append(_strip(doc))
+        return results
+
+    def sites(self) -> Dict[str, Site]:
+        """Sites Hutchinson indexés par nom"""
+        return {doc["nom"]: _strip(doc) for doc in self.sites_collection.find().sort("seq", ASCENDING)}
+
+    def find_regulations(self, jurisdiction: Optional[str] = None,
+                         rtype: Optional[str] = None) -> List[WatchedRegulation]:
+        """Réglementations suivies, filtrées par juridiction et/ou type"""
+        query = {}
+        if jurisdiction:
+            query["jurisdiction"] = jurisdiction
+        if rtype:
+            query["rtype"] = rtype
+        return [_strip(doc) for doc in self.regulations.find(query)]
+
+    def regulation_facets(self) -> Dict[str, List[str]]:
+        """Valeurs distinctes des filtres juridiction / type (lues depuis l'index)"""
+        return {
+            "jurisdictions": sorted(self.regulations.distinct("jurisdiction")),
+            "types": sorted(self.regulations.distinct("rtype")),
+        }
+
+    def count_upcoming_deadlines(self, months: int = URGENT_MONTHS) -> int:
+        """Réglementations suivies dont l'échéance tombe dans les N prochains mois (collection obligations)"""
+        return self.database["obligations"].count_documents(upcoming_query(months, source="purchasing"))
+
+    def material_labels(self) -> List[str]:
+        return [doc["libelle"] for doc in self.materials_collection.find({}, {"libelle": 1}).sort("seq", ASCENDING)]
+
+
+class MemorySupplierStore:
+    """Même API en mémoire : index par dictionnaires et recherche géographique vectorisée"""
+
+    backend = "memory"
+
+    def __init__(self, suppliers=SUPPLIERS_EXTENDED, sites=HUTCHINSON_SITES,
+                 regulations=SAMPLE_REGULATIONS, materials=MATERIALS_DATA):
+        self._suppliers = [dict(s) for s in suppliers]
+        self._coords = np.array([s["coordinates"] for s in self._suppliers], dtype=np.float64).reshape(-1, 2)
+        self._scores = np.array([s.get("score", 0) for s in self._suppliers])
+
+        # Index inversés : valeur -> positions des fournisseurs
+        self._by_material = {}
+        self._by_country = {}
+        self._by_continent = {}
+        for i, s in enumerate(self._suppliers):
+            self._by_material.setdefault(s["materiau"].lower(), set()).add(i)
+            self._by_country.setdefault(s.get("pays"), set()).add(i)
+            self._by_continent.setdefault(s.get("continent"), set()).add(i)
+
+        self._sites = {
+            name: {"nom": name, "coordinates": coords,
+                   **HUTCHINSON_SITES_INFO.get(name, {"pays": None, "continent": "Europe"})}
+            for name, coords in sites.items()
+        }
+        self._regulations = [_with_deadline(r) for r in regulations]
+        self._regulations_by_key = {}
+        for r in self._regulations:
+            self._regulations_by_key.setdefault((r.get("jurisdiction"), None), []).append(r)
+            self._regulations_by_key.setdefault((None, r.get("rtype")), []).append(r)
+            self._regulations_by_key.setdefault((r.get("jurisdiction"), r.get("rtype")), []).append(r)
+        self._materials = [m["libelle"] for m in materials]
+
+    def _candidates(self, materials=None, country=None, continent=None):
+        sets = []
+        if materials:
+            sets.append(set().union(*(self._by_material[key]
+                                      for key in _material_keys(materials, self._by_material))))
+        if country:
+            sets.append(self._by_country.get(country, set()))
+        if continent:
+            sets.append(self._by_continent.get(continent, set()))
+        if not sets:
+            return range(len(self._suppliers))
+        return sorted(set.intersection(*sets))
+
+    def find_suppliers(self, materials: Optional[List[str]] = None, country: Optional[str] = None,
+                       continent: Optional[str] = None, min_score: Optional[int] = None,
+                       max_score: Optional[int] = None, cbam_only: bool = False) -> List[Supplier]:
+        results = []
+        for i in self._candidates(materials, country, continent):
+            score = self._scores[i]
+            if min_score is not None and score < min_score:
+                continue
+            if max_score is not None and score > max_score:
+                continue
+            if cbam_only and not self._suppliers[i].get("certifie_cbam"):
+                continue
+            results.append(self._suppliers[i])
+        return results
+
+    def nearest_suppliers(self, coordinates: List[float], materials: Optional[List[str]] = None,
+                          max_distance_km: Optional[float] = None, limit: int = 10) -> List[Supplier]:
+        candidates = np.fromiter(self._candidates(materials), dtype=np.intp)
+        if candidates.size == 0:
+            return []
+        distances = haversine_matrix(self._coords[candidates], [coordinates])[:, 0]
+        order = np.argsort(distances)[:limit]
+        return [
+            {**self._suppliers[candidates[j]], "distance_km": float(distances[j])}
+            for j in order
+            if max_distance_km is None or distances[j] <= max_distance_km
+        ]
+
+    def sites(self) -> Dict[str, Site]:
+        return dict(self._sites)
+
+    def find_regulations(self, jurisdiction: Optional[str] = None,
+                         rtype: Optional[str] = None) -> List[WatchedRegulation]:
+        if not jurisdiction and not rtype:
+            return list(self._regulations)
+        return list(self._regulations_by_key.get((jurisdiction or None, rtype or None), []))
+
+    def regulation_facets(self) -> Dict[str, List[str]]:
+        return {
+            "jurisdictions": sorted({r["jurisdiction"] for r in self._regulations}),
+            "types": sorted({r["rtype"] for r in self._regulations}),
+        }
+
+    def count_upcoming_deadlines(self, months: int = URGENT_MONTHS) -> int:
+        due = upcoming_query(months)["due_date"]
+        return sum(1 for r in self._regulations
+                   if r["deadline_at"] is not None and due["$gte"] <= r["deadline_at"] < due["$lt"])
+
+    def material_labels(self) -> List[str]:
+        return list(self._materials)
+
+
+def get_supplier_store(database=None):
+    """
+    Retourne le store MongoDB (index créés, données amorcées si vide)
+    ou le store en mémoire si la base n'est pas joignable
+    """
+    try:
+        if database is None:
+            from db import db as database
+        # Délai court : un cluster injoignable ne bloque pas la page ~30 s avant le repli
+        with pymongo.timeout(STORE_PING_TIMEOUT_S):
+            database.command("ping")
+
+        store = MongoSupplierStore(database)
+        store.ensure_indexes()
+        if store.is_empty():
+            store.seed()
+            print("✅ Données achats chargées dans MongoDB")
+        elif database["obligations"].find_one({"source": "purchasing"}, {"_id": 1}) is None:
+            # Base amorcée avant la normalisation des échéances
+            sync_obligations(database, store.regulations.find({}, {"_id": 0}), source="purchasing")
+        return store
+
+    except Exception as e:
+        print(f"⚠️ MongoDB indisponible pour les données achats, repli en mémoire: {e}")
+        return MemorySupplierStore()
+
+
+if __name__ == "__main__":
+    # Amorçage / mise à jour explicite des collections achats
+    from db import db
+
+    store = MongoSupplierStore(db)
+    store.ensure_indexes()
+    store.seed()
+    print(f"✅ {db[SUPPLIERS_COLLECTION].count_documents({})} fournisseurs, "
+          f"{db[SITES_COLLECTION].count_documents({})} sites indexés")
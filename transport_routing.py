@@ -0,0 +1,447 @@
+"""
+Routage multimodal fournisseurs -> sites Hutchinson
+Graphe local de ports, points de passage maritimes, hubs ferroviaires et liaisons routières,
+avec facteurs d'émission par mode (procurement_data.TRANSPORT_MODES). Plus court chemin multi-critères
+(Dijkstra / A*) sur les états (nœud, mode) pour pénaliser les transbordements, et tables
+fournisseurs × sites pré-calculées, mises en cache sur disque.
+
+    python transport_routing.py check     (itinéraires des fournisseurs situés sur un site)
+"""
+import hashlib
+import heapq
+import json
+import os
+import sys
+from itertools import count
+
+import numpy as np
+
+from emissions_engine import haversine_matrix
+
+# Ports et points de passage maritimes [lat, lon]
+PORTS = {
+    "Port de Rotterdam": [51.95, 4.14],
+    "Port d'Anvers": [51.26, 4.40],
+    "Port de Hambourg": [53.54, 9.97],
+    "Port du Havre": [49.48, 0.11],
+    "Port de Gdańsk": [54.40, 18.67],
+    "Port de Gênes": [44.41, 8.93],
+    "Port de Barcelone": [41.35, 2.17],
+    "Port de Shanghai": [31.35, 121.60],
+    "Port de Yokohama": [35.45, 139.65],
+    "Port de Singapour": [1.26, 103.84],
+    "Port de Laem Chabang": [13.08, 100.88],
+    "Port de Nhava Sheva": [18.95, 72.95],
+    "Port de Santos": [-23.96, -46.30],
+    "Port de Savannah": [32.08, -81.09],
+    "Port de Mobile": [30.69, -88.04],
+    "Port de Houston": [29.73, -95.27],
+}
+
+SEA_WAYPOINTS = {
+    "Canal de Suez": [31.26, 32.30],
+    "Bab-el-Mandeb": [12.60, 43.30],
+    "Détroit de Gibraltar": [35.95, -5.60],
+    "Pointe de Dondra": [5.90, 80.60],
+    "Canal de Panama": [9.08, -79.68],
+    "Ouessant": [48.50, -5.50],
+    "Détroit de Floride": [24.40, -81.00],
+    "Cap de Bonne-Espérance": [-34.80, 20.00],
+}
+
+# Hubs ferroviaires [lat, lon]
+RAIL_HUBS = {
+    "Duisbourg": [51.43, 6.76],
+    "Paris Valenton": [48.75, 2.46],
+    "Lyon": [45.75, 4.85],
+    "Munich Riem": [48.14, 11.58],
+    "Wrocław": [51.11, 17.04],
+    "Varsovie": [52.23, 21.01],
+    "Milan": [45.46, 9.19],
+    "Vienne": [48.21, 16.37],
+    "Madrid": [40.42, -3.70],
+    "Hanovre": [52.37, 9.73],
+    "Xi'an": [34.34, 108.94],
+    "Atlanta": [33.75, -84.39],
+}
+
+# Masse continentale des hubs (pas de liaison routière entre masses différentes)
+HUB_LANDMASS = {
+    **{name: "Europe" for name in ["Port de Rotterdam", "Port d'Anvers", "Port de Hambourg", "Port du Havre",
+                                   "Port de Gdańsk", "Port de Gênes", "Port de Barcelone", "Duisbourg",
+                                   "Paris Valenton", "Lyon", "Munich Riem", "Wrocław", "Varsovie", "Milan",
+                                   "Vienne", "Madrid", "Hanovre"]},
+    **{name: "Asie" for name in ["Port de Shanghai", "Port de Singapour", "Port de Laem Chabang",
+                                 "Port de Nhava Sheva", "Xi'an"]},
+    "Port de Yokohama": "Japon",
+    "Port de Santos": "Amérique du Sud",
+    **{name: "Amérique du Nord" for name in ["Port de Savannah", "Port de Mobile", "Port de Houston", "Atlanta"]},
+}
+
+# Pays insulaires : masse distincte de leur continent
+ISLAND_COUNTRIES = {"Japon": "Japon"}
+
+# Couloirs maritimes (non orientés)
+SEA_LANES = [
+    ("Port de Shanghai", "Port de Yokohama"), ("Port de Shanghai", "Port de Singapour"),
+    ("Port de Laem Chabang", "Port de Singapour"), ("Port de Singapour", "Pointe de Dondra"),
+    ("Port de Nhava Sheva", "Pointe de Dondra"), ("Port de Nhava Sheva", "Bab-el-Mandeb"),
+    ("Pointe de Dondra", "Bab-el-Mandeb"), ("Bab-el-Mandeb", "Canal de Suez"),
+    ("Canal de Suez", "Port de Gênes"), ("Canal de Suez", "Port de Barcelone"),
+    ("Canal de Suez", "Détroit de Gibraltar"), ("Port de Gênes", "Port de Barcelone"),
+    ("Port de Barcelone", "Détroit de Gibraltar"), ("Détroit de Gibraltar", "Ouessant"),
+    ("Ouessant", "Port du Havre"), ("Ouessant", "Port de Rotterdam"), ("Ouessant", "Port d'Anvers"),
+    ("Port du Havre", "Port de Rotterdam"), ("Port de Rotterdam", "Port d'Anvers"),
+    ("Port de Rotterdam", "Port de Hambourg"), ("Port de Hambourg", "Port de Gdańsk"),
+    ("Ouessant", "Port de Savannah"), ("Détroit de Gibraltar", "Port de Savannah"),
+    ("Port de Savannah", "Détroit de Floride"), ("Détroit de Floride", "Port de Mobile"),
+    ("Détroit de Floride", "Port de Houston"), ("Port de Mobile", "Port de Houston"),
+    ("Détroit de Floride", "Canal de Panama"), ("Port de Houston", "Canal de Panama"),
+    ("Canal de Panama", "Port de Yokohama"), ("Canal de Panama", "Port de Shanghai"),
+    ("Port de Santos", "Détroit de Gibraltar"), ("Port de Santos", "Ouessant"),
+    ("Port de Santos", "Détroit de Floride"), ("Port de Santos", "Cap de Bonne-Espérance"),
+    ("Cap de Bonne-Espérance", "Pointe de Dondra"), ("Cap de Bonne-Espérance", "Port de Singapour"),
+]
+
+# Lignes ferroviaires (non orientées)
+RAIL_LINES = [
+    ("Port de Rotterdam", "Duisbourg"), ("Port d'Anvers", "Duisbourg"), ("Port de Hambourg", "Hanovre"),
+    ("Port du Havre", "Paris Valenton"), ("Port de Gênes", "Milan"), ("Port de Barcelone", "Madrid"),
+    ("Port de Barcelone", "Lyon"), ("Port de Gdańsk", "Varsovie"),
+    ("Duisbourg", "Hanovre"), ("Duisbourg", "Paris Valenton"), ("Duisbourg", "Munich Riem"),
+    ("Paris Valenton", "Lyon"), ("Lyon", "Milan"), ("Milan", "Munich Riem"), ("Munich Riem", "Vienne"),
+    ("Vienne", "Wrocław"), ("Hanovre", "Wrocław"), ("Hanovre", "Varsovie"), ("Wrocław", "Varsovie"),
+    ("Varsovie", "Xi'an"), ("Port de Shanghai", "Xi'an"),
+    ("Port de Savannah", "Atlanta"), ("Port de Mobile", "Atlanta"), ("Port de Houston", "Atlanta"),
+]
+
+# Rapport distance réelle / orthodromique par mode
+DETOUR_FACTORS = {"Maritime": 1.15, "Train": 1.25, "Route": 1.3, "Aérien": 1.05}
+
+# Distance routière maximale entre un point et un hub, ou entre deux extrémités (km, à vol d'oiseau)
+ROAD_MAX_KM = 1200
+
+# Version du graphe (invalide les tables en cache quand la construction change)
+GRAPH_VERSION = 2
+
+# Temps de transbordement entre deux modes (heures)
+TRANSFER_HOURS = 12
+
+# Pondérations (kg CO2/t, heures) des critères prédéfinis
+CRITERIA = {
+    "emissions": {"emissions": 1.0, "time": 0.001},
+    "time": {"emissions": 0.001, "time": 1.0},
+    "balanced": {"emissions": 1.0, "time": 0.2},
+}
+
+# Modes autorisés par défaut (l'aérien n'est retenu que sur demande)
+DEFAULT_MODES = ("Route", "Train", "Maritime")
+
+ROUTE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".route_cache")
+
+
+def _dedupe_modes(legs):
+    """Séquence des modes d'un itinéraire, sans répétitions consécutives"""
+    modes = []
+    for leg in legs:
+        if not modes or modes[-1] != leg["mode"]:
+            modes.append(leg["mode"])
+    return modes
+
+
+class TransportGraph:
+    """Graphe multimodal : hubs fixes + points d'extrémité (fournisseurs, sites) rattachés par la route"""
+
+    def __init__(self, transport_modes, criteria="emissions", allowed_modes=DEFAULT_MODES):
+        self.transport_modes = transport_modes
+        self.weights = CRITERIA[criteria] if isinstance(criteria, str) else criteria
+        self.criteria_name = criteria if isinstance(criteria, str) else json.dumps(criteria, sort_keys=True)
+        self.allowed_modes = tuple(allowed_modes)
+
+        self.coords = {}
+        self.landmass = {}
+        self.endpoints = set()
+        self.adjacency = {}
+
+        for name, coords in {**PORTS, **SEA_WAYPOINTS, **RAIL_HUBS}.items():
+            self._add_node(name, coords, HUB_LANDMASS.get(name, "Mer"))
+
+        for a, b in SEA_LANES:
+            self._add_edge(a, b, "Maritime")
+        for a, b in RAIL_LINES:
+            self._add_edge(a, b, "Train")
+
+        # Pré- et post-acheminement routier entre hubs terrestres proches
+        land_hubs = [n for n in self.coords if self.landmass[n] != "Mer"]
+        distances = haversine_matrix([self.coords[n] for n in land_hubs], [self.coords[n] for n in land_hubs])
+        for i, a in enumerate(land_hubs):
+            for j in range(i + 1, len(land_hubs)):
+                b = land_hubs[j]
+                if self.landmass[a] == self.landmass[b] and distances[i, j] <= ROAD_MAX_KM:
+                    self._add_edge(a, b, "Route", distances[i, j])
+
+    def _add_node(self, name, coords, landmass):
+        self.coords[name] = list(coords)
+        self.landmass[name] = landmass
+        self.adjacency.setdefault(name, [])
+
+    def _edge_cost(self, mode, distance_km):
+        """(kg CO2 par tonne, heures, poids multi-critères) d'un tronçon"""
+        mode_data = self.transport_modes[mode]
+        emissions = distance_km * mode_data["factor"]
+        hours = distance_km / mode_data["speed_kmh"]
+        weight = self.weights["emissions"] * emissions + self.weights["time"] * hours
+        return emissions, hours, weight
+
+    def _add_edge(self, a, b, mode, great_circle_km=None):
+        if mode not in self.allowed_modes:
+            return
+        if great_circle_km is None:
+            great_circle_km = haversine_matrix([self.coords[a]], [self.coords[b]])[0, 0]
+        distance = float(great_circle_km) * DETOUR_FACTORS[mode]
+        emissions, hours, weight = self._edge_cost(mode, distance)
+        edge = (mode, distance, emissions, hours, weight)
+        self.adjacency[a].append((b,) + edge)
+        self.adjacency[b].append((a,) + edge)
+
+    def add_endpoint(self, name, coords, landmass):
+        """
+        Rattache un fournisseur ou un site aux hubs de sa masse continentale par la route,
+        et directement aux extrémités proches de la même masse (livraison sans passer par un hub)
+        """
+        if name in self.endpoints:
+            return
+        neighbors = [n for n in self.endpoints if self.landmass[n] == landmass]
+        self._add_node(name, coords, landmass)
+        self.endpoints.add(name)
+
+        if neighbors:
+            distances = haversine_matrix([coords], [self.coords[n] for n in neighbors])[0]
+            for i, neighbor in enumerate(neighbors):
+                if distances[i] <= ROAD_MAX_KM:
+                    self._add_edge(name, neighbor, "Route", distances[i])
+
+        hubs = [n for n in self.coords if n not in self.endpoints and self.landmass[n] == landmass]
+        if not hubs:
+            # Aucun hub sur la même masse : rattachement au port le plus proche
+            hubs = list(PORTS)
+        distances = haversine_matrix([coords], [self.coords[n] for n in hubs])[0]
+        nearest = int(np.argmin(distances))
+        for i, hub in enumerate(hubs):
+            if distances[i] <= ROAD_MAX_KM or i == nearest:
+                self._add_edge(name, hub, "Route", distances[i])
+
+    def _heuristic_rate(self):
+        """Poids minimal par km orthodromique, tous modes autorisés confondus (A* admissible)"""
+        return min(
+            self.weights["emissions"] * self.transport_modes[m]["factor"]
+            + self.weights["time"] / self.transport_modes[m]["speed_kmh"]
+            for m in self.allowed_modes
+        )
+
+    def _search(self, source, target=None, air_targets=()):
+        """
+        Plus court chemin sur les états (nœud, mode d'arrivée) depuis source.
+        Avec target : A* arrêté à la cible. Sans target : Dijkstra complet.
+        Les extrémités (fournisseurs, sites) ne servent jamais de transit.
+        """
+        rate = self._heuristic_rate()
+        target_coords = self.coords[target] if target else None
+
+        def heuristic(node):
+            if target is None:
+                return 0.0
+            return rate * haversine_matrix([self.coords[node]], [target_coords])[0, 0]
+
+        tie = count()
+        start = (source, None)
+        best = {start: 0.0}
+        parent = {start: None}
+        heap = [(heuristic(source), next(tie), 0.0, start)]
+        settled = {}
+
+        while heap:
+            _, _, weight, state = heapq.heappop(heap)
+            if weight > best.get(state, float("inf")):
+                continue
+            node, mode_in = state
+            if node not in settled or weight < settled[node][0]:
+                settled[node] = (weight, state)
+            if node == target:
+                break
+            if node != source and node in self.endpoints:
+                continue
+
+            edges = self.adjacency[node]
+            if node == source and "Aérien" in self.allowed_modes:
+                edges = edges + [self._air_edge(source, t) for t in air_targets if t != source]
+
+            for neighbor, mode, distance, emissions, hours, edge_weight in edges:
+                transfer = 0.0
+                if mode_in is not None and mode != mode_in:
+                    transfer = self.weights["time"] * TRANSFER_HOURS
+                candidate = weight + edge_weight + transfer
+                next_state = (neighbor, mode)
+                if candidate < best.get(next_state, float("inf")):
+                    best[next_state] = candidate
+                    parent[next_state] = (state, mode, distance, emissions, hours)
+                    heapq.heappush(heap, (candidate + heuristic(neighbor), next(tie), candidate, next_state))
+
+        return settled, parent
+
+    def _air_edge(self, a, b):
+        great_circle = haversine_matrix([self.coords[a]], [self.coords[b]])[0, 0]
+        distance = float(great_circle) * DETOUR_FACTORS["Aérien"]
+        return (b, "Aérien") + (distance,) + self._edge_cost("Aérien", distance)
+
+    def _legs(self, parent, state, reverse=False):
+        """Reconstruit les tronçons d'un itinéraire à partir des pointeurs parents"""
+        legs = []
+        while parent.get(state) is not None:
+            previous, mode, distance, emissions, hours = parent[state]
+            legs.append({
+                "mode": mode,
+                "from": previous[0],
+                "to": state[0],
+                "from_coords": self.coords[previous[0]],
+                "to_coords": self.coords[state[0]],
+                "distance_km": distance,
+                "emissions_kg_per_tonne": emissions,
+                "hours": hours,
+            })
+            state = previous
+        if reverse:
+            for leg in legs:
+                leg["from"], leg["to"] = leg["to"], leg["from"]
+                leg["from_coords"], leg["to_coords"] = leg["to_coords"], leg["from_coords"]
+        else:
+            legs.reverse()
+        return legs
+
+    @staticmethod
+    def _summary(legs):
+        transfers = sum(1 for a, b in zip(legs, legs[1:]) if a["mode"] != b["mode"])
+        return {
+            "legs": legs,
+            "modes": _dedupe_modes(legs),
+            "distance_km": sum(leg["distance_km"] for leg in legs),
+            "emissions_kg_per_tonne": sum(leg["emissions_kg_per_tonne"] for leg in legs),
+            "hours": sum(leg["hours"] for leg in legs) + transfers * TRANSFER_HOURS,
+        }
+
+    def route(self, source, target):
+        """Itinéraire optimal entre deux nœuds (A*)"""
+        settled, parent = self._search(source, target, air_targets=(target,))
+        if target not in settled:
+            return None
+        return self._summary(self._legs(parent, settled[target][1]))
+
+    def routes_to(self, target, sources):
+        """Itinéraires de tous les fournisseurs vers un site (un seul Dijkstra, graphe non orienté)"""
+        settled, parent = self._search(target, air_targets=sources)
+        return {
+            source: self._summary(self._legs(parent, settled[source][1], reverse=True))
+            if source in settled else None
+            for source in sources
+        }
+
+
+class RouteTable:
+    """
+    Tables fournisseurs × sites pré-calculées (distance, kg CO2/t, heures, tronçons)
+    Sérialisées sur disque et rechargées telles quelles tant que les entrées ne changent pas
+    """
+
+    def __init__(self, suppliers, sites, transport_modes, criteria="emissions",
+                 allowed_modes=DEFAULT_MODES, cache_dir=ROUTE_CACHE_DIR):
+        self.supplier_names = [s["nom"] for s in suppliers]
+        self.site_names = list(sites.keys())
+
+        fingerprint = hashlib.sha1(json.dumps({
+            "suppliers": [[s["nom"], s["coordinates"], s.get("pays"), s.get("continent")] for s in suppliers],
+            "sites": {name: [site["coordinates"], site.get("pays"), site.get("continent")]
+                      for name, site in sites.items()},
+            "modes": transport_modes,
+            "criteria": criteria,
+            "allowed": list(allowed_modes),
+            "graph": [GRAPH_VERSION, PORTS, SEA_WAYPOINTS, RAIL_HUBS, SEA_LANES, RAIL_LINES, DETOUR_FACTORS,
+                      ROAD_MAX_KM, TRANSFER_HOURS],
+        }, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:16]
+        self.cache_path = os.path.join(cache_dir, f"routes_{fingerprint}.json") if cache_dir else None
+
+        routes = self._load()
+        if routes is None:
+            routes = self._compute(suppliers, sites, transport_modes, criteria, allowed_modes)
+            self._save(routes)
+        self.routes = routes
+
+        # Matrices (S, T) pour le moteur d'émissions
+        shape = (len(self.supplier_names), len(self.site_names))
+        self.distance_km = np.full(shape, np.nan)
+        self.kg_per_tonne = np.full(shape, np.nan)
+        self.hours = np.full(shape, np.nan)
+        for t, site in enumerate(self.site_names):
+            for s, supplier in enumerate(self.supplier_names):
+                route = routes[site].get(supplier)
+                if route:
+                    self.distance_km[s, t] = route["distance_km"]
+                    self.kg_per_tonne[s, t] = route["emissions_kg_per_tonne"]
+                    self.hours[s, t] = route["hours"]
+
+    def _compute(self, suppliers, sites, transport_modes, criteria, allowed_modes):
+        print(f"🧭 Calcul des itinéraires multimodaux ({len(suppliers)} fournisseurs × {len(sites)} sites)...")
+        graph = TransportGraph(transport_modes, criteria, allowed_modes)
+        for supplier in suppliers:
+            landmass = ISLAND_COUNTRIES.get(supplier.get("pays"), supplier.get("continent", "Europe"))
+            graph.add_endpoint(supplier["nom"], supplier["coordinates"], landmass)
+        for name, site in sites.items():
+            landmass = ISLAND_COUNTRIES.get(site.get("pays"), site.get("continent", "Europe"))
+            graph.add_endpoint(name, site["coordinates"], landmass)
+
+        return {name: graph.routes_to(name, self.supplier_names) for name in self.site_names}
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Cache d'itinéraires illisible, recalcul: {e}")
+            return None
+
+    def _save(self, routes):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(routes, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"⚠️ Impossible d'écrire le cache d'itinéraires: {e}")
+
+    def route(self, supplier_name, site_name):
+        """Itinéraire pré-calculé (lecture dictionnaire)"""
+        return self.routes.get(site_name, {}).get(supplier_name)
+
+
+if __name__ == "__main__":
+    from procurement_data import HUTCHINSON_SITES, HUTCHINSON_SITES_INFO, SUPPLIERS_EXTENDED, TRANSPORT_MODES
+
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        sites = {name: {"coordinates": coords, **HUTCHINSON_SITES_INFO.get(name, {})}
+                 for name, coords in HUTCHINSON_SITES.items()}
+        table = RouteTable(SUPPLIERS_EXTENDED, sites, TRANSPORT_MODES, cache_dir=None)
+        failures = 0
+        for supplier in SUPPLIERS_EXTENDED:
+            for name, site in sites.items():
+                if list(supplier["coordinates"]) != list(site["coordinates"]):
+                    continue
+                route = table.route(supplier["nom"], name)
+                ok = route is not None and route["distance_km"] == 0
+                failures += not ok
+                print(f"{'✅' if ok else '❌'} {supplier['nom']} -> {name}: "
+                      f"{route['distance_km'] if route else 'aucun itinéraire'} km")
+        sys.exit(1 if failures else 0)
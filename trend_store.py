@@ -0,0 +1,267 @@
+"""
+Séries temporelles des scores d'impact par réglementation
+- risk_scores        : collection time-series MongoDB, un point par (loi, profil, run)
+                       meta = {law, profile, source, company} ; source "llm" (rag_with_llm) ou
+                       "analyzer" (hutchinson_analyzer)
+- risk_score_buckets : agrégats pré-calculés par jour et par semaine, mis à jour à l'écriture
+                       (nombre, somme, min, max et dernière valeur de chaque métrique)
+
+Les courbes de tendance et alertes de variation lisent uniquement les agrégats : une année de runs
+quotidiens = 365 documents par loi, lus sur index.
+
+    python trend_store.py backfill | trend <id_loi> [day|week] [source] | changes [source]
+"""
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, UpdateOne
+
+METRICS = ("impact_financial", "impact_reputation", "impact_operational", "risk_score")
+GRANULARITIES = ("day", "week")
+SOURCES = ("llm", "analyzer")
+
+# Variation minimale signalée par score_changes (échelle 0-100 de risk_score)
+DEFAULT_MIN_CHANGE = 10
+# Historique consulté pour trouver le dernier score connu avant la période observée
+CHANGES_LOOKBACK_DAYS = 90
+
+# Mêmes seuils que hutchinson_analyzer.determine_impact_level
+RISK_LEVEL_THRESHOLDS = ((70, "CRITIQUE"), (50, "ELEVE"), (30, "MOYEN"))
+
+BATCH_SIZE = 1000
+
+_ready_databases = set()
+
+
+def risk_level(score):
+    """Niveau d'impact d'un score 0-100"""
+    for threshold, level in RISK_LEVEL_THRESHOLDS:
+        if score >= threshold:
+            return level
+    return "FAIBLE"
+
+
+def bucket_start(timestamp, granularity):
+    """Début du jour ou de la semaine (lundi) contenant timestamp"""
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def ensure_trend_collections(db):
+    """Collection time-series (collection classique si le serveur ne les supporte pas) et index"""
+    if db.name in _ready_databases:
+        return
+    try:
+        if "risk_scores" not in db.list_collection_names():
+            db.create_collection("risk_scores", timeseries={"timeField": "ts", "metaField": "meta",
+                                                            "granularity": "hours"})
+    except Exception as e:
+        print(f"⚠️ Collection time-series indisponible, collection classique: {e}")
+    try:
+        db["risk_scores"].create_index([("meta.law", ASCENDING), ("ts", ASCENDING)])
+        buckets = db["risk_score_buckets"]
+        buckets.create_index([("granularity", ASCENDING), ("source", ASCENDING), ("law", ASCENDING),
+                              ("bucket", ASCENDING)])
+        buckets.create_index([("granularity", ASCENDING), ("source", ASCENDING), ("bucket", ASCENDING)])
+        _ready_databases.add(db.name)
+    except Exception as e:
+        print(f"⚠️ Création des index de tendance impossible: {e}")
+
+
+def llm_points(indicators, company_name, profile_hash, run_id, timestamp):
+    """
+    Points d'un run LLM : impacts 1-10 de chaque indicateur, risk_score = moyenne des impacts x 10
+    """
+    points = []
+    for indicator in indicators:
+        law = indicator.get("id_loi") or indicator.get("law_url") or indicator.get("law_name")
+        impacts = {field: indicator[field] for field in METRICS[:3] if isinstance(indicator.get(field), (int, float))}
+        if not law or not impacts:
+            continue
+        score = round(10 * sum(impacts.values()) / len(impacts), 1)
+        points.append({"ts": timestamp, "law": law, "profile": profile_hash, "source": "llm",
+                       "company": company_name, "run_id": run_id, **impacts,
+                       "risk_score": score, "risk_level": risk_level(score)})
+    return points
+
+
+def analyzer_point(analysis, profile_hash, company_name="Hutchinson"):
+    """Point d'une analyse hutchinson_analyzer (score_risque 0-100 et niveau d'impact)"""
+    impact = analysis["hutchinson_impact"]
+    return {"ts": analysis.get("analysis_date") or datetime.now(), "law": analysis["regulation_info"]["id_loi"],
+            "profile": profile_hash, "source": "analyzer", "company": company_name, "run_id": None,
+            "risk_score": impact["score_risque"], "risk_level": impact["niveau_impact"]}
+
+
+def _bucket_operations(point):
+    operations = []
+    values = {metric: point[metric] for metric in METRICS if point.get(metric) is not None}
+    for granularity in GRANULARITIES:
+        start = bucket_start(point["ts"], granularity)
+        bucket_id = f"{granularity}|{point['source']}|{point['profile']}|{point['law']}|{start:%Y-%m-%d}"
+        operations.append(UpdateOne(
+            {"_id": bucket_id},
+            {
+                "$setOnInsert": {"granularity": granularity, "bucket": start, "law": point["law"],
+                                 "profile": point["profile"], "source": point["source"],
+                                 "company": point.get("company")},
+                "$inc": {"count": 1, **{f"{metric}.n": 1 for metric in values},
+                         **{f"{metric}.sum": value for metric, value in values.items()}},
+                "$min": {f"{metric}.min": value for metric, value in values.items()},
+                "$max": {f"{metric}.max": value for metric, value in values.items()},
+            },
+            upsert=True
+        ))
+        # Dernière valeur du bucket : seulement si le point est le plus récent
+        operations.append(UpdateOne(
+            {"_id": bucket_id, "$or": [{"last_ts": {"$lte": point["ts"]}}, {"last_ts": {"$exists": False}}]},
+            {"$set": {"last_ts": point["ts"], "risk_level": point.get("risk_level"),
+                      **{f"{metric}.last": value for metric, value in values.items()}}}
+        ))
+    return operations
+
+
+def record_points(db, points):
+    """Enregistre des points et met à jour les agrégats jour / semaine"""
+    if not points:
+        return 0
+    ensure_trend_collections(db)
+    db["risk_scores"].insert_many([
+        {"ts": point["ts"],
+         "meta": {"law": point["law"], "profile": point["profile"], "source": point["source"],
+                  "company": point.get("company")},
+         "run_id": point.get("run_id"), "risk_level": point.get("risk_level"),
+         **{metric: point[metric] for metric in METRICS if point.get(metric) is not None}}
+        for point in points
+    ], ordered=False)
+    operations = [operation for point in points for operation in _bucket_operations(point)]
+    # Ordonné : l'upsert d'un bucket précède la mise à jour de sa dernière valeur
+    db["risk_score_buckets"].bulk_write(operations, ordered=True)
+    return len(points)
+
+
+def _row(bucket):
+    row = {"bucket": bucket["bucket"], "law": bucket["law"], "profile": bucket["profile"],
+           "count": bucket["count"], "risk_level": bucket.get("risk_level")}
+    for metric in METRICS:
+        stats = bucket.get(metric)
+        if stats and stats.get("n"):
+            row[metric] = {"avg": stats["sum"] / stats["n"], "min": stats["min"], "max": stats["max"],
+                           "last": stats.get("last")}
+    return row
+
+
+def trend(db, law, source="llm", granularity="day", since=None, until=None, profile=None):
+    """
+    Série d'une loi pour les graphiques de tendance
+
+    Returns:
+        list: un élément par bucket {bucket, count, risk_level, <métrique>: {avg, min, max, last}}
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularité inconnue: {granularity} (connues: {', '.join(GRANULARITIES)})")
+    ensure_trend_collections(db)
+    query = {"granularity": granularity, "source": source, "law": law}
+    if since or until:
+        query["bucket"] = {}
+        if since:
+            query["bucket"]["$gte"] = bucket_start(since, granularity)
+        if until:
+            query["bucket"]["$lte"] = until
+    if profile:
+        query["profile"] = profile
+    return [_row(bucket) for bucket in db["risk_score_buckets"].find(query).sort("bucket", ASCENDING)]
+
+
+def score_changes(db, source="analyzer", metric="risk_score", min_change=DEFAULT_MIN_CHANGE, since=None,
+                  laws=None, lookback_days=CHANGES_LOOKBACK_DAYS):
+    """
+    Variations significatives : dernière valeur depuis `since` comparée à la dernière valeur connue avant
+
+    Args:
+        since (datetime): début de la période observée (défaut : aujourd'hui 00:00)
+        laws (list): restreindre à ces lois
+
+    Returns:
+        list: alertes {regulation_id, type, old_score, new_score, impact_change, date}
+    """
+    ensure_trend_collections(db)
+    since = since or bucket_start(datetime.now(), "day")
+    query = {"granularity": "day", "source": source,
+             "bucket": {"$gte": bucket_start(since - timedelta(days=lookback_days), "day")}}
+    if laws is not None:
+        query["law"] = {"$in": list(laws)}
+
+    previous, current = {}, {}
+    projection = {"law": 1, "profile": 1, "bucket": 1, "last_ts": 1, f"{metric}.last": 1}
+    for bucket in db["risk_score_buckets"].find(query, projection).sort("bucket", ASCENDING):
+        value = (bucket.get(metric) or {}).get("last")
+        if value is None:
+            continue
+        key = (bucket["law"], bucket["profile"])
+        target = current if bucket["bucket"] >= bucket_start(since, "day") else previous
+        target[key] = (value, bucket.get("last_ts"))
+
+    alerts = []
+    for key, (new_value, date) in current.items():
+        if key not in previous:
+            continue
+        old_value = previous[key][0]
+        if abs(new_value - old_value) >= min_change:
+            alerts.append({"regulation_id": key[0], "profile": key[1], "type": "SCORE_CHANGE",
+                           "old_score": old_value, "new_score": new_value,
+                           "impact_change": new_value - old_value, "date": date})
+    alerts.sort(key=lambda alert: abs(alert["impact_change"]), reverse=True)
+    return alerts
+
+
+def backfill(db, batch_size=BATCH_SIZE):
+    """Reconstruit séries et agrégats depuis risk_indicators (runs LLM) et les analyses par loi"""
+    from hutchinson_analyzer import profile_fingerprint
+
+    ensure_trend_collections(db)
+    db["risk_scores"].delete_many({})
+    db["risk_score_buckets"].delete_many({})
+    total = 0
+
+    headers = {doc["_id"]: doc.get("profile_hash") for doc in
+               db["risk_analysis"].find({"analysis_timestamp": {"$type": "date"}}, {"profile_hash": 1})}
+    batch = []
+    for indicator in db["risk_indicators"].find({}, {"expires_at": 0}).batch_size(batch_size):
+        batch.extend(llm_points([indicator], indicator.get("company_name"), headers.get(indicator["analysis_id"]),
+                                indicator["analysis_id"], indicator["analysis_timestamp"]))
+        if len(batch) >= batch_size:
+            total += record_points(db, batch)
+            batch = []
+
+    profile = db["hutchinson"].find_one({})
+    profile_hash = profile_fingerprint(profile) if profile else None
+    for analysis in db["risk_analysis"].find({"regulation_info.id_loi": {"$exists": True}}).batch_size(batch_size):
+        batch.append(analyzer_point(analysis, profile_hash))
+        if len(batch) >= batch_size:
+            total += record_points(db, batch)
+            batch = []
+    total += record_points(db, batch)
+    print(f"✅ {total} points de score enregistrés")
+    return total
+
+
+if __name__ == "__main__":
+    from db import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "changes"
+    if command == "backfill":
+        backfill(db)
+    elif command == "trend" and len(sys.argv) > 2:
+        rows = trend(db, sys.argv[2], source=sys.argv[4] if len(sys.argv) > 4 else "llm",
+                     granularity=sys.argv[3] if len(sys.argv) > 3 else "day")
+        for row in rows:
+            score = row.get("risk_score", {})
+            print(f"📅 {row['bucket']:%d/%m/%Y} | 📊 {score.get('avg', 0):.1f} (max {score.get('max', 0)}) "
+                  f"| {row.get('risk_level')} | {row['count']} runs")
+    else:
+        for alert in score_changes(db, source=sys.argv[2] if len(sys.argv) > 2 else "analyzer"):
+            print(f"🚨 {alert['regulation_id']}: {alert['old_score']} → {alert['new_score']} "
+                  f"({alert['impact_change']:+})")
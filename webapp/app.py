@@ -1,7 +1,7 @@
 import streamlit as st
 import sys
 import os
-import json
+import itertools
 from datetime import datetime
 
 # Ajouter le répertoire parent au path pour importer les modules
@@ -13,10 +13,14 @@ from safewatch_ui.layout import safewatch_app
 # Importer les modules d'analyse réglementaire
 try:
     from rag_with_llm import RegulatoryRiskRAGWithLLM, get_hutchinson_profile
+    from snapshot import read_analysis_file
 except ImportError:
     st.error("❌ Impossible d'importer les modules d'analyse. Vérifiez que les fichiers sont présents dans le répertoire parent.")
     st.stop()
 
+# Indicateurs affichés par analyse dans l'historique (lecture en flux du fichier)
+MAX_PREVIEW_INDICATORS = 20
+
 @safewatch_app(title="RiskRadar - Hutchinson")
 def main():
     st.markdown("""
@@ -246,7 +250,7 @@ def main():
                 # Chercher les fichiers d'analyse récents
                 try:
                     import glob
-                    analysis_files = glob.glob(os.path.join(parent_dir, "hutchinson_analysis_*.json"))
+                    analysis_files = glob.glob(os.path.join(parent_dir, "hutchinson_analysis_*.json*"))
                     analysis_files.sort(key=os.path.getmtime, reverse=True)
 
                     if analysis_files:
@@ -262,11 +266,14 @@ def main():
                             # Bouton pour voir le contenu
                             if st.button(f"👀 Voir", key=f"view_{i}"):
                                 try:
-                                    with open(file_path, 'r', encoding='utf-8') as f:
-                                        data = json.load(f)
+                                    header, indicators = read_analysis_file(file_path)
+                                    preview = list(itertools.islice(indicators, MAX_PREVIEW_INDICATORS))
 
-                                    if 'indicators' in data and data['indicators']:
-                                        st.json(data)
+                                    if preview:
+                                        total = header.get('indicator_count')
+                                        if total and total > len(preview):
+                                            st.caption(f"{len(preview)} premiers indicateurs sur {total}")
+                                        st.json({**header, 'indicators': preview})
                                     else:
                                         st.info("📄 Analyse sans réglementations identifiées")
                                 except Exception as e:
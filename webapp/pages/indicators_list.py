@@ -20,35 +20,24 @@ except ImportError:
 
 def load_latest_analysis():
     """
-    Charge la dernière analyse sauvegardée depuis la collection risk_analysis de MongoDB
+    Charge la dernière analyse sauvegardée depuis MongoDB (en-tête risk_analysis + risk_indicators)
     """
     try:
         # Importer la connexion MongoDB
         from db import db
-        risk_analysis = db["risk_analysis"]
+        from analysis_store import latest_analysis, to_ui_data
 
-        # Chercher la dernière analyse dans la collection
-        latest_analysis = risk_analysis.find_one(
-            sort=[("analysis_timestamp", -1)]  # Tri décroissant par date
-        )
+        # Dernier run (index sur analysis_timestamp)
+        latest = latest_analysis(db, projection={"regulations_reviewed": 0, "delta": 0})
 
-        if not latest_analysis:
+        if not latest:
             return None
 
         # Convertir le format MongoDB vers le format UI attendu
-        ui_data = {
-            "indicators": latest_analysis.get("analysis_results", []),
-            "metadata": latest_analysis.get("metadata", {}),
-        }
-
-        # Mettre à jour les métadonnées avec les infos MongoDB
-        ui_data["metadata"]["company_name"] = latest_analysis.get("company_name", "Hutchinson")
-        ui_data["metadata"]["total_indicators"] = len(ui_data["indicators"])
-        ui_data["metadata"]["llm_used"] = True
-        ui_data["metadata"]["model"] = latest_analysis.get("llm_model", "llama2")
+        ui_data = to_ui_data(db, latest)
 
         # Formatage de la date
-        timestamp = latest_analysis.get("analysis_timestamp")
+        timestamp = latest.get("analysis_timestamp")
         if timestamp:
             formatted_timestamp = timestamp.strftime('%d/%m/%Y %H:%M:%S')
         else:
@@ -58,9 +47,9 @@ def load_latest_analysis():
             "data": ui_data,
             "source": "MongoDB risk_analysis",
             "timestamp": formatted_timestamp,
-            "document_id": str(latest_analysis.get("_id", "Unknown")),
-            "query_used": latest_analysis.get("query_used", ""),
-            "mongodb_doc": latest_analysis  # Garder le document complet pour référence
+            "document_id": str(latest.get("_id", "Unknown")),
+            "query_used": latest.get("query_used", ""),
+            "mongodb_doc": latest  # Garder l'en-tête pour référence
         }
 
     except Exception as e:
@@ -214,10 +203,10 @@ def main():
         with st.expander("📈 Historique des Analyses MongoDB", expanded=True):
             try:
                 from db import db
-                risk_analysis = db["risk_analysis"]
+                from analysis_store import recent_analyses, to_ui_data
 
-                # Récupérer les 10 dernières analyses
-                analyses = list(risk_analysis.find().sort("analysis_timestamp", -1).limit(10))
+                # Récupérer les 10 dernières analyses (en-têtes seuls)
+                analyses = recent_analyses(db, limit=10)
 
                 if analyses:
                     st.success(f"📁 {len(analyses)} analyses trouvées dans MongoDB")
@@ -241,17 +230,8 @@ def main():
                         with col_b:
                             if st.button(f"Charger", key=f"load_mongo_{i}"):
                                 try:
-                                    # Convertir vers format UI
-                                    ui_data = {
-                                        "indicators": analysis_doc.get("analysis_results", []),
-                                        "metadata": analysis_doc.get("metadata", {}),
-                                    }
-
-                                    # Mettre à jour métadonnées
-                                    ui_data["metadata"]["company_name"] = company
-                                    ui_data["metadata"]["total_indicators"] = total_laws
-                                    ui_data["metadata"]["llm_used"] = True
-                                    ui_data["metadata"]["model"] = analysis_doc.get("llm_model", "llama2")
+                                    # Convertir vers format UI (indicateurs lus à la demande)
+                                    ui_data = to_ui_data(db, analysis_doc)
 
                                     st.session_state['analysis_results'] = ui_data
                                     st.session_state['analysis_timestamp'] = formatted_time
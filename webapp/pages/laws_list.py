@@ -13,6 +13,7 @@ from safewatch_ui.layout import safewatch_app
 # Importer les modules d'analyse réglementaire
 try:
     from db import db
+    from embedding_models import without_heavy_fields
 except ImportError:
     st.error("❌ Impossible de se connecter à la base de données MongoDB")
 
@@ -338,13 +339,11 @@ def main():
             try:
                 # Afficher un échantillon de la vraie base de données
                 with st.expander("🗄️ Échantillon Base de Données", expanded=True):
-                    sample_regulations = list(db.regulations.find().limit(3))
+                    # Projection : ni _id, ni vecteurs d'embedding (toutes versions), ni signatures MinHash
+                    sample_regulations = list(db.regulations.find({}, without_heavy_fields({"_id": 0})).limit(3))
 
                     if sample_regulations:
                         for reg in sample_regulations:
-                            # Nettoyer l'affichage (supprimer _id pour la lisibilité)
-                            if '_id' in reg:
-                                del reg['_id']
                             st.json(reg)
                     else:
                         st.warning("📭 Aucune réglementation trouvée dans la base")
@@ -1,14 +1,11 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
 import sys
 import os
-import folium
-from streamlit_folium import st_folium
-from geopy.distance import geodesic
+import streamlit.components.v1 as components
 import math
 
 # Ajouter le répertoire parent au path pour importer les modules
@@ -19,6 +16,19 @@ sys.path.append(parent_dir)
 webapp_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(webapp_dir)
 
+# Racine du projet pour les moteurs de calcul partagés
+project_root = os.path.dirname(parent_dir)
+sys.path.append(project_root)
+
+from emissions_engine import EmissionsEngine
+from procurement_data import TRANSPORT_MODES
+from sourcing_optimizer import has_purchase_prices, optimize_sourcing
+from transport_routing import RouteTable
+from supplier_store import get_supplier_store
+from deadlines import URGENT_MONTHS, months_until
+from site_index import SiteImpactIndex
+from safewatch_ui.map_layers import build_layers, load_globe, render_folium_html, render_globe_json, volume_bucket
+
 try:
     from safewatch_ui.layout import safewatch_app
 except ImportError:
@@ -28,365 +38,15 @@ except ImportError:
             return func
         return decorator
 
-# Données intégrées pour éviter la base de données
-SAMPLE_REGULATIONS = [
-    {
-        "id": "reg-eu-cbam-001",
-        "title": "CBAM — Déclaration trimestrielle des importations (acier/alu)",
-        "jurisdiction": "UE",
-        "rtype": "CBAM",
-        "phase": "adopté",
-        "date_published": "2023-10-01",
-        "deadline": "2025-12-31T00:00:00Z",
-        "summary": "Mécanisme d'ajustement carbone aux frontières. Déclarations trimestrielles obligatoires pour certains HS.",
-        "impact_hutchinson": "Élevé - Produits acier/aluminium utilisés dans les joints"
-    },
-    {
-        "id": "reg-eu-eudr-001",
-        "title": "EUDR — Traçabilité caoutchouc naturel (géolocalisation)",
-        "jurisdiction": "UE",
-        "rtype": "EUDR",
-        "phase": "appliqué",
-        "date_published": "2024-06-01",
-        "deadline": "2025-12-30T00:00:00Z",
-        "summary": "Exclusion du marché UE des produits issus de déforestation. Géolocalisation des plantations requise.",
-        "impact_hutchinson": "Critique - Caoutchouc naturel = matière première clé"
-    },
-    {
-        "id": "reg-eu-csrd-001",
-        "title": "CSRD — ESRS E1/E2 reporting extra-financier",
-        "jurisdiction": "UE",
-        "rtype": "CSRD",
-        "phase": "appliqué",
-        "date_published": "2024-01-01",
-        "deadline": "2026-03-31T00:00:00Z",
-        "summary": "Obligation de reporting de durabilité. Périmètre et indicateurs ESRS à publier annuellement.",
-        "impact_hutchinson": "Moyen - Reporting groupe requis"
-    },
-    {
-        "id": "reg-us-sanctions-001",
-        "title": "Sanctions — Mise à jour liste entités (OFAC)",
-        "jurisdiction": "USA",
-        "rtype": "Sanctions",
-        "phase": "appliqué",
-        "date_published": "2025-01-15",
-        "deadline": "2025-10-01T00:00:00Z",
-        "summary": "Mise à jour de la liste SDN. Screening requis pour éviter transactions interdites.",
-        "impact_hutchinson": "Élevé - Fournisseurs chinois à contrôler"
-    },
-    {
-        "id": "reg-cn-reach-001",
-        "title": "Chine — Nouvelle liste substances chimiques restreintes",
-        "jurisdiction": "Chine",
-        "rtype": "Chemicals",
-        "phase": "projet",
-        "date_published": "2025-08-01",
-        "deadline": "2026-01-01T00:00:00Z",
-        "summary": "Extension de la réglementation REACH chinoise à de nouveaux composés chimiques.",
-        "impact_hutchinson": "Moyen - Sites de production chinois impactés"
-    }
-]
-
-MATERIALS_DATA = [
-    {"mat_id": "MAT-001", "libelle": "Acier laminé", "hs_code": "7208", "famille": "acier"},
-    {"mat_id": "MAT-002", "libelle": "Aluminium brut", "hs_code": "7601", "famille": "aluminium"},
-    {"mat_id": "MAT-003", "libelle": "Caoutchouc naturel", "hs_code": "4001", "famille": "caoutchouc"},
-    {"mat_id": "MAT-004", "libelle": "Elastomères synthétiques", "hs_code": "4002", "famille": "polymères"},
-    {"mat_id": "MAT-005", "libelle": "Composés chimiques", "hs_code": "2902", "famille": "chimie"}
-]
-
-SUPPLIERS_DATA = [
-    {"nom": "Bridgestone Corp", "pays": "Japon", "materiau": "Caoutchouc naturel", "risque": "Faible", "score": 25},
-    {"nom": "Michelin Plantations", "pays": "Brésil", "materiau": "Caoutchouc naturel", "risque": "Moyen", "score": 45},
-    {"nom": "Thai Rubber Co", "pays": "Thaïlande", "materiau": "Caoutchouc naturel", "risque": "Élevé", "score": 75},
-    {"nom": "Arcelor Mittal", "pays": "France", "materiau": "Acier laminé", "risque": "Faible", "score": 20},
-    {"nom": "Baosteel Group", "pays": "Chine", "materiau": "Acier laminé", "risque": "Élevé", "score": 80},
-    {"nom": "Norsk Hydro", "pays": "Norvège", "materiau": "Aluminium brut", "risque": "Faible", "score": 15},
-    {"nom": "Chalco Aluminum", "pays": "Chine", "materiau": "Aluminium brut", "risque": "Élevé", "score": 85}
-]
-
-# Données étendues des fournisseurs avec coordonnées géographiques et émissions
-SUPPLIERS_EXTENDED = [
-    {
-        "nom": "Bridgestone Corp",
-        "pays": "Japon",
-        "ville": "Tokyo",
-        "materiau": "Caoutchouc naturel",
-        "coordinates": [35.6762, 139.6503],
-        "risque": "Faible",
-        "score": 25,
-        "emissions_co2_kg_tonne": 45,
-        "certifie_iso14001": True,
-        "certifie_cbam": False,
-        "volume_annuel_tonnes": 15000,
-        "continent": "Asie"
-    },
-    {
-        "nom": "Michelin Plantations",
-        "pays": "Brésil",
-        "ville": "São Paulo",
-        "materiau": "Caoutchouc naturel",
-        "coordinates": [-23.5505, -46.6333],
-        "risque": "Moyen",
-        "score": 45,
-        "emissions_co2_kg_tonne": 78,
-        "certifie_iso14001": True,
-        "certifie_cbam": False,
-        "volume_annuel_tonnes": 22000,
-        "continent": "Amérique du Sud"
-    },
-    {
-        "nom": "Thai Rubber Co",
-        "pays": "Thaïlande",
-        "ville": "Bangkok",
-        "materiau": "Caoutchouc naturel",
-        "coordinates": [13.7563, 100.5018],
-        "risque": "Élevé",
-        "score": 75,
-        "emissions_co2_kg_tonne": 120,
-        "certifie_iso14001": False,
-        "certifie_cbam": False,
-        "volume_annuel_tonnes": 8500,
-        "continent": "Asie"
-    },
-    {
-        "nom": "Arcelor Mittal",
-        "pays": "France",
-        "ville": "Dunkerque",
-        "materiau": "Acier laminé",
-        "coordinates": [51.0345, 2.3767],
-        "risque": "Faible",
-        "score": 20,
-        "emissions_co2_kg_tonne": 35,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 45000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Baosteel Group",
-        "pays": "Chine",
-        "ville": "Shanghai",
-        "materiau": "Acier laminé",
-        "coordinates": [31.2304, 121.4737],
-        "risque": "Élevé",
-        "score": 80,
-        "emissions_co2_kg_tonne": 150,
-        "certifie_iso14001": False,
-        "certifie_cbam": False,
-        "volume_annuel_tonnes": 67000,
-        "continent": "Asie"
-    },
-    {
-        "nom": "Norsk Hydro",
-        "pays": "Norvège",
-        "ville": "Oslo",
-        "materiau": "Aluminium brut",
-        "coordinates": [59.9139, 10.7522],
-        "risque": "Faible",
-        "score": 15,
-        "emissions_co2_kg_tonne": 28,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 12000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Chalco Aluminum",
-        "pays": "Chine",
-        "ville": "Pékin",
-        "materiau": "Aluminium brut",
-        "coordinates": [39.9042, 116.4074],
-        "risque": "Élevé",
-        "score": 85,
-        "emissions_co2_kg_tonne": 180,
-        "certifie_iso14001": False,
-        "certifie_cbam": False,
-        "volume_annuel_tonnes": 34000,
-        "continent": "Asie"
-    },
-    {
-        "nom": "Continental Rubber",
-        "pays": "Allemagne",
-        "ville": "Hanovre",
-        "materiau": "Elastomères synthétiques",
-        "coordinates": [52.3759, 9.7320],
-        "risque": "Faible",
-        "score": 30,
-        "emissions_co2_kg_tonne": 52,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 18000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "BASF Chemical",
-        "pays": "Allemagne",
-        "ville": "Ludwigshafen",
-        "materiau": "Composés chimiques",
-        "coordinates": [49.4814, 8.4451],
-        "risque": "Moyen",
-        "score": 40,
-        "emissions_co2_kg_tonne": 65,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 9500,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Dow Chemical India",
-        "pays": "Inde",
-        "ville": "Mumbai",
-        "materiau": "Composés chimiques",
-        "coordinates": [19.0760, 72.8777],
-        "risque": "Élevé",
-        "score": 88,
-        "emissions_co2_kg_tonne": 195,
-        "certifie_iso14001": False,
-        "certifie_cbam": False,
-        "volume_annuel_tonnes": 14000,
-        "continent": "Asie"
-    },
-    {
-        "nom": "ThyssenKrupp Steel",
-        "pays": "Allemagne",
-        "ville": "Duisburg",
-        "materiau": "Acier laminé",
-        "coordinates": [51.4344, 6.7623],
-        "risque": "Faible",
-        "score": 25,
-        "emissions_co2_kg_tonne": 38,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 38000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Repsol Chemicals",
-        "pays": "Espagne",
-        "ville": "Tarragone",
-        "materiau": "Elastomères synthétiques",
-        "coordinates": [41.1189, 1.2445],
-        "risque": "Moyen",
-        "score": 35,
-        "emissions_co2_kg_tonne": 58,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 16000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Borealis Polymers",
-        "pays": "Autriche",
-        "ville": "Linz",
-        "materiau": "Elastomères synthétiques",
-        "coordinates": [48.3069, 14.2858],
-        "risque": "Faible",
-        "score": 28,
-        "emissions_co2_kg_tonne": 48,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 21000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Aperam Stainless",
-        "pays": "France",
-        "ville": "Isbergues",
-        "materiau": "Acier laminé",
-        "coordinates": [50.6167, 2.4500],
-        "risque": "Faible",
-        "score": 22,
-        "emissions_co2_kg_tonne": 32,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 28000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Alcoa Netherlands",
-        "pays": "Pays-Bas",
-        "ville": "Delfzijl",
-        "materiau": "Aluminium brut",
-        "coordinates": [53.3167, 6.9167],
-        "risque": "Faible",
-        "score": 18,
-        "emissions_co2_kg_tonne": 26,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 35000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Pirelli Rubber Europe",
-        "pays": "Italie",
-        "ville": "Milan",
-        "materiau": "Caoutchouc naturel",
-        "coordinates": [45.4642, 9.1900],
-        "risque": "Moyen",
-        "score": 42,
-        "emissions_co2_kg_tonne": 68,
-        "certifie_iso14001": True,
-        "certifie_cbam": False,
-        "volume_annuel_tonnes": 19000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Orlen Petrochemicals",
-        "pays": "Pologne",
-        "ville": "Płock",
-        "materiau": "Composés chimiques",
-        "coordinates": [52.5467, 19.7064],
-        "risque": "Moyen",
-        "score": 38,
-        "emissions_co2_kg_tonne": 62,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 24000,
-        "continent": "Europe"
-    },
-    {
-        "nom": "Covestro Polymers",
-        "pays": "Allemagne",
-        "ville": "Leverkusen",
-        "materiau": "Composés chimiques",
-        "coordinates": [51.0347, 7.0122],
-        "risque": "Faible",
-        "score": 30,
-        "emissions_co2_kg_tonne": 55,
-        "certifie_iso14001": True,
-        "certifie_cbam": True,
-        "volume_annuel_tonnes": 32000,
-        "continent": "Europe"
-    }
-]
-
-# Sites Hutchinson avec coordonnées
-HUTCHINSON_SITES = {
-    "Chalette-sur-Loing (Siège)": [48.0167, 2.7333],
-    "Wrocław (Pologne)": [51.1079, 17.0385],
-    "Shanghai (Chine)": [31.2304, 121.4737],
-    "Birmingham (USA)": [33.5207, -86.8025],
-    "São Paulo (Brésil)": [-23.5505, -46.6333],
-    "Munich (Allemagne)": [48.1351, 11.5820]
-}
-
-# Modes de transport avec facteurs d'émission (kg CO2/tonne/km)
-TRANSPORT_MODES = {
-    "Route": {"factor": 0.08, "speed_kmh": 80, "icon": "🚛", "color": "orange"},
-    "Train": {"factor": 0.025, "speed_kmh": 120, "icon": "🚂", "color": "green"},
-    "Maritime": {"factor": 0.015, "speed_kmh": 25, "icon": "🚢", "color": "blue"},
-    "Aérien": {"factor": 0.5, "speed_kmh": 800, "icon": "✈️", "color": "red"}
-}
-
-def months_to_deadline(iso_date: str | None) -> int | None:
-    """Calcule les mois jusqu'à l'échéance"""
-    if not iso_date:
+def months_to_deadline(deadline: datetime | str | None) -> int | None:
+    """Calcule les mois jusqu'à l'échéance (deadline_at typée, chaîne ISO pour les anciens documents)"""
+    if not deadline:
         return None
+    if isinstance(deadline, datetime):
+        return max(months_until(deadline), 0)
     try:
-        d = datetime.fromisoformat(iso_date.replace("Z",""))
-        delta = (d.year - datetime.utcnow().year)*12 + (d.month - datetime.utcnow().month)
-        return max(delta, 0)
+        d = datetime.fromisoformat(deadline.replace("Z",""))
+        return max(months_until(d), 0)
     except Exception:
         return None
 
@@ -407,7 +67,7 @@ def score_regulation(reg: dict) -> int:
         crit = "moyen"
 
     base = CRIT_BASE.get(crit, 30)
-    m = months_to_deadline(reg.get("deadline"))
+    m = months_to_deadline(reg.get("deadline_at") or reg.get("deadline"))
 
     if m is None:
         return base
@@ -417,54 +77,6 @@ def score_regulation(reg: dict) -> int:
         return min(100, base+10)
     return base
 
-def calculate_transport_chain_emissions(supplier_coords, site_coords, transport_chain, volume_tonnes):
-    """Calcule les émissions pour une chaîne de transport complexe"""
-    total_distance = geodesic(supplier_coords, site_coords).kilometers
-    total_emissions = 0
-    total_time = 0
-
-    if len(transport_chain) == 1:
-        # Transport direct
-        mode = transport_chain[0]
-        mode_data = TRANSPORT_MODES[mode]
-        emissions = total_distance * mode_data["factor"] * volume_tonnes
-        time_hours = total_distance / mode_data["speed_kmh"]
-        return emissions, time_hours, total_distance
-
-    # Transport multi-modal - répartition approximative des distances
-    if len(transport_chain) == 2:
-        # Ex: Route -> Maritime ou Train -> Route
-        distances = [total_distance * 0.3, total_distance * 0.7]
-    elif len(transport_chain) == 3:
-        # Ex: Route -> Maritime -> Train
-        distances = [total_distance * 0.2, total_distance * 0.6, total_distance * 0.2]
-    else:
-        # Répartition égale
-        distances = [total_distance / len(transport_chain)] * len(transport_chain)
-
-    for i, mode in enumerate(transport_chain):
-        mode_data = TRANSPORT_MODES[mode]
-        segment_emissions = distances[i] * mode_data["factor"] * volume_tonnes
-        segment_time = distances[i] / mode_data["speed_kmh"]
-        total_emissions += segment_emissions
-        total_time += segment_time
-
-    return total_emissions, total_time, total_distance
-
-def get_supplier_color(supplier, site_coords, transport_chain, volume_tonnes):
-    """Détermine la couleur du marqueur basée sur les émissions carbone"""
-    emissions, _, _ = calculate_transport_chain_emissions(
-        supplier["coordinates"], site_coords, transport_chain, volume_tonnes
-    )
-
-    # Seuils d'émissions (kg CO2)
-    if emissions < 5000:
-        return "green"  # Faibles émissions
-    elif emissions < 15000:
-        return "orange"  # Émissions moyennes
-    else:
-        return "red"    # Émissions élevées
-
 def get_auto_transport_chain(supplier_continent, site_continent):
     """Sélectionne automatiquement la chaîne de transport optimale selon les continents"""
 
@@ -492,42 +104,78 @@ def get_auto_transport_chain(supplier_continent, site_continent):
     # Retour par défaut si combinaison non trouvée
     return distance_mappings.get((supplier_continent, site_continent), ["Route", "Maritime", "Route"])
 
+@st.cache_resource
+def get_store():
+    """Store achats (MongoDB indexé, ou repli en mémoire) partagé entre les reruns"""
+    return get_supplier_store()
+
+@st.cache_resource
+def get_site_impact_index():
+    """Index juridiction -> sites et réglementation suivie <-> sites (codes ISO)"""
+    store = get_store()
+    return SiteImpactIndex(store.sites()).add_laws(store.find_regulations(), id_field="id")
+
 def get_site_continent(site_name):
     """Détermine le continent d'un site Hutchinson"""
-    continent_mapping = {
-        "Chalette-sur-Loing (Siège)": "Europe",
-        "Wrocław (Pologne)": "Europe",
-        "Shanghai (Chine)": "Asie",
-        "Birmingham (USA)": "Amérique du Nord",
-        "São Paulo (Brésil)": "Amérique du Sud",
-        "Munich (Allemagne)": "Europe"
-    }
-    return continent_mapping.get(site_name, "Europe")
+    site = get_store().sites().get(site_name)
+    return site["continent"] if site else "Europe"
+
+# Chaînes de transport proposées en mode manuel
+TRANSPORT_CHAINS = {
+    "🚛 Route directe": ["Route"],
+    "🚂 Train direct": ["Train"],
+    "✈️ Aérien direct": ["Aérien"],
+    "🚢 Maritime direct": ["Maritime"],
+    "🚛➡️🚢 Route + Maritime": ["Route", "Maritime"],
+    "🚂➡️🚢 Train + Maritime": ["Train", "Maritime"],
+    "🚛➡️✈️ Route + Aérien": ["Route", "Aérien"],
+    "🚂➡️✈️ Train + Aérien": ["Train", "Aérien"],
+    "🚛➡️🚢➡️🚂 Route + Maritime + Train": ["Route", "Maritime", "Train"],
+    "🚂➡️🚢➡️🚛 Train + Maritime + Route": ["Train", "Maritime", "Route"]
+}
 
-def calculate_multi_product_emissions(supplier, site_coords, transport_chain, product_volumes):
-    """Calcule les émissions pour plusieurs produits combinés"""
-    total_volume = sum(product_volumes.values())
-    base_emissions, time_hours, distance = calculate_transport_chain_emissions(
-        supplier["coordinates"], site_coords, transport_chain, total_volume
+@st.cache_resource
+def get_emissions_engine():
+    """Tenseur fournisseurs × sites × chaînes calculé une fois par processus"""
+    store = get_store()
+    suppliers = store.find_suppliers()
+    sites = store.sites()
+    return EmissionsEngine(
+        suppliers,
+        {name: site["coordinates"] for name, site in sites.items()},
+        TRANSPORT_MODES,
+        chains=TRANSPORT_CHAINS.values(),
+        auto_chain=get_auto_transport_chain,  # repli si aucun itinéraire n'est trouvé
+        site_continent=get_site_continent,
+        # Mode automatique : itinéraires multimodaux réels (ports, rail, route), cachés sur disque
+        routes=RouteTable(suppliers, sites, TRANSPORT_MODES)
     )
 
-    # Bonus/malus selon le volume (économies d'échelle)
-    if total_volume > 500:
-        efficiency_bonus = 0.9  # 10% de réduction pour gros volumes
-    elif total_volume > 200:
-        efficiency_bonus = 0.95  # 5% de réduction
-    else:
-        efficiency_bonus = 1.0
-
-    transport_emissions = base_emissions * efficiency_bonus
-
-    # Émissions de production par produit
-    production_emissions = 0
-    for product, volume in product_volumes.items():
-        if product.lower() in supplier["materiau"].lower():
-            production_emissions += supplier["emissions_co2_kg_tonne"] * volume
-
-    return transport_emissions + production_emissions, time_hours, distance
+@st.cache_data(max_entries=128, show_spinner=False)
+def get_map_layers(site_name, bucket, chain):
+    """Marqueurs et itinéraires GeoJSON d'un scénario (clé : site, produits + tranche de volume, chaîne)"""
+    site_coords = get_store().sites()[site_name]["coordinates"]
+    supplier_results = get_emissions_engine().scenario(site_name, dict(bucket), list(chain) if chain else None)
+    return build_layers(supplier_results, site_name, site_coords, TRANSPORT_MODES)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def get_folium_html(site_name, bucket, chain):
+    """Carte 2D sérialisée, réutilisée telle quelle entre les reruns"""
+    total_volume = sum(volume for _, volume in bucket)
+    site_popup = f"""
+    <b>🏭 {site_name}</b><br>
+    Site Hutchinson de destination<br>
+    Produits: {', '.join(product for product, _ in bucket)}<br>
+    Volume total: {total_volume} tonnes
+    """
+    return render_folium_html(get_map_layers(site_name, bucket, chain), site_popup)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def get_globe_json(site_name, bucket, chain):
+    """Globe 3D sérialisé en JSON, réutilisé tel quel entre les reruns"""
+    products = ', '.join(product for product, _ in bucket)
+    title = f"🌐 Globe des Fournisseurs - {products} vers {site_name}"
+    return render_globe_json(get_map_layers(site_name, bucket, chain), title)
 
 @safewatch_app(title="Service Achats - RiskRadar")
 def main():
@@ -571,6 +219,10 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+    # Données achats (requêtes indexées sur le store)
+    store = get_store()
+    watched_regulations = store.find_regulations()
+
     # Tabs pour organiser les fonctionnalités
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "📊 Tableau de Bord",
@@ -584,7 +236,7 @@ def main():
         st.header("📊 Tableau de Bord des Risques")
 
         # Calcul des métriques clés
-        regulations_df = pd.DataFrame(SAMPLE_REGULATIONS)
+        regulations_df = pd.DataFrame(watched_regulations)
         regulations_df['score'] = regulations_df.apply(score_regulation, axis=1)
 
         # Métriques principales
@@ -595,7 +247,7 @@ def main():
             st.metric("🚨 Réglementations Critiques", critical_count, delta="+2 cette semaine")
 
         with col2:
-            high_risk_suppliers = len([s for s in SUPPLIERS_DATA if s['score'] >= 70])
+            high_risk_suppliers = len(store.find_suppliers(min_score=70))
             st.metric("⚠️ Fournisseurs à Risque", high_risk_suppliers, delta="+1")
 
         with col3:
@@ -603,8 +255,8 @@ def main():
             st.metric("📈 Score Moyen de Risque", f"{avg_score}/100", delta="-5 points")
 
         with col4:
-            urgent_deadlines = len([r for r in SAMPLE_REGULATIONS if months_to_deadline(r.get('deadline', '')) and months_to_deadline(r.get('deadline', '')) <= 3])
-            st.metric("⏰ Échéances Urgentes", urgent_deadlines, delta="3 mois")
+            urgent_deadlines = store.count_upcoming_deadlines(URGENT_MONTHS)
+            st.metric("⏰ Échéances Urgentes", urgent_deadlines, delta=f"{URGENT_MONTHS} mois")
 
         # Graphique de répartition des risques
         st.subheader("📊 Répartition des Scores de Risque")
@@ -641,30 +293,30 @@ def main():
         st.header("⚖️ Veille Réglementaire Active")
 
         # Filtres
+        facets = store.regulation_facets()
         col1, col2 = st.columns(2)
         with col1:
             selected_jurisdiction = st.selectbox(
                 "🌍 Filtrer par juridiction",
-                ["Toutes"] + list(set([r['jurisdiction'] for r in SAMPLE_REGULATIONS]))
+                ["Toutes"] + facets["jurisdictions"]
             )
         with col2:
             selected_type = st.selectbox(
                 "📋 Filtrer par type",
-                ["Tous"] + list(set([r['rtype'] for r in SAMPLE_REGULATIONS]))
+                ["Tous"] + facets["types"]
             )
 
-        # Affichage des réglementations filtrées
-        filtered_regs = SAMPLE_REGULATIONS
-        if selected_jurisdiction != "Toutes":
-            filtered_regs = [r for r in filtered_regs if r['jurisdiction'] == selected_jurisdiction]
-        if selected_type != "Tous":
-            filtered_regs = [r for r in filtered_regs if r['rtype'] == selected_type]
+        # Affichage des réglementations filtrées (requête indexée)
+        filtered_regs = store.find_regulations(
+            jurisdiction=None if selected_jurisdiction == "Toutes" else selected_jurisdiction,
+            rtype=None if selected_type == "Tous" else selected_type
+        )
 
         st.subheader(f"📋 {len(filtered_regs)} réglementations trouvées")
 
         for reg in filtered_regs:
             score = score_regulation(reg)
-            months_left = months_to_deadline(reg.get('deadline'))
+            months_left = months_to_deadline(reg.get('deadline_at') or reg.get('deadline'))
 
             risk_class = "risk-high" if score >= 70 else "risk-medium" if score >= 40 else "risk-low"
 
@@ -680,6 +332,8 @@ def main():
                         st.write(f"**Échéance:** {months_left} mois restants")
                     st.write(f"**Score de risque:** {score}/100")
                     st.write(f"**Impact Hutchinson:** {reg['impact_hutchinson']}")
+                    impacted_sites = get_site_impact_index().sites_for_law(reg['id'])
+                    st.write(f"**Sites impactés:** {', '.join(sorted(impacted_sites)) or 'Aucun'}")
 
                 st.write("**Résumé:**")
                 st.write(reg['summary'])
@@ -690,11 +344,11 @@ def main():
         # Sélection du matériau à analyser
         selected_material = st.selectbox(
             "🔍 Sélectionner un matériau critique",
-            ["Caoutchouc naturel", "Acier laminé", "Aluminium brut", "Elastomères synthétiques", "Composés chimiques"]
+            store.material_labels()
         )
 
         # Filtrer les fournisseurs par matériau
-        material_suppliers = [s for s in SUPPLIERS_DATA if selected_material.lower() in s['materiau'].lower()]
+        material_suppliers = store.find_suppliers(materials=[selected_material])
 
         if material_suppliers:
             st.subheader(f"📊 Fournisseurs de {selected_material}")
@@ -747,7 +401,7 @@ def main():
         st.subheader("🌍 Impact par Région Géographique")
 
         regions_impact = {}
-        for reg in SAMPLE_REGULATIONS:
+        for reg in watched_regulations:
             jurisdiction = reg['jurisdiction']
             score = score_regulation(reg)
             if jurisdiction not in regions_impact:
@@ -824,19 +478,24 @@ def main():
         col1, col2 = st.columns(2)
 
         with col1:
+            sites = store.sites()
             selected_site = st.selectbox(
                 "🏭 Site Hutchinson de destination",
-                list(HUTCHINSON_SITES.keys())
+                list(sites.keys())
             )
-            site_coords = HUTCHINSON_SITES[selected_site]
-            site_continent = get_site_continent(selected_site)
+            site_coords = sites[selected_site]["coordinates"]
+            site_regulations = get_site_impact_index().laws_for_site(selected_site)
+            if site_regulations:
+                titles = [r['title'] for r in store.find_regulations() if r['id'] in site_regulations]
+                st.caption(f"📜 {len(site_regulations)} réglementations suivies s'appliquent à ce site: "
+                           f"{', '.join(titles)}")
 
         with col2:
             # NOUVEAU: Sélection multi-produits
             st.subheader("📦 Commande Multi-Produits")
             selected_products = st.multiselect(
                 "Sélectionner les produits à commander",
-                ["Caoutchouc naturel", "Acier laminé", "Aluminium brut", "Elastomères synthétiques", "Composés chimiques"],
+                store.material_labels(),
                 default=["Caoutchouc naturel"]
             )
 
@@ -874,215 +533,41 @@ def main():
 
         if auto_transport:
             # Transport sélectionné automatiquement
-            st.info("🤖 **Mode automatique activé** - Le transport optimal sera choisi selon la géographie")
+            st.info("🤖 **Mode automatique activé** - Itinéraire multimodal le moins émetteur (ports, rail, route)")
             selected_chain = None  # Will be determined per supplier
         else:
             # Transport manuel
-            transport_chains = {
-                "🚛 Route directe": ["Route"],
-                "🚂 Train direct": ["Train"],
-                "✈️ Aérien direct": ["Aérien"],
-                "🚢 Maritime direct": ["Maritime"],
-                "🚛➡️🚢 Route + Maritime": ["Route", "Maritime"],
-                "🚂➡️🚢 Train + Maritime": ["Train", "Maritime"],
-                "🚛➡️✈️ Route + Aérien": ["Route", "Aérien"],
-                "🚂➡️✈️ Train + Aérien": ["Train", "Aérien"],
-                "🚛➡️🚢➡️🚂 Route + Maritime + Train": ["Route", "Maritime", "Train"],
-                "🚂➡️🚢➡️🚛 Train + Maritime + Route": ["Train", "Maritime", "Route"]
-            }
-
             selected_chain_name = st.selectbox(
                 "🔗 Choisir la chaîne de transport",
-                list(transport_chains.keys())
+                list(TRANSPORT_CHAINS.keys())
             )
-            selected_chain = transport_chains[selected_chain_name]
-
-        # Calculs pour tous les fournisseurs pertinents
-        supplier_results = []
-        for supplier in SUPPLIERS_EXTENDED:
-            # Vérifier si le fournisseur peut fournir au moins un des produits
-            can_supply = any(product.lower() in supplier["materiau"].lower() for product in selected_products)
-
-            if can_supply:
-                # Déterminer le transport (auto ou manuel)
-                if auto_transport:
-                    transport_chain = get_auto_transport_chain(supplier["continent"], site_continent)
-                else:
-                    transport_chain = selected_chain
-
-                # Calculer pour les produits que ce fournisseur peut livrer
-                supplier_products = {
-                    product: volume for product, volume in product_volumes.items()
-                    if product.lower() in supplier["materiau"].lower()
-                }
-
-                if supplier_products:  # Si le fournisseur peut livrer au moins un produit
-                    emissions, time_hours, distance = calculate_multi_product_emissions(
-                        supplier, site_coords, transport_chain, supplier_products
-                    )
-
-                    supplier_results.append({
-                        **supplier,
-                        "transport_chain": transport_chain,
-                        "products_supplied": list(supplier_products.keys()),
-                        "volumes_supplied": supplier_products,
-                        "emissions_transport": emissions - sum(supplier["emissions_co2_kg_tonne"] * vol for vol in supplier_products.values()),
-                        "emissions_production": sum(supplier["emissions_co2_kg_tonne"] * vol for vol in supplier_products.values()),
-                        "temps_transport_h": time_hours,
-                        "distance_km": distance,
-                        "emissions_totales": emissions,
-                        "color": "green" if emissions < 8000 else "orange" if emissions < 20000 else "red"
-                    })
+            selected_chain = TRANSPORT_CHAINS[selected_chain_name]
+
+        # Calculs pour tous les fournisseurs pertinents (une seule passe vectorisée, mémoïsée par scénario)
+        supplier_results = get_emissions_engine().scenario(
+            selected_site, product_volumes, None if auto_transport else selected_chain
+        )
 
         if supplier_results:
+            # Couches cartographiques pré-calculées par (site, produits, tranche de volume, chaîne)
+            bucket = volume_bucket(product_volumes)
+            chain_key = None if auto_transport else tuple(selected_chain)
+
             if view_mode == "🌐 Globe 3D Interactif":
                 # NOUVELLE CARTE 3D GLOBE
                 st.subheader("🌐 Globe 3D Interactif")
 
-                # Créer le globe 3D avec Plotly
-                fig_globe = go.Figure()
-
-                # Ajouter les fournisseurs sur le globe
-                for supplier in supplier_results:
-                    color = "#10b981" if supplier["color"] == "green" else "#f59e0b" if supplier["color"] == "orange" else "#ef4444"
-
-                    fig_globe.add_trace(go.Scattergeo(
-                        lon=[supplier["coordinates"][1]],
-                        lat=[supplier["coordinates"][0]],
-                        mode='markers+text',
-                        marker=dict(
-                            size=max(8, min(20, supplier["emissions_totales"] / 1000)),
-                            color=color,
-                            line=dict(width=2, color='white'),
-                            sizemode='diameter'
-                        ),
-                        text=supplier["nom"],
-                        textposition="top center",
-                        textfont=dict(size=10, color='white'),
-                        hovertemplate=(
-                            f"<b>{supplier['nom']}</b><br>" +
-                            f"📍 {supplier['ville']}, {supplier['pays']}<br>" +
-                            f"📦 Produits: {', '.join(supplier['products_supplied'])}<br>" +
-                            f"🚚 Transport: {' ➡️ '.join([TRANSPORT_MODES[mode]['icon'] + mode for mode in supplier['transport_chain']])}<br>" +
-                            f"💨 Émissions: {supplier['emissions_totales']:.0f} kg CO2<br>" +
-                            f"📏 Distance: {supplier['distance_km']:.0f} km<br>" +
-                            f"{'🟢 CBAM Certifié' if supplier['certifie_cbam'] else '🔴 Non CBAM'}<br>" +
-                            "<extra></extra>"
-                        ),
-                        name=f"Fournisseur {supplier['color'].capitalize()}"
-                    ))
-
-                # Ajouter le site Hutchinson
-                fig_globe.add_trace(go.Scattergeo(
-                    lon=[site_coords[1]],
-                    lat=[site_coords[0]],
-                    mode='markers+text',
-                    marker=dict(size=15, color='#3b82f6', symbol='square'),
-                    text="🏭 " + selected_site.split(" (")[0],
-                    textposition="bottom center",
-                    textfont=dict(size=12, color='white'),
-                    name="Site Hutchinson"
-                ))
-
-                # Configuration du globe 3D
-                fig_globe.update_layout(
-                    title=f"🌐 Globe des Fournisseurs - {', '.join(selected_products)} vers {selected_site}",
-                    geo=dict(
-                        projection_type='orthographic',
-                        showland=True,
-                        landcolor='rgb(20, 30, 40)',
-                        oceancolor='rgb(10, 15, 25)',
-                        showocean=True,
-                        countrycolor='rgb(60, 60, 60)',
-                        coastlinecolor='rgb(100, 100, 100)',
-                        showlakes=True,
-                        lakecolor='rgb(10, 15, 25)'
-                    ),
-                    height=600,
-                    paper_bgcolor='rgba(0,0,0,0.9)',
-                    font_color='white'
-                )
-
+                fig_globe = load_globe(get_globe_json(selected_site, bucket, chain_key))
                 st.plotly_chart(fig_globe, use_container_width=True)
 
             else:
                 # CARTE 2D CLASSIQUE AMÉLIORÉE
                 st.subheader("🗺️ Carte Interactive 2D")
 
-                center_lat = (site_coords[0] + sum(s["coordinates"][0] for s in supplier_results)) / (len(supplier_results) + 1)
-                center_lon = (site_coords[1] + sum(s["coordinates"][1] for s in supplier_results)) / (len(supplier_results) + 1)
-
-                m = folium.Map(location=[center_lat, center_lon], zoom_start=2, tiles="CartoDB dark_matter")
-
-                # Ajouter le site Hutchinson de destination
-                folium.Marker(
-                    location=site_coords,
-                    popup=f"""
-                    <b>🏭 {selected_site}</b><br>
-                    Site Hutchinson de destination<br>
-                    Produits: {', '.join(selected_products)}<br>
-                    Volume total: {total_volume} tonnes
-                    """,
-                    icon=folium.Icon(color="blue", icon="industry", prefix="fa")
-                ).add_to(m)
-
-                # Ajouter les fournisseurs avec informations détaillées
-                for supplier in supplier_results:
-                    # Icône selon certification CBAM
-                    icon_name = "certificate" if supplier["certifie_cbam"] else "truck"
-
-                    popup_html = f"""
-                    <b>{supplier['nom']}</b><br>
-                    📍 {supplier['ville']}, {supplier['pays']}<br>
-                    📦 Produits fournis: {', '.join(supplier['products_supplied'])}<br>
-                    📏 Distance: {supplier['distance_km']:.0f} km<br>
-                    🚚 Transport: {' ➡️ '.join([TRANSPORT_MODES[mode]['icon'] + mode for mode in supplier['transport_chain']])}<br>
-                    ⏱️ Temps: {supplier['temps_transport_h']:.1f}h<br>
-                    🌍 Émissions transport: {supplier['emissions_transport']:.0f} kg CO2<br>
-                    🏭 Émissions production: {supplier['emissions_production']:.0f} kg CO2<br>
-                    <b>💨 Total: {supplier['emissions_totales']:.0f} kg CO2</b><br>
-                    {'✅ Certifié ISO14001' if supplier['certifie_iso14001'] else '❌ Non certifié ISO14001'}<br>
-                    {'🟢 Certifié CBAM' if supplier['certifie_cbam'] else '🔴 Non certifié CBAM'}
-                    """
-
-                    folium.Marker(
-                        location=supplier["coordinates"],
-                        popup=folium.Popup(popup_html, max_width=350),
-                        icon=folium.Icon(
-                            color=supplier["color"],
-                            icon=icon_name,
-                            prefix="fa"
-                        )
-                    ).add_to(m)
-
-                    # Ligne de transport avec style selon émissions
-                    line_weight = 3 if supplier["color"] == "red" else 2
-                    folium.PolyLine(
-                        locations=[supplier["coordinates"], site_coords],
-                        weight=line_weight,
-                        color=supplier["color"],
-                        opacity=0.8,
-                        dash_array="5,5" if not supplier["certifie_cbam"] else None
-                    ).add_to(m)
-
-                # Légende améliorée
-                legend_html = '''
-                <div style="position: fixed; 
-                            bottom: 50px; left: 50px; width: 220px; height: 160px; 
-                            background-color: rgba(0,0,0,0.8); border:2px solid #dc2626; z-index:9999; 
-                            font-size:12px; padding: 10px; color: white; border-radius: 10px">
-                <p><b>🌍 Légende Carbone & CBAM</b></p>
-                <p><i class="fa fa-circle" style="color:green"></i> < 8000 kg CO2 (Faible)</p>
-                <p><i class="fa fa-circle" style="color:orange"></i> 8000-20000 kg CO2 (Moyen)</p>
-                <p><i class="fa fa-circle" style="color:red"></i> > 20000 kg CO2 (Élevé)</p>
-                <p>🟢 Ligne continue = CBAM certifié</p>
-                <p>🔴 Ligne pointillée = Non CBAM</p>
-                </div>
-                '''
-                m.get_root().html.add_child(folium.Element(legend_html))
+                components.html(get_folium_html(selected_site, bucket, chain_key), height=600)
 
-                # Afficher la carte
-                map_data = st_folium(m, width=700, height=600)
+            if dict(bucket) != product_volumes:
+                st.caption("ℹ️ Carte calculée sur les volumes arrondis à 2 chiffres significatifs - valeurs exactes dans le tableau")
 
             # Tableau de comparaison amélioré
             st.subheader("📊 Comparaison Détaillée des Fournisseurs")
@@ -1144,6 +629,61 @@ def main():
                 )
                 st.plotly_chart(fig_cbam, use_container_width=True)
 
+            # Fournisseurs les plus proches du site (requête géographique indexée)
+            with st.expander("📍 Fournisseurs les plus proches du site", expanded=False):
+                nearest = store.nearest_suppliers(site_coords, materials=selected_products, limit=5)
+                for supplier in nearest:
+                    st.write(f"**{supplier['nom']}** ({supplier['ville']}, {supplier['pays']}) - "
+                             f"{supplier['distance_km']:.0f} km - {supplier['materiau']}")
+
+            # Optimisation de la répartition multi-produits
+            st.subheader("🧮 Répartition Optimale des Volumes")
+            st.caption("Allocation des volumes entre fournisseurs sous contraintes de capacité, CBAM et risque")
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                # Sans prix d'achat, le coût n'est que le prix carbone des émissions : même optimum
+                objectives = ["💨 Minimiser les émissions"]
+                if has_purchase_prices(get_emissions_engine().suppliers):
+                    objectives.append("💶 Minimiser le coût (achat + carbone)")
+                objective_label = st.radio("🎯 Objectif", objectives, key="optim_objective")
+            with col2:
+                require_cbam = st.checkbox("🟢 Fournisseurs CBAM uniquement", value=False, key="optim_cbam")
+            with col3:
+                max_risk_score = st.slider("⚠️ Score de risque maximal", 0, 100, 70, step=5, key="optim_risk")
+
+            optimization = optimize_sourcing(
+                get_emissions_engine(),
+                selected_site,
+                product_volumes,
+                objective="emissions" if "émissions" in objective_label else "cost",
+                require_cbam=require_cbam,
+                max_risk_score=max_risk_score,
+                chain=None if auto_transport else selected_chain
+            )
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("💨 Émissions optimisées", f"{optimization['total_emissions']:.0f} kg CO2")
+            with col2:
+                st.metric("💶 Coût estimé", f"{optimization['total_cost']:.0f} €")
+            with col3:
+                st.metric("⚡ Résolution", f"{optimization['solve_ms']:.0f} ms", delta=optimization['solver'], delta_color="off")
+
+            if optimization["unmet"]:
+                st.warning("⚠️ Volumes non couverts par les fournisseurs autorisés: " + ", ".join(
+                    f"{product} ({tonnes:.0f} t)" for product, tonnes in optimization["unmet"].items()
+                ))
+
+            if optimization["allocations"]:
+                allocation_df = pd.DataFrame(optimization["allocations"])[[
+                    "produit", "nom", "pays", "tonnes", "emissions_kg", "cout", "certifie_cbam", "score"
+                ]]
+                allocation_df.columns = [
+                    "Produit", "Fournisseur", "Pays", "Tonnes", "Émissions (kg CO2)", "Coût (€)", "CBAM", "Score Risque"
+                ]
+                st.dataframe(allocation_df, use_container_width=True)
+
         else:
             st.warning(f"Aucun fournisseur trouvé pour les produits sélectionnés: {', '.join(selected_products)}")
 
@@ -0,0 +1,253 @@
+"""
+Couches cartographiques pré-calculées pour la carte fournisseurs (service achats)
+
+Les marqueurs et itinéraires sont construits une fois par (site, produits, tranche de volume,
+chaîne) sous forme de GeoJSON, puis sérialisés : carte folium rendue en HTML (marqueurs
+regroupés côté navigateur, une seule couche de lignes) et globe plotly en JSON
+(une trace de marqueurs + une trace de lignes), réutilisables tels quels entre les reruns.
+"""
+import math
+
+import folium
+from folium.plugins import FastMarkerCluster
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Chiffres significatifs conservés pour la tranche de volume d'un produit
+VOLUME_SIGNIFICANT_DIGITS = 2
+
+# Au-delà, les noms ne sont plus affichés en texte sur le globe (survol uniquement)
+MAX_GLOBE_LABELS = 50
+
+MARKER_COLORS = {"green": "#10b981", "orange": "#f59e0b", "red": "#ef4444"}
+
+# Création des marqueurs dans le navigateur : [lat, lon, popup, couleur, icône]
+CLUSTER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: row[4], prefix: 'fa', markerColor: row[3]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[2], {maxWidth: 350});
+    return marker;
+}
+"""
+
+LEGEND_HTML = '''
+<div style="position: fixed;
+            bottom: 50px; left: 50px; width: 220px; height: 160px;
+            background-color: rgba(0,0,0,0.8); border:2px solid #dc2626; z-index:9999;
+            font-size:12px; padding: 10px; color: white; border-radius: 10px">
+<p><b>🌍 Légende Carbone & CBAM</b></p>
+<p><i class="fa fa-circle" style="color:green"></i> < 8000 kg CO2 (Faible)</p>
+<p><i class="fa fa-circle" style="color:orange"></i> 8000-20000 kg CO2 (Moyen)</p>
+<p><i class="fa fa-circle" style="color:red"></i> > 20000 kg CO2 (Élevé)</p>
+<p>🟢 Ligne continue = CBAM certifié</p>
+<p>🔴 Ligne pointillée = Non CBAM</p>
+</div>
+'''
+
+
+def volume_bucket(product_volumes):
+    """Tranche de volume : volumes par produit arrondis à 2 chiffres significatifs (clé de cache)"""
+    bucket = []
+    for product, volume in sorted(product_volumes.items()):
+        if volume > 0:
+            magnitude = 10 ** max(int(math.floor(math.log10(volume))) + 1 - VOLUME_SIGNIFICANT_DIGITS, 0)
+            volume = int(round(volume / magnitude) * magnitude)
+        bucket.append((product, volume))
+    return tuple(bucket)
+
+
+def _transport_label(chain, transport_modes):
+    return ' ➡️ '.join([transport_modes[mode]['icon'] + mode for mode in chain])
+
+
+def _popup_html(supplier, transport_modes):
+    return f"""
+    <b>{supplier['nom']}</b><br>
+    📍 {supplier['ville']}, {supplier['pays']}<br>
+    📦 Produits fournis: {', '.join(supplier['products_supplied'])}<br>
+    📏 Distance: {supplier['distance_km']:.0f} km<br>
+    🚚 Transport: {_transport_label(supplier['transport_chain'], transport_modes)}<br>
+    ⏱️ Temps: {supplier['temps_transport_h']:.1f}h<br>
+    🌍 Émissions transport: {supplier['emissions_transport']:.0f} kg CO2<br>
+    🏭 Émissions production: {supplier['emissions_production']:.0f} kg CO2<br>
+    <b>💨 Total: {supplier['emissions_totales']:.0f} kg CO2</b><br>
+    {'✅ Certifié ISO14001' if supplier.get('certifie_iso14001') else '❌ Non certifié ISO14001'}<br>
+    {'🟢 Certifié CBAM' if supplier.get('certifie_cbam') else '🔴 Non certifié CBAM'}
+    """
+
+
+def _route_coordinates(supplier, site_coords):
+    """Tracé [lon, lat] : tronçons de l'itinéraire routé, sinon ligne directe"""
+    legs = supplier.get("route_legs")
+    if legs:
+        points = [legs[0]["from_coords"]] + [leg["to_coords"] for leg in legs]
+    else:
+        points = [supplier["coordinates"], site_coords]
+    return [[lon, lat] for lat, lon in points]
+
+
+def build_layers(supplier_results, site_name, site_coords, transport_modes):
+    """
+    Construit les couches GeoJSON de la carte
+
+    Returns:
+        dict: points fournisseurs (FeatureCollection), lignes regroupées par style
+              (une MultiLineString par couleur / statut CBAM) et centre de la carte
+    """
+    points = []
+    grouped_lines = {}
+    for supplier in supplier_results:
+        lat, lon = supplier["coordinates"]
+        points.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {
+                "nom": supplier["nom"],
+                "color": supplier["color"],
+                "icon": "certificate" if supplier.get("certifie_cbam") else "truck",
+                "popup": _popup_html(supplier, transport_modes),
+                "hover": (
+                    f"<b>{supplier['nom']}</b><br>"
+                    f"📍 {supplier['ville']}, {supplier['pays']}<br>"
+                    f"📦 Produits: {', '.join(supplier['products_supplied'])}<br>"
+                    f"🚚 Transport: {_transport_label(supplier['transport_chain'], transport_modes)}<br>"
+                    f"💨 Émissions: {supplier['emissions_totales']:.0f} kg CO2<br>"
+                    f"📏 Distance: {supplier['distance_km']:.0f} km<br>"
+                    f"{'🟢 CBAM Certifié' if supplier.get('certifie_cbam') else '🔴 Non CBAM'}"
+                ),
+                "size": max(8, min(20, supplier["emissions_totales"] / 1000)),
+            },
+        })
+        style = (supplier["color"], bool(supplier.get("certifie_cbam")))
+        grouped_lines.setdefault(style, []).append(_route_coordinates(supplier, site_coords))
+
+    lines = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "MultiLineString", "coordinates": coordinates},
+            "properties": {"color": color, "cbam": cbam, "weight": 3 if color == "red" else 2},
+        }
+        for (color, cbam), coordinates in grouped_lines.items()
+    ]
+
+    count = len(supplier_results) + 1
+    center = [
+        (site_coords[0] + sum(s["coordinates"][0] for s in supplier_results)) / count,
+        (site_coords[1] + sum(s["coordinates"][1] for s in supplier_results)) / count,
+    ]
+    return {
+        "site": {"name": site_name, "coordinates": list(site_coords)},
+        "points": {"type": "FeatureCollection", "features": points},
+        "lines": {"type": "FeatureCollection", "features": lines},
+        "center": center,
+    }
+
+
+def render_folium_html(layers, site_popup):
+    """Carte folium complète sérialisée en HTML (marqueurs regroupés, une couche de lignes)"""
+    m = folium.Map(location=layers["center"], zoom_start=2, tiles="CartoDB dark_matter")
+
+    folium.Marker(
+        location=layers["site"]["coordinates"],
+        popup=site_popup,
+        icon=folium.Icon(color="blue", icon="industry", prefix="fa")
+    ).add_to(m)
+
+    folium.GeoJson(
+        layers["lines"],
+        name="Itinéraires",
+        style_function=lambda feature: {
+            "color": feature["properties"]["color"],
+            "weight": feature["properties"]["weight"],
+            "opacity": 0.8,
+            "dashArray": None if feature["properties"]["cbam"] else "5,5",
+        },
+    ).add_to(m)
+
+    rows = []
+    for feature in layers["points"]["features"]:
+        lon, lat = feature["geometry"]["coordinates"]
+        properties = feature["properties"]
+        rows.append([lat, lon, properties["popup"], properties["color"], properties["icon"]])
+    FastMarkerCluster(rows, callback=CLUSTER_CALLBACK, name="Fournisseurs").add_to(m)
+
+    m.get_root().html.add_child(folium.Element(LEGEND_HTML))
+    return m.get_root().render()
+
+
+def render_globe_json(layers, title):
+    """Globe plotly sérialisé en JSON : une trace de marqueurs et une trace de lignes"""
+    features = layers["points"]["features"]
+
+    # Toutes les lignes dans une seule trace, segments séparés par None
+    line_lon, line_lat = [], []
+    for feature in layers["lines"]["features"]:
+        for line in feature["geometry"]["coordinates"]:
+            line_lon.extend([lon for lon, _ in line] + [None])
+            line_lat.extend([lat for _, lat in line] + [None])
+
+    fig_globe = go.Figure()
+    fig_globe.add_trace(go.Scattergeo(
+        lon=line_lon,
+        lat=line_lat,
+        mode='lines',
+        line=dict(width=1, color='rgba(148, 163, 184, 0.6)'),
+        hoverinfo='skip',
+        name="Itinéraires"
+    ))
+    fig_globe.add_trace(go.Scattergeo(
+        lon=[f["geometry"]["coordinates"][0] for f in features],
+        lat=[f["geometry"]["coordinates"][1] for f in features],
+        mode='markers+text' if len(features) <= MAX_GLOBE_LABELS else 'markers',
+        marker=dict(
+            size=[f["properties"]["size"] for f in features],
+            color=[MARKER_COLORS.get(f["properties"]["color"], "#ef4444") for f in features],
+            line=dict(width=2, color='white'),
+            sizemode='diameter'
+        ),
+        text=[f["properties"]["nom"] for f in features],
+        textposition="top center",
+        textfont=dict(size=10, color='white'),
+        customdata=[f["properties"]["hover"] for f in features],
+        hovertemplate="%{customdata}<extra></extra>",
+        name="Fournisseurs"
+    ))
+
+    # Site Hutchinson
+    site_lat, site_lon = layers["site"]["coordinates"]
+    fig_globe.add_trace(go.Scattergeo(
+        lon=[site_lon],
+        lat=[site_lat],
+        mode='markers+text',
+        marker=dict(size=15, color='#3b82f6', symbol='square'),
+        text="🏭 " + layers["site"]["name"].split(" (")[0],
+        textposition="bottom center",
+        textfont=dict(size=12, color='white'),
+        name="Site Hutchinson"
+    ))
+
+    fig_globe.update_layout(
+        title=title,
+        geo=dict(
+            projection_type='orthographic',
+            showland=True,
+            landcolor='rgb(20, 30, 40)',
+            oceancolor='rgb(10, 15, 25)',
+            showocean=True,
+            countrycolor='rgb(60, 60, 60)',
+            coastlinecolor='rgb(100, 100, 100)',
+            showlakes=True,
+            lakecolor='rgb(10, 15, 25)'
+        ),
+        height=600,
+        paper_bgcolor='rgba(0,0,0,0.9)',
+        font_color='white'
+    )
+    return fig_globe.to_json()
+
+
+def load_globe(figure_json):
+    """Reconstruit la figure plotly à partir du JSON en cache"""
+    return pio.from_json(figure_json)
+